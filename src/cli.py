@@ -0,0 +1,153 @@
+"""
+Command line entry point of the scrapers and the seed script.
+
+Usage:
+    python -m src articles [--links PATH] [--parse-workers N] [--full] [--parser NAME]
+    python -m src datasheets [--parser NAME]
+    python -m src resources [--parser NAME]
+    python -m src videos [--output PATH]
+    python -m src guides [--series NAME ...] [--output-dir DIR] [--parser NAME]
+    python -m src seed COLLECTION [COLLECTION ...]
+
+Every command imports the code it runs when it runs, so importing this module, or any of the
+scraper modules, does no network or database work, and `--help` stays fast.
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Optional
+from dotenv import find_dotenv, load_dotenv
+from src.services.html_parsers import HTML_PARSER_ENV
+
+logger = logging.getLogger(__name__)
+
+# Mirrors `src.services.supporting_documents_loader.GUIDES` and `src.seed.SEEDERS`, which are
+# not imported to build the parser
+GUIDE_NAMES = ("catalyst_1300", "catalyst_1200")
+SEED_COLLECTIONS = ("product_families", "articles", "videos", "admin_guides")
+
+
+def scrape_articles(args: argparse.Namespace) -> None:
+    from src.services.articles import LINKS_PATH, run_scraper
+
+    run_scraper(
+        args.links or LINKS_PATH,
+        parse_workers=args.parse_workers,
+        incremental=not args.full,
+        parser=args.parser,
+    )
+
+
+def scrape_datasheets(args: argparse.Namespace) -> None:
+    from src.services import datasheets
+
+    datasheets.main(urls=datasheets.urls, parser=args.parser)
+
+
+def scrape_resources(args: argparse.Namespace) -> None:
+    from src.services.quick_resources import quick_resources
+
+    quick_resources(parser=args.parser)
+
+
+def scrape_videos(args: argparse.Namespace) -> None:
+    from src.services.youtube import save_videos
+
+    save_videos(args.output)
+
+
+def scrape_guides(args: argparse.Namespace) -> None:
+    from src.services.supporting_documents_loader import save_guides
+
+    for name in args.names or GUIDE_NAMES[:1]:
+        logger.info(f"Scraping the {name} guides")
+        save_guides(name, output_dir=args.output_dir, parser=args.parser)
+
+
+def seed(args: argparse.Namespace) -> None:
+    from src.seed import seed as seed_collections
+
+    for collection, ids in seed_collections(args.collections).items():
+        logger.info(f"Seeded {len(ids)} {collection}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src", description="Scrape Cisco SMB documents and seed the database."
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name: str, handler, help: str, html_parser: bool = True):
+        command = commands.add_parser(name, help=help, description=help)
+        command.set_defaults(handler=handler)
+        if html_parser:
+            command.add_argument(
+                "--parser",
+                help=f"the BeautifulSoup parser, see `{HTML_PARSER_ENV}` (default: auto)",
+            )
+        return command
+
+    articles = add_command(
+        "articles", scrape_articles, "Scrape the articles listed by the articles spider."
+    )
+    articles.add_argument(
+        "--links",
+        help="the links.json of the articles spider, or a directory of links files like data/by_family",
+    )
+    articles.add_argument(
+        "--parse-workers",
+        type=int,
+        help="processes parsing pages, 0 parses on the event loop (default: one per CPU)",
+    )
+    articles.add_argument(
+        "--full",
+        action="store_true",
+        help="scrape every article and replace the schema, not only the new and changed ones",
+    )
+
+    add_command("datasheets", scrape_datasheets, "Scrape the product datasheets.")
+    add_command(
+        "resources", scrape_resources, "Scrape the quick resources of the support pages."
+    )
+
+    videos = add_command(
+        "videos", scrape_videos, "Fetch the Cisco SMB YouTube videos.", html_parser=False
+    )
+    videos.add_argument("--output", default="./data/smb_youtube_videos.csv")
+
+    guides = add_command(
+        "guides", scrape_guides, f"Scrape admin and CLI guides. (default: {GUIDE_NAMES[0]})"
+    )
+    guides.add_argument(
+        "--series",
+        action="append",
+        dest="names",
+        choices=GUIDE_NAMES,
+        help="the series to scrape the guides of, can be repeated",
+    )
+    guides.add_argument("--output-dir", default="./data/schema")
+
+    seed_command = add_command(
+        "seed", seed, "Seed the database with the scraped documents.", html_parser=False
+    )
+    seed_command.add_argument(
+        "collections", nargs="+", choices=SEED_COLLECTIONS, metavar="COLLECTION"
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    load_dotenv(find_dotenv(filename=".env", usecwd=True))
+    logging.basicConfig(
+        stream=sys.stdout,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=args.log_level,
+    )
+    args.handler(args)
@@ -1,9 +1,14 @@
-from typing import Union, List, Dict, Any
-from pymongo.errors import ConfigurationError
+import time
+from contextlib import asynccontextmanager
+from typing import Union, List, Dict, Any, Iterable, Optional, Sequence, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import ConfigurationError, BulkWriteError
 from pymongo.typings import _Pipeline, _DocumentType
 from bson.raw_bson import RawBSONDocument
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from .transcoder import RAW_CODEC_OPTIONS
+from .profiler import QueryProfiler
 
 
 class MongoDbClient:
@@ -30,9 +35,11 @@ class MongoDbClient:
     ATLAS_VECTOR_SEARCH_INDEX_NAME = "admin_guide_vector_search"
     ARTICLES_SEARCH_INDEX_NAME = "articles_search_index"
     ARTICLES_DOC_ID_UNIQUE_INDEX = "document_id_unique_index"
+    ARTICLES_SERIES_INDEX = "series_1"
 
     VIDEOS_SEARCH_INDEX_NAME = "videos_search_index"
     VIDEOS_YOUTUBE_ID_UNIQUE_INDEX = "youtube_id_unique_index"
+    VIDEOS_SERIES_INDEX = "series_1"
 
     ADMIN_GUIDES_TOPIC_TEXT_INDEX = "topic_text_index"
     ADMIN_GUIDES_DOC_ID_UNIQUE_INDEX = "document_id_unique_index"
@@ -42,7 +49,16 @@ class MongoDbClient:
 
     PRODUCT_FAMILIES_NAME_UNIQUE_INDEX = "name_1"
 
-    def __init__(self, conn_str: str, username: str, password: str):
+    # Number of operations sent to the server per bulk_write call
+    BULK_WRITE_BATCH_SIZE = 500
+
+    def __init__(
+        self,
+        conn_str: str,
+        username: str,
+        password: str,
+        profiler: Optional[QueryProfiler] = None,
+    ):
         try:
             self.client = AsyncIOMotorClient(
                 conn_str.replace("<username>", username).replace("<password>", password)
@@ -57,6 +73,28 @@ class MongoDbClient:
 
         self.atlas_vector_search_index_name = "admin_guide_vector_search"
         self.articles_search_index_name = "articles_search_index"
+        self.profiler = profiler
+
+    @asynccontextmanager
+    async def _profile(
+        self,
+        operation: str,
+        collection_name: str,
+        command: Optional[Dict[str, Any]] = None,
+    ):
+        """Time the wrapped operation and report it to the profiler, if any."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.profiler is not None:
+                self.profiler.observe(
+                    self.db,
+                    operation,
+                    collection_name,
+                    command,
+                    time.perf_counter() - start,
+                )
 
     def _prepare_query(self, query: dict) -> dict:
         if "_id" in query and isinstance(query["_id"], str):
@@ -65,39 +103,191 @@ class MongoDbClient:
 
     async def aggregate(self, collection_name: str, pipeline: _Pipeline) -> List[dict]:
         collection = self.collections[collection_name]
-        return await collection.aggregate(pipeline).to_list(None)
+        command = {"aggregate": collection_name, "pipeline": pipeline, "cursor": {}}
+        async with self._profile("aggregate", collection_name, command):
+            return await collection.aggregate(pipeline).to_list(None)
 
     async def insert_one(
         self, collection_name: str, document: Union[_DocumentType, RawBSONDocument]
     ):
         collection = self.collections[collection_name]
-        result = await collection.insert_one(document)
+        async with self._profile("insert_one", collection_name):
+            result = await collection.insert_one(document)
         return str(result.inserted_id)
 
-    async def find(self, collection_name: str, query: dict) -> List[Dict[str, Any]]:
-        query = self._prepare_query(query)
+    def _get_collection(self, collection_name: str, raw: bool = False):
         collection = self.collections[collection_name]
-        return await collection.find(query).to_list(None)
+        if raw:
+            return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+        return collection
+
+    async def find(
+        self, collection_name: str, query: dict, raw: bool = False
+    ) -> Union[List[Dict[str, Any]], List[RawBSONDocument]]:
+        """
+        Find every document matching `query`.
+
+        Args:
+            collection_name (str): The collection to query.
+            query (dict): The filter to apply.
+            raw (bool): Return undecoded `RawBSONDocument`s for responses that transcode the
+                documents to JSON without pydantic, see `src.db.transcoder`. (default: False)
+        """
+        query = self._prepare_query(query)
+        collection = self._get_collection(collection_name, raw)
+        command = {"find": collection_name, "filter": query}
+        async with self._profile("find", collection_name, command):
+            return await collection.find(query).to_list(None)
 
     async def find_one(
         self, collection_name: str, query: dict
     ) -> Union[Dict[str, Any], None]:
         query = self._prepare_query(query)
         collection = self.collections[collection_name]
-        return await collection.find_one(query)
+        command = {"find": collection_name, "filter": query, "limit": 1}
+        async with self._profile("find_one", collection_name, command):
+            return await collection.find_one(query)
 
     async def update_one(self, collection_name: str, query: dict, update: dict):
         query = self._prepare_query(query)
         collection = self.collections[collection_name]
-        result = await collection.update_one(query, update)
+        command = {"update": collection_name, "updates": [{"q": query, "u": update}]}
+        async with self._profile("update_one", collection_name, command):
+            result = await collection.update_one(query, update)
         return result
 
     async def delete_one(self, collection_name: str, query: dict):
         query = self._prepare_query(query)
         collection = self.collections[collection_name]
-        result = await collection.delete_one(query)
+        command = {"delete": collection_name, "deletes": [{"q": query, "limit": 1}]}
+        async with self._profile("delete_one", collection_name, command):
+            result = await collection.delete_one(query)
         return result.deleted_count > 0
 
+    async def bulk_upsert(
+        self,
+        collection_name: str,
+        documents: Iterable[Dict[str, Any]],
+        key: Union[str, Sequence[str]] = "_id",
+        batch_size: Union[int, None] = None,
+    ) -> Dict[str, Any]:
+        """
+        Upsert many documents using unordered `bulk_write` batches.
+
+        Each document is matched on its `key` field(s) and `$set` in full. An `_id`
+        present on a document that is not part of the key is only applied on insert.
+
+        Args:
+            collection_name (str): The collection to write to.
+            documents (Iterable[Dict[str, Any]]): The documents to upsert.
+            key (Union[str, Sequence[str]]): The field or fields identifying a document. (default: "_id")
+            batch_size (Union[int, None]): Operations per `bulk_write` call. (default: BULK_WRITE_BATCH_SIZE)
+
+        Returns:
+            Dict[str, Any]: The aggregated counts and per-document errors, see `_bulk_write`.
+
+        Raises:
+            KeyError: If a document is missing one of the key fields.
+        """
+        keys = [key] if isinstance(key, str) else list(key)
+        operations = []
+        for document in documents:
+            query = self._prepare_query({k: document[k] for k in keys})
+            fields = {k: v for k, v in document.items() if k != "_id"}
+            update: Dict[str, Any] = {"$set": fields}
+            if "_id" in document and "_id" not in keys:
+                update["$setOnInsert"] = {"_id": document["_id"]}
+            operations.append(UpdateOne(query, update, upsert=True))
+        return await self._bulk_write(collection_name, operations, batch_size)
+
+    async def bulk_add_to_set(
+        self,
+        collection_name: str,
+        updates: Iterable[Tuple[dict, Dict[str, Any]]],
+        upsert: bool = False,
+        batch_size: Union[int, None] = None,
+    ) -> Dict[str, Any]:
+        """
+        Apply many `$addToSet` updates using unordered `bulk_write` batches.
+
+        Args:
+            collection_name (str): The collection to write to.
+            updates (Iterable[Tuple[dict, Dict[str, Any]]]): Pairs of `(query, fields)` where `fields`
+                maps an array field to the value to add. List values are added with `$each`.
+            upsert (bool): Whether to insert a document when the query matches nothing. (default: False)
+            batch_size (Union[int, None]): Operations per `bulk_write` call. (default: BULK_WRITE_BATCH_SIZE)
+
+        Returns:
+            Dict[str, Any]: The aggregated counts and per-document errors, see `_bulk_write`.
+        """
+        operations = []
+        for query, fields in updates:
+            add_to_set = {
+                field: {"$each": value} if isinstance(value, list) else value
+                for field, value in fields.items()
+            }
+            operations.append(
+                UpdateOne(
+                    self._prepare_query(dict(query)),
+                    {"$addToSet": add_to_set},
+                    upsert=upsert,
+                )
+            )
+        return await self._bulk_write(collection_name, operations, batch_size)
+
+    async def _bulk_write(
+        self,
+        collection_name: str,
+        operations: List[UpdateOne],
+        batch_size: Union[int, None] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send `operations` in unordered batches and aggregate the results.
+
+        A failing operation does not stop the rest of its batch or the following
+        batches; it is reported in `errors` with its index into `operations`.
+
+        Returns:
+            Dict[str, Any]: A dictionary with the keys `inserted`, `matched`, `modified`,
+            `upserted` (counts), `upserted_ids` (operation index to `_id`) and `errors`.
+        """
+        batch_size = batch_size or self.BULK_WRITE_BATCH_SIZE
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be a positive integer, got {batch_size}")
+        collection = self.collections[collection_name]
+        summary: Dict[str, Any] = {
+            "inserted": 0,
+            "matched": 0,
+            "modified": 0,
+            "upserted": 0,
+            "upserted_ids": {},
+            "errors": [],
+        }
+        for offset in range(0, len(operations), batch_size):
+            batch = operations[offset : offset + batch_size]
+            try:
+                async with self._profile("bulk_write", collection_name):
+                    result = await collection.bulk_write(batch, ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as err:
+                details = err.details
+            summary["inserted"] += details.get("nInserted", 0)
+            summary["matched"] += details.get("nMatched", 0)
+            summary["modified"] += details.get("nModified", 0)
+            summary["upserted"] += details.get("nUpserted", 0)
+            for upserted in details.get("upserted", []):
+                summary["upserted_ids"][offset + upserted["index"]] = upserted["_id"]
+            for error in details.get("writeErrors", []):
+                summary["errors"].append(
+                    {
+                        "index": offset + error["index"],
+                        "code": error.get("code"),
+                        "errmsg": error.get("errmsg"),
+                        "op": error.get("op"),
+                    }
+                )
+        return summary
+
     async def get_one_product_family_by_name(self, product_family_name: str):
         query = {"name": product_family_name}
         return await self.find_one(self.PRODUCT_FAMILIES, query)
@@ -105,24 +295,28 @@ class MongoDbClient:
     async def get_all_product_families(self):
         return await self.find(self.PRODUCT_FAMILIES, {})
 
-    async def get_articles_by_product_family(self, product_family_name: str):
+    async def get_articles_by_product_family(
+        self, product_family_name: str, raw: bool = False
+    ):
         product_family = await self.get_one_product_family_by_name(product_family_name)
         if not product_family:
             raise ValueError(f"Product Family {product_family_name} not found")
         product_family_id = product_family["_id"]
 
         query = {"series": {"$in": [product_family_id]}}
-        articles = await self.find(self.ARTICLES, query)
+        articles = await self.find(self.ARTICLES, query, raw=raw)
         return articles
 
-    async def get_videos_by_product_family(self, product_family_name: str):
+    async def get_videos_by_product_family(
+        self, product_family_name: str, raw: bool = False
+    ):
         product_family = await self.get_one_product_family_by_name(product_family_name)
         if not product_family:
             raise ValueError(f"Product Family {product_family_name} not found")
         product_family_id = product_family["_id"]
 
         query = {"series": {"$in": [product_family_id]}}
-        videos = await self.find(self.VIDEOS, query)
+        videos = await self.find(self.VIDEOS, query, raw=raw)
         return videos
 
     async def close(self):
@@ -0,0 +1,283 @@
+"""
+Declarative index definitions for the `smb_documents` database.
+
+Every index the API or the seed scripts rely on is listed in `INDEXES`. `ensure_indexes`
+creates whatever is missing and is safe to run repeatedly, and `verify_hot_queries`
+explains the queries served on every request and warns when one would scan a whole
+collection.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+import pymongo
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from pymongo.operations import SearchIndexModel
+from .database import MongoDbClient
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Describes one index.
+
+    Attributes:
+        collection (str): The collection the index belongs to.
+        name (str): The index name.
+        keys (List[Tuple[str, Any]]): The index keys, unused for search indexes.
+        kind (str): "index" for a regular index, "search" or "vectorSearch" for Atlas Search indexes.
+        unique (bool): Whether the index enforces unique values. (default: False)
+        sparse (bool): Whether documents missing the keys are left out. (default: False)
+        definition (Optional[Dict[str, Any]]): The Atlas Search index definition. (default: None)
+    """
+
+    collection: str
+    name: str
+    keys: List[Tuple[str, Any]] = field(default_factory=list)
+    kind: Literal["index", "search", "vectorSearch"] = "index"
+    unique: bool = False
+    sparse: bool = False
+    definition: Optional[Dict[str, Any]] = None
+
+    def to_index_model(self) -> IndexModel:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        return IndexModel(self.keys, **options)
+
+    def has_different_keys(self, index_information: Dict[str, Any]) -> bool:
+        """Compare against an entry of `index_information()`, text indexes are not comparable."""
+        if any(direction == pymongo.TEXT for _, direction in self.keys):
+            return False
+        existing_keys = [(k, int(v)) for k, v in index_information.get("key", [])]
+        return existing_keys != [(k, int(v)) for k, v in self.keys]
+
+    def to_search_index_model(self) -> SearchIndexModel:
+        return SearchIndexModel(
+            definition=self.definition, name=self.name, type=self.kind
+        )
+
+
+INDEXES: List[IndexSpec] = [
+    # articles
+    IndexSpec(
+        MongoDbClient.ARTICLES,
+        MongoDbClient.ARTICLES_DOC_ID_UNIQUE_INDEX,
+        [("document_id", pymongo.ASCENDING)],
+        unique=True,
+    ),
+    IndexSpec(
+        MongoDbClient.ARTICLES,
+        MongoDbClient.ARTICLES_SERIES_INDEX,
+        [("series", pymongo.ASCENDING)],
+    ),
+    IndexSpec(
+        MongoDbClient.ARTICLES,
+        MongoDbClient.ARTICLES_SEARCH_INDEX_NAME,
+        kind="search",
+        definition={"mappings": {"dynamic": True}},
+    ),
+    # videos
+    IndexSpec(
+        MongoDbClient.VIDEOS,
+        MongoDbClient.VIDEOS_YOUTUBE_ID_UNIQUE_INDEX,
+        [("video_id", pymongo.ASCENDING)],
+        unique=True,
+    ),
+    IndexSpec(
+        MongoDbClient.VIDEOS,
+        MongoDbClient.VIDEOS_SERIES_INDEX,
+        [("series", pymongo.ASCENDING)],
+    ),
+    IndexSpec(
+        MongoDbClient.VIDEOS,
+        MongoDbClient.VIDEOS_SEARCH_INDEX_NAME,
+        kind="search",
+        definition={"mappings": {"dynamic": True}},
+    ),
+    # admin_guides
+    IndexSpec(
+        MongoDbClient.ADMIN_GUIDES,
+        MongoDbClient.ADMIN_GUIDES_TOPIC_TEXT_INDEX,
+        [("topic", pymongo.TEXT)],
+    ),
+    IndexSpec(
+        MongoDbClient.ADMIN_GUIDES,
+        MongoDbClient.ADMIN_GUIDES_DOC_ID_UNIQUE_INDEX,
+        [("document_id", pymongo.ASCENDING)],
+        unique=True,
+    ),
+    # cli_guides
+    IndexSpec(
+        MongoDbClient.CLI_GUIDES,
+        MongoDbClient.CLI_GUIDES_COMMAND_NAME_UNIQUE_INDEX,
+        [("command_name", pymongo.ASCENDING)],
+        unique=True,
+    ),
+    IndexSpec(
+        MongoDbClient.CLI_GUIDES,
+        MongoDbClient.CLI_GUIDES_SPARSE_DESCRIPTION_TEXT_INDEX,
+        [("description", pymongo.TEXT)],
+        sparse=True,
+    ),
+    # product_families
+    IndexSpec(
+        MongoDbClient.PRODUCT_FAMILIES,
+        MongoDbClient.PRODUCT_FAMILIES_NAME_UNIQUE_INDEX,
+        [("name", pymongo.ASCENDING)],
+        unique=True,
+    ),
+]
+
+# Queries run on every content request, as (collection, filter) pairs
+HOT_QUERIES: List[Tuple[str, dict]] = [
+    (MongoDbClient.PRODUCT_FAMILIES, {"name": ""}),
+    (MongoDbClient.ARTICLES, {"series": {"$in": [ObjectId()]}}),
+    (MongoDbClient.VIDEOS, {"series": {"$in": [ObjectId()]}}),
+]
+
+
+def get_index_specs(
+    collections: Optional[Sequence[str]] = None,
+) -> List[IndexSpec]:
+    """Return the registered specs, optionally limited to `collections`."""
+    if collections is None:
+        return list(INDEXES)
+    return [spec for spec in INDEXES if spec.collection in collections]
+
+
+async def ensure_indexes(
+    client: MongoDbClient,
+    collections: Optional[Sequence[str]] = None,
+    include_search_indexes: bool = True,
+) -> Dict[str, List[str]]:
+    """
+    Create every registered index that does not exist yet.
+
+    Existing indexes are left untouched. An index whose name exists with different
+    keys is logged and reported as failed instead of being dropped. Search indexes
+    only exist on Atlas, so failing to list them is logged and skipped.
+
+    Args:
+        client (MongoDbClient): The database client.
+        collections (Optional[Sequence[str]]): Limit to these collections. (default: all)
+        include_search_indexes (bool): Also create Atlas Search indexes. (default: True)
+
+    Returns:
+        Dict[str, List[str]]: The names of the `created`, `existing` and `failed` indexes.
+    """
+    report: Dict[str, List[str]] = {"created": [], "existing": [], "failed": []}
+    specs = get_index_specs(collections)
+    for collection_name in dict.fromkeys(spec.collection for spec in specs):
+        collection = client.collections[collection_name]
+        collection_specs = [s for s in specs if s.collection == collection_name]
+
+        existing = await collection.index_information()
+        for spec in collection_specs:
+            if spec.kind != "index":
+                continue
+            if spec.name in existing:
+                if spec.has_different_keys(existing[spec.name]):
+                    logger.warning(
+                        "Index %s.%s exists with keys %s, expected %s",
+                        collection_name,
+                        spec.name,
+                        existing[spec.name]["key"],
+                        spec.keys,
+                    )
+                    report["failed"].append(f"{collection_name}.{spec.name}")
+                else:
+                    report["existing"].append(f"{collection_name}.{spec.name}")
+                continue
+            try:
+                await collection.create_indexes([spec.to_index_model()])
+                report["created"].append(f"{collection_name}.{spec.name}")
+            except OperationFailure as err:
+                logger.warning(
+                    "Could not create index %s.%s: %s", collection_name, spec.name, err
+                )
+                report["failed"].append(f"{collection_name}.{spec.name}")
+
+        search_specs = [s for s in collection_specs if s.kind != "index"]
+        if not include_search_indexes or not search_specs:
+            continue
+        try:
+            search_indexes = await collection.list_search_indexes().to_list(None)
+            existing_search = {index["name"] for index in search_indexes}
+        except OperationFailure as err:
+            logger.warning(
+                "Search indexes are not available on %s: %s", collection_name, err
+            )
+            report["failed"].extend(f"{collection_name}.{s.name}" for s in search_specs)
+            continue
+        for spec in search_specs:
+            if spec.name in existing_search:
+                report["existing"].append(f"{collection_name}.{spec.name}")
+                continue
+            try:
+                await collection.create_search_index(spec.to_search_index_model())
+                report["created"].append(f"{collection_name}.{spec.name}")
+            except OperationFailure as err:
+                logger.warning(
+                    "Could not create search index %s.%s: %s",
+                    collection_name,
+                    spec.name,
+                    err,
+                )
+                report["failed"].append(f"{collection_name}.{spec.name}")
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Collect the stage names of a query plan tree."""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def verify_hot_queries(
+    client: MongoDbClient,
+    queries: Optional[Sequence[Tuple[str, dict]]] = None,
+) -> List[Tuple[str, dict]]:
+    """
+    Explain the hot queries and warn about the ones that need a collection scan.
+
+    Args:
+        client (MongoDbClient): The database client.
+        queries (Optional[Sequence[Tuple[str, dict]]]): The queries to check. (default: HOT_QUERIES)
+
+    Returns:
+        List[Tuple[str, dict]]: The queries whose winning plan contains a COLLSCAN.
+    """
+    collection_scans = []
+    for collection_name, query in HOT_QUERIES if queries is None else queries:
+        try:
+            explain = await client.db.command(
+                {
+                    "explain": {"find": collection_name, "filter": query},
+                    "verbosity": "queryPlanner",
+                }
+            )
+        except OperationFailure as err:
+            logger.warning("Could not explain %s %s: %s", collection_name, query, err)
+            continue
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            logger.warning(
+                "Query on %s with filter %s needs a collection scan, "
+                "run ensure_indexes() to create the missing index.",
+                collection_name,
+                query,
+            )
+            collection_scans.append((collection_name, query))
+    return collection_scans
@@ -0,0 +1,306 @@
+"""
+In-process read mirror of the collections the content API serves.
+
+Only the seed process writes `product_families`, `articles` and `videos`, and together they
+are a few MB, so the API can keep a copy in memory. `ReadMirror.start` bulk loads the
+collections and then follows a change stream. When change streams are not available, e.g.
+on a standalone server, it reloads the collections on an interval instead.
+
+The operation time is read before the bulk load and the change stream starts from it, so
+writes made while the collections load are applied once the stream opens instead of lost.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+from bson import ObjectId, encode
+from bson.raw_bson import RawBSONDocument
+from bson.timestamp import Timestamp
+from pymongo.errors import OperationFailure, PyMongoError
+from .database import MongoDbClient
+from .transcoder import RAW_CODEC_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+ChangeEvent = Union[Dict[str, Any], RawBSONDocument]
+EventSource = Callable[[], AsyncIterator[ChangeEvent]]
+
+# Server error codes after which a change stream cannot be resumed and has to start over
+CHANGE_STREAM_HISTORY_LOST = 286
+CHANGE_STREAM_FATAL_ERROR = 280
+
+
+class ReadMirror:
+    """
+    Keeps `product_families`, `articles` and `videos` in memory, indexed by product family.
+
+    The mirror exposes the same by-family getters as `MongoDbClient` and returns the
+    documents as `RawBSONDocument`s, so routes can use either one.
+
+    Args:
+        client (MongoDbClient): The database client used to load and watch the collections.
+        event_source (Optional[EventSource]): A callable returning an async iterator of change
+            events, used instead of the database change stream. (default: None)
+        poll_interval (float): Seconds between reloads when change streams are not available. (default: 60)
+    """
+
+    COLLECTIONS = (
+        MongoDbClient.PRODUCT_FAMILIES,
+        MongoDbClient.ARTICLES,
+        MongoDbClient.VIDEOS,
+    )
+
+    # Collections whose documents reference product families through `series`
+    SERIES_COLLECTIONS = (MongoDbClient.ARTICLES, MongoDbClient.VIDEOS)
+
+    def __init__(
+        self,
+        client: MongoDbClient,
+        event_source: Optional[EventSource] = None,
+        poll_interval: float = 60.0,
+    ):
+        self.client = client
+        self.event_source = event_source
+        self.poll_interval = poll_interval
+        self.ready = False
+        self._documents: Dict[str, Dict[Any, RawBSONDocument]] = {
+            name: {} for name in self.COLLECTIONS
+        }
+        self._family_ids_by_name: Dict[str, ObjectId] = {}
+        # Dicts keyed by document _id keep the load order, like a natural order query
+        self._ids_by_family: Dict[str, Dict[ObjectId, Dict[Any, None]]] = {
+            name: {} for name in self.SERIES_COLLECTIONS
+        }
+        self._resume_token = None
+        self._start_at: Optional[Timestamp] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Load the collections and start following changes in the background."""
+        await self.load()
+        self._task = asyncio.ensure_future(self._follow())
+
+    async def stop(self) -> None:
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def load(self) -> None:
+        """Replace the mirrored state with a fresh copy of every collection."""
+        if self.event_source is None:
+            # Changes made from here on are replayed by the stream, replaying a change
+            # that the load below already picked up is harmless
+            self._start_at = await self._operation_time()
+            self._resume_token = None
+        documents = {}
+        for name in self.COLLECTIONS:
+            collection = self.client.collections[name].with_options(
+                codec_options=RAW_CODEC_OPTIONS
+            )
+            documents[name] = {
+                document["_id"]: document
+                for document in await collection.find({}).to_list(None)
+            }
+        self._documents = documents
+        self._rebuild_indexes()
+        self.ready = True
+        logger.info(
+            "Read mirror loaded "
+            + ", ".join(f"{len(documents[name])} {name}" for name in self.COLLECTIONS)
+        )
+
+    async def _operation_time(self) -> Optional[Timestamp]:
+        """The cluster time of the server, None on a standalone server without change streams."""
+        try:
+            reply = await self.client.db.command("ping")
+        except PyMongoError as err:
+            logger.warning(f"Could not read the operation time: {err}")
+            return None
+        return reply.get("operationTime")
+
+    def _rebuild_indexes(self) -> None:
+        self._family_ids_by_name = {
+            family["name"]: family_id
+            for family_id, family in self._documents[
+                MongoDbClient.PRODUCT_FAMILIES
+            ].items()
+        }
+        self._ids_by_family = {name: {} for name in self.SERIES_COLLECTIONS}
+        for name in self.SERIES_COLLECTIONS:
+            for document_id, document in self._documents[name].items():
+                self._index_series(name, document_id, document)
+
+    def _index_series(
+        self, collection_name: str, document_id: Any, document: RawBSONDocument
+    ) -> None:
+        for family_id in document.get("series") or []:
+            self._ids_by_family[collection_name].setdefault(family_id, {})[
+                document_id
+            ] = None
+
+    def _unindex_series(self, collection_name: str, document_id: Any) -> None:
+        previous = self._documents[collection_name].get(document_id)
+        if previous is None:
+            return
+        for family_id in previous.get("series") or []:
+            ids = self._ids_by_family[collection_name].get(family_id)
+            if ids is not None:
+                ids.pop(document_id, None)
+
+    def apply_change(self, event: ChangeEvent) -> None:
+        """
+        Apply one change stream event to the mirrored state.
+
+        Inserts, replaces and updates need the post-image in `fullDocument`, which the
+        change stream provides through `full_document="updateLookup"`.
+        """
+        operation = event["operationType"]
+        collection_name = event["ns"]["coll"]
+        if collection_name not in self._documents:
+            return
+        if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            raise _ReloadRequired(operation)
+
+        document_id = event["documentKey"]["_id"]
+        full_document = event.get("fullDocument")
+        if operation in ("insert", "replace", "update") and full_document is not None:
+            self._put(collection_name, document_id, full_document)
+        elif operation in ("delete", "update"):
+            # An update without a post-image means the document was deleted since
+            self._remove(collection_name, document_id)
+
+    def _put(
+        self,
+        collection_name: str,
+        document_id: Any,
+        document: Union[Dict[str, Any], RawBSONDocument],
+    ) -> None:
+        if not isinstance(document, RawBSONDocument):
+            document = RawBSONDocument(encode(document))
+        if collection_name == MongoDbClient.PRODUCT_FAMILIES:
+            previous = self._documents[collection_name].get(document_id)
+            if previous is not None:
+                self._family_ids_by_name.pop(previous["name"], None)
+            self._family_ids_by_name[document["name"]] = document_id
+        else:
+            self._unindex_series(collection_name, document_id)
+            self._index_series(collection_name, document_id, document)
+        self._documents[collection_name][document_id] = document
+
+    def _remove(self, collection_name: str, document_id: Any) -> None:
+        if collection_name == MongoDbClient.PRODUCT_FAMILIES:
+            previous = self._documents[collection_name].get(document_id)
+            if previous is not None:
+                self._family_ids_by_name.pop(previous["name"], None)
+        else:
+            self._unindex_series(collection_name, document_id)
+        self._documents[collection_name].pop(document_id, None)
+
+    async def _follow(self) -> None:
+        """Apply change events until stopped, reloading or polling when the stream fails."""
+        while True:
+            try:
+                if not self.ready:
+                    await self.load()
+                async for event in self._events():
+                    try:
+                        self.apply_change(event)
+                    except _ReloadRequired as reload:
+                        logger.info(f"Read mirror reloading after {reload}")
+                        self._resume_token = None
+                        await self.load()
+                        break
+                    else:
+                        self._resume_token = event.get("_id")
+                else:
+                    # The event source ended without asking for a reload
+                    return
+            except OperationFailure as err:
+                if err.code in (CHANGE_STREAM_HISTORY_LOST, CHANGE_STREAM_FATAL_ERROR):
+                    logger.warning(
+                        f"Read mirror change stream cannot resume ({err}), reloading"
+                    )
+                    self.ready = False
+                    continue
+                logger.warning(
+                    f"Change streams are not available ({err}), "
+                    f"reloading the read mirror every {self.poll_interval}s"
+                )
+                await self._poll()
+                return
+            except PyMongoError as err:
+                logger.warning(f"Read mirror change stream failed: {err}, resuming")
+                await asyncio.sleep(1)
+            except Exception:
+                # The mirrored state may be inconsistent, stop serving it until reloaded
+                logger.exception("Read mirror failed to apply a change, reloading")
+                self.ready = False
+                await asyncio.sleep(1)
+
+    def _events(self) -> AsyncIterator[ChangeEvent]:
+        if self.event_source is not None:
+            return self.event_source()
+        return self._change_stream()
+
+    async def _change_stream(self) -> AsyncIterator[ChangeEvent]:
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.COLLECTIONS)}}}]
+        database = self.client.db.with_options(codec_options=RAW_CODEC_OPTIONS)
+        async with database.watch(
+            pipeline,
+            full_document="updateLookup",
+            resume_after=self._resume_token,
+            start_at_operation_time=(
+                self._start_at if self._resume_token is None else None
+            ),
+        ) as stream:
+            async for event in stream:
+                yield event
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.load()
+            except PyMongoError as err:
+                logger.warning(f"Read mirror reload failed: {err}")
+
+    def _get_product_family_id(self, product_family_name: str) -> ObjectId:
+        product_family_id = self._family_ids_by_name.get(product_family_name)
+        if product_family_id is None:
+            raise ValueError(f"Product Family {product_family_name} not found")
+        return product_family_id
+
+    def _get_by_product_family(
+        self, collection_name: str, product_family_name: str
+    ) -> List[RawBSONDocument]:
+        product_family_id = self._get_product_family_id(product_family_name)
+        documents = self._documents[collection_name]
+        ids = self._ids_by_family[collection_name].get(product_family_id, ())
+        return [documents[document_id] for document_id in ids]
+
+    async def get_one_product_family_by_name(self, product_family_name: str):
+        product_family_id = self._family_ids_by_name.get(product_family_name)
+        if product_family_id is None:
+            return None
+        return self._documents[MongoDbClient.PRODUCT_FAMILIES][product_family_id]
+
+    async def get_articles_by_product_family(
+        self, product_family_name: str, raw: bool = True
+    ) -> List[RawBSONDocument]:
+        """Same as `MongoDbClient.get_articles_by_product_family`, always returns raw documents."""
+        return self._get_by_product_family(MongoDbClient.ARTICLES, product_family_name)
+
+    async def get_videos_by_product_family(
+        self, product_family_name: str, raw: bool = True
+    ) -> List[RawBSONDocument]:
+        """Same as `MongoDbClient.get_videos_by_product_family`, always returns raw documents."""
+        return self._get_by_product_family(MongoDbClient.VIDEOS, product_family_name)
+
+
+class _ReloadRequired(Exception):
+    """Raised for change events after which the mirror has to be reloaded."""
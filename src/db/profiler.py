@@ -0,0 +1,158 @@
+"""
+Slow query profiler for `MongoDbClient`.
+
+`MongoDbClient` reports the duration of every operation to `QueryProfiler.observe`. When an
+operation takes longer than the threshold, the profiler runs `explain` with the
+`executionStats` verbosity in a background task and keeps the result in a fixed-size ring buffer.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Union
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfiler:
+    """
+    Times MongoDbClient operations and samples explain plans of the slow ones.
+
+    Attributes:
+        threshold_ms (float): Operations slower than this are recorded.
+        sample_rate (float): The fraction of slow operations that are recorded, between 0 and 1.
+        max_records (int): The number of slow query records kept in the ring buffer.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 100.0,
+        sample_rate: float = 1.0,
+        max_records: int = 100,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=max_records)
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """The slow query records, oldest first."""
+        return list(self._records)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Call count, total and max duration in milliseconds per `collection.operation`."""
+        return {key: dict(value) for key, value in self._stats.items()}
+
+    def clear(self) -> None:
+        self._records.clear()
+        self._stats.clear()
+
+    def observe(
+        self,
+        db,
+        operation: str,
+        collection_name: str,
+        command: Optional[Dict[str, Any]],
+        duration: float,
+    ) -> None:
+        """
+        Record the duration of an operation.
+
+        Args:
+            db: The motor database used to run the explain.
+            operation (str): The MongoDbClient operation, e.g. "find".
+            collection_name (str): The collection the operation ran on.
+            command (Optional[Dict[str, Any]]): The command to explain, e.g. `{"find": ..., "filter": ...}`.
+                Operations that cannot be explained pass None and are recorded without a plan.
+            duration (float): The duration in seconds.
+        """
+        duration_ms = duration * 1000
+        stats = self._stats.setdefault(
+            f"{collection_name}.{operation}",
+            {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+        )
+        stats["count"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+        if duration_ms < self.threshold_ms or random.random() >= self.sample_rate:
+            return
+        record = {
+            "operation": operation,
+            "collection": collection_name,
+            "command": command,
+            "duration_ms": round(duration_ms, 3),
+            "timestamp": time.time(),
+        }
+        if command is None:
+            self._records.append(record)
+            return
+        task = asyncio.ensure_future(self._explain(db, record))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def wait_pending(self) -> None:
+        """Wait for the explain tasks that are still running."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def _explain(self, db, record: Dict[str, Any]) -> None:
+        try:
+            explain = await db.command(
+                {"explain": record["command"], "verbosity": "executionStats"}
+            )
+            record.update(self.summarize(explain))
+        except PyMongoError as err:
+            logger.warning(f"Could not explain slow {record['operation']}: {err}")
+            record["explain_error"] = str(err)
+        self._records.append(record)
+
+    @classmethod
+    def summarize(cls, explain: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Pull the interesting numbers out of an explain result.
+
+        Aggregations nest the execution stats inside their stages, so every
+        `executionStats` document found in the result is added up.
+
+        Returns:
+            Dict[str, Any]: `docs_examined`, `keys_examined`, `docs_returned`, the plan `stages`
+            and `collscan`, which is True when any plan scans a whole collection.
+        """
+        summary = {
+            "docs_examined": 0,
+            "keys_examined": 0,
+            "docs_returned": 0,
+            "stages": [],
+        }
+        for execution_stats in cls._find_key(explain, "executionStats"):
+            summary["docs_examined"] += execution_stats.get("totalDocsExamined", 0)
+            summary["keys_examined"] += execution_stats.get("totalKeysExamined", 0)
+            summary["docs_returned"] += execution_stats.get("nReturned", 0)
+        for plan in cls._find_key(explain, "winningPlan"):
+            summary["stages"].extend(cls._find_key(plan, "stage"))
+        for stage in explain.get("stages", []):
+            summary["stages"].extend(name for name in stage if name.startswith("$"))
+        summary["collscan"] = "COLLSCAN" in summary["stages"]
+        return summary
+
+    @classmethod
+    def _find_key(cls, value: Union[Dict[str, Any], List[Any], Any], key: str):
+        """Yield every value stored under `key` anywhere in a nested document."""
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if k == key:
+                    yield v
+                else:
+                    yield from cls._find_key(v, key)
+        elif isinstance(value, list):
+            for item in value:
+                yield from cls._find_key(item, key)
@@ -0,0 +1,121 @@
+"""
+JSON responses transcoded from BSON, skipping pydantic.
+
+The by-family routes return many documents, and validating each one into a response model and
+running it through `jsonable_encoder` takes most of their time. Instead the documents are read
+as `RawBSONDocument`s, decoded by the bson C extension and written with `json.dumps`. A
+`ModelProjection` keeps only the fields of the route's response model, filling in the defaults
+of missing optional fields, so the JSON has the fields the response model would give. The values
+themselves are not validated.
+"""
+
+import json
+import base64
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Type, Union
+from uuid import UUID
+from bson import ObjectId, decode
+from bson.binary import Binary
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from bson.raw_bson import RawBSONDocument
+from pydantic import BaseModel
+
+# Codec options used to read documents that are transcoded to JSON, see `raw_bson_to_json`
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+# Decode straight into plain dicts, the C extension does this without touching Python code
+_DECODE_OPTIONS = CodecOptions(document_class=dict)
+
+
+def _default(obj: Any) -> Any:
+    """Serialize the BSON types `json` does not know about."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal128, UUID)):
+        return str(obj)
+    if isinstance(obj, (Binary, bytes)):
+        return base64.b64encode(obj).decode("ascii")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ModelProjection:
+    """
+    The fields of a pydantic model, by alias, and the defaults of its optional fields.
+
+    Args:
+        model (Type[BaseModel]): The response model documents are projected to.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = tuple(
+            field.alias or name for name, field in model.model_fields.items()
+        )
+        self.defaults: Dict[str, Any] = {
+            field.alias or name: field.get_default(call_default_factory=True)
+            for name, field in model.model_fields.items()
+            if not field.is_required()
+        }
+
+    def apply(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep the model's fields of `document`, in model order, with the missing defaults."""
+        return {
+            name: document[name] if name in document else self.defaults[name]
+            for name in self.fields
+            if name in document or name in self.defaults
+        }
+
+
+def raw_bson_to_json(
+    document: Union[RawBSONDocument, bytes],
+    projection: Optional[ModelProjection] = None,
+) -> str:
+    """
+    Transcode a single BSON document to a JSON string.
+
+    ObjectIds are written as plain strings and dates as ISO 8601 strings, which is how
+    the pydantic response models serialize them.
+
+    Args:
+        document (Union[RawBSONDocument, bytes]): The raw document or its BSON bytes.
+        projection (Optional[ModelProjection]): Keep only the fields of this model, every
+            stored field when None. (default: None)
+
+    Returns:
+        str: The JSON representation of the document.
+    """
+    data = document.raw if isinstance(document, RawBSONDocument) else document
+    decoded = decode(data, _DECODE_OPTIONS)
+    if projection is not None:
+        decoded = projection.apply(decoded)
+    return json.dumps(
+        decoded,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def raw_bson_list_to_json(
+    documents: Iterable[Union[RawBSONDocument, bytes]],
+    projection: Optional[ModelProjection] = None,
+) -> str:
+    """
+    Transcode a list of BSON documents to a JSON array.
+
+    Args:
+        documents (Iterable[Union[RawBSONDocument, bytes]]): The raw documents.
+        projection (Optional[ModelProjection]): Keep only the fields of this model, every
+            stored field when None. (default: None)
+
+    Returns:
+        str: The JSON array containing every document.
+    """
+    return (
+        "["
+        + ",".join(raw_bson_to_json(document, projection) for document in documents)
+        + "]"
+    )
@@ -1,3 +1,8 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 def sort_families(self, device_name):
     """This function takes device_name as input to parse which family it belongs to"""
     device_family = ""
@@ -1087,7 +1092,7 @@ def sort_devices(self, device_name):
             "FINDIT",
         ],
     }
-    print("device_name_upper_str from first for loop is:", device_name_upper_str)
+    logger.debug("Sorting device %s", device_name_upper_str)
     # Use the proper cisco name as a key to reference user input for device_name
 
     for device_key_proper_cisco_name in all_devices_List.keys():
@@ -12,9 +12,11 @@ from fastapi.security.oauth2 import OAuth2PasswordBearer
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from bson import ObjectId
-from typing import List, Optional, Union
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import PyMongoError
+from typing import List, Optional, Tuple, Union
 import time
 import json
 import os
@@ -27,6 +29,10 @@ import logging
 import logging.config
 from dotenv import find_dotenv, load_dotenv
 from src.db.database import MongoDbClient
+from src.db.indexes import ensure_indexes, verify_hot_queries
+from src.db.profiler import QueryProfiler
+from src.db.mirror import ReadMirror
+from src.db.transcoder import ModelProjection, raw_bson_list_to_json
 from src.db.model import ProductFamily, Article, Video
 from pydantic import BaseModel, Field
 
@@ -82,11 +88,38 @@ async def startup_db_client():
         conn_str=os.getenv("MONGO_DB_CONN_STR"),
         username=os.getenv("MONGODB_APP_USER"),
         password=os.getenv("MONGODB_APP_USER_PASSWORD"),
+        profiler=QueryProfiler(
+            threshold_ms=float(os.getenv("MONGODB_SLOW_QUERY_MS", "100")),
+            sample_rate=float(os.getenv("MONGODB_SLOW_QUERY_SAMPLE_RATE", "1.0")),
+        ),
     )
+    try:
+        if os.getenv("MONGODB_ENSURE_INDEXES", "false").lower() == "true":
+            report = await ensure_indexes(app.state.mongodb_client)
+            logger.info(f"Indexes created: {report['created']}")
+        await verify_hot_queries(app.state.mongodb_client)
+    except PyMongoError as err:
+        logger.warning(f"Could not verify indexes on startup: {err}")
+
+    app.state.read_mirror = None
+    if os.getenv("MONGODB_READ_MIRROR", "false").lower() == "true":
+        read_mirror = ReadMirror(
+            app.state.mongodb_client,
+            poll_interval=float(os.getenv("MONGODB_READ_MIRROR_POLL_SECONDS", "60")),
+        )
+        try:
+            await read_mirror.start()
+            app.state.read_mirror = read_mirror
+        except PyMongoError as err:
+            logger.warning(
+                f"Could not load the read mirror, reading from MongoDB: {err}"
+            )
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if getattr(app.state, "read_mirror", None) is not None:
+        await app.state.read_mirror.stop()
     if app.state.mongodb_client is not None:
         await app.state.mongodb_client.close()
 
@@ -177,6 +210,35 @@ async def process_time(request, call_next):
     return response
 
 
+def get_content_source() -> Union[ReadMirror, MongoDbClient]:
+    """Serve by-family reads from the read mirror when it is loaded."""
+    read_mirror = getattr(app.state, "read_mirror", None)
+    if read_mirror is not None and read_mirror.ready:
+        return read_mirror
+    return app.state.mongodb_client
+
+
+def transcoded_json_response(
+    **fields: Tuple[List[RawBSONDocument], ModelProjection]
+) -> Response:
+    """
+    Build a JSON object response from lists of `RawBSONDocument`s, each projected to the
+    fields of its response model.
+
+    The documents are transcoded to JSON without pydantic validation and `jsonable_encoder`,
+    see `src.db.transcoder`. The route's `response_model` still documents the schema.
+    """
+    body = ",".join(
+        f"{json.dumps(name)}:{raw_bson_list_to_json(documents, projection)}"
+        for name, (documents, projection) in fields.items()
+    )
+    return Response(content="{" + body + "}", media_type="application/json")
+
+
+ARTICLE_PROJECTION = ModelProjection(Article)
+VIDEO_PROJECTION = ModelProjection(Video)
+
+
 ######### PRODUCT FAMILY NAME API #########
 class FamilyName(BaseModel):
     family_name: str
@@ -193,9 +255,9 @@ async def get_articles_by_product_family(
     family: FamilyName, has_access: dict = Depends(authenticate_user)
 ):
     pf = family.family_name
-    articles = await app.state.mongodb_client.get_articles_by_product_family(pf)
+    articles = await get_content_source().get_articles_by_product_family(pf, raw=True)
 
-    return {"articles": articles}
+    return transcoded_json_response(articles=(articles, ARTICLE_PROJECTION))
 
 
 class GetVideoResponse(BaseModel):
@@ -205,8 +267,8 @@ class GetVideoResponse(BaseModel):
 @app.post("/api/v1/videos/by-family", response_model=GetVideoResponse, tags=["videos"])
 async def get_videos_by_product_family(family: FamilyName):
     pf = family.family_name
-    videos = await app.state.mongodb_client.get_videos_by_product_family(pf)
-    return {"videos": videos}
+    videos = await get_content_source().get_videos_by_product_family(pf, raw=True)
+    return transcoded_json_response(videos=(videos, VIDEO_PROJECTION))
 
 
 class GetArticlesVideosResponse(BaseModel):
@@ -224,9 +286,11 @@ async def get_all_content(
 ):
     pf = family.family_name
     print(f"Product Family: {pf}")
-    articles = await app.state.mongodb_client.get_articles_by_product_family(pf)
-    videos = await app.state.mongodb_client.get_videos_by_product_family(pf)
-    return {"articles": articles, "videos": videos}
+    articles = await get_content_source().get_articles_by_product_family(pf, raw=True)
+    videos = await get_content_source().get_videos_by_product_family(pf, raw=True)
+    return transcoded_json_response(
+        articles=(articles, ARTICLE_PROJECTION), videos=(videos, VIDEO_PROJECTION)
+    )
 
 
 class ContentIds(BaseModel):
@@ -417,5 +481,18 @@ async def search_collection(collection_type: str, query: str):
     # )
 
 
+######### ADMIN API #########
+@app.get("/api/v1/admin/slow-queries", tags=["admin"])
+async def get_slow_queries(has_access: dict = Depends(authenticate_user)):
+    profiler: QueryProfiler = app.state.mongodb_client.profiler
+    if profiler is None:
+        return {"threshold_ms": None, "records": [], "stats": {}}
+    return {
+        "threshold_ms": profiler.threshold_ms,
+        "records": handle_objectid(profiler.records),
+        "stats": profiler.stats,
+    }
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", port=8000, reload=True)
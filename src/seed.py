@@ -1,11 +1,17 @@
-import os
-import sys
+"""
+Seeds the database with the scraped documents.
+
+Run it with `python -m src seed <collection> ...`, see `src/cli.py`. The client connects with
+`MONGO_DB_CONN_STR`, `MONGODB_APP_USER` and `MONGODB_APP_USER_PASSWORD` on first use.
+"""
 
-sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+import asyncio
+import os
 import json
 from pathlib import Path
-from db.database import MongoDbClient
-from dotenv import load_dotenv, find_dotenv
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+from src.db.database import MongoDbClient
+from src.db.indexes import ensure_indexes
 import pymongo
 from datetime import datetime
 from pymongo.errors import (
@@ -15,23 +21,28 @@ from pymongo.errors import (
     CollectionInvalid,
 )
 from bson import ObjectId
-from db.model import ProductFamily, Article, Video
+from src.db.model import ProductFamily, Article, Video
 
-load_dotenv(find_dotenv(filename=".env"))
+_client: Optional[MongoDbClient] = None
 
-client = MongoDbClient(
-    conn_str=os.getenv("MONGO_DB_CONN_STR"),
-    username=os.getenv("MONGODB_APP_USER"),
-    password=os.getenv("MONGODB_APP_USER_PASSWORD"),
-)
+
+def get_client() -> MongoDbClient:
+    """The client the seed functions share, created from the environment on first use."""
+    global _client
+    if _client is None:
+        _client = MongoDbClient(
+            conn_str=os.getenv("MONGO_DB_CONN_STR"),
+            username=os.getenv("MONGODB_APP_USER"),
+            password=os.getenv("MONGODB_APP_USER_PASSWORD"),
+        )
+    return _client
 
 
 ############# SEED PRODUCT FAMILY DATA #############
 async def seed_product_families():
-    index = await client.collections[client.PRODUCT_FAMILIES].create_index(
-        [("name", pymongo.ASCENDING)], unique=True
-    )
-    print(f"Index created: {index}")
+    client = get_client()
+    index = await ensure_indexes(client, [client.PRODUCT_FAMILIES])
+    print(f"Indexes: {index}")
     pf = json.load(open(f"{os.getcwd()}/data/schema/product_families.json", "r"))
     print(pf)
     pf_ids = []
@@ -73,102 +84,73 @@ async def seed_product_families():
     return pf_ids
 
 
-import asyncio
-
-# product_family_ids = asyncio.run(seed_product_families())
-# print(product_family_ids)
+async def get_product_families_by_name():
+    """Load every product family once so seeding does not query per document."""
+    client = get_client()
+    product_families = await client.get_all_product_families()
+    return {pf["name"]: pf for pf in product_families}
 
 
 async def seed_video():
-    unique_title_index = await client.collections[client.VIDEOS].create_index(
-        [("video_id", pymongo.ASCENDING)],
-        unique=True,
-        name=client.VIDEOS_YOUTUBE_ID_UNIQUE_INDEX,
-    )
-    # VIDEOS_SEARCH_INDEX_NAME = "videos_search_index"
-    print(f"Index created: {unique_title_index}")
+    client = get_client()
+    indexes = await ensure_indexes(client, [client.VIDEOS])
+    print(f"Indexes: {indexes}")
     videos = json.load(open(f"{os.getcwd()}/data/documents/youtube_videos.json", "r"))
-    video_ids = []
+    product_families = await get_product_families_by_name()
+    video_data = {}
+    series_updates = []
     for video in videos:
-        try:
-            pf_name = video["series"]
-            pf = await client.get_one_product_family_by_name(pf_name)
-            if not pf:
-                print(f"Product family {pf_name} not found. Skipping this video.")
-                continue
-            print(pf)
-            video_exists = await client.find_one(
-                client.VIDEOS, {"video_id": video["video_id"]}
-            )
-            if video_exists:
-                print(
-                    f"Video {video['video_id']} already exists. Adding Product Family ID to series if the Product Family Exists."
-                )
-                updated_video = await client.update_one(
-                    client.VIDEOS,
-                    {"_id": video_exists["_id"]},
-                    {"$addToSet": {"series": pf["_id"]}},
-                )
-                video_ids.append(updated_video.upserted_id)
-            else:
-                video_data = {
-                    "series": [pf["_id"]],
-                    "title": video["title"],
-                    "published_date": datetime.fromisoformat(
-                        video["published_date"].replace("Z", "+00:00")
-                    ),
-                    "description": video["description"],
-                    "url": video["url"],
-                    "video_id": video["video_id"],
-                    "views": int(video["views"]),
-                    "likes": int(video["likes"]),
-                    "duration": video["duration"],
-                    "comments": int(video["comments"]),
-                    "kind": "youtube",
-                    "tags": video["tags"],
-                    "transcript": video["transcript"],
-                    "category": video["category"],
-                    "type": "Video",
-                }
-                print(f"Video data: {video_data}")
-                created_video_id = await client.insert_one(client.VIDEOS, video_data)
-
-                print(f"New video _id: {created_video_id}")
-                video_ids.append(created_video_id)
-
-        except DuplicateKeyError as err:
-            print(f"A duplicate key error occurred: {err}. Skipping this item.")
-            break
-        except OperationFailure as err:
-            print(f"An operation failure occurred: {err}")
+        pf_name = video["series"]
+        pf = product_families.get(pf_name)
+        if not pf:
+            print(f"Product family {pf_name} not found. Skipping this video.")
             continue
-        except DocumentTooLarge as err:
-            print(f"Document too large: {err}")
-            print(f"Video id: {video['id']}")
-    return video_ids
-
+        # The same video appears once per product family, the first entry wins and
+        # the later ones only add their product family to the video's series.
+        video_data.setdefault(
+            video["video_id"],
+            {
+                "title": video["title"],
+                "published_date": datetime.fromisoformat(
+                    video["published_date"].replace("Z", "+00:00")
+                ),
+                "description": video["description"],
+                "url": video["url"],
+                "video_id": video["video_id"],
+                "views": int(video["views"]),
+                "likes": int(video["likes"]),
+                "duration": video["duration"],
+                "comments": int(video["comments"]),
+                "kind": "youtube",
+                "tags": video["tags"],
+                "transcript": video["transcript"],
+                "category": video["category"],
+                "type": "Video",
+            },
+        )
+        series_updates.append(({"video_id": video["video_id"]}, {"series": pf["_id"]}))
 
-# video_ids = asyncio.run(seed_video())
-# print(video_ids)
+    upserted = await client.bulk_upsert(
+        client.VIDEOS, video_data.values(), key="video_id"
+    )
+    print(f"Videos upserted: {upserted}")
+    series_added = await client.bulk_add_to_set(client.VIDEOS, series_updates)
+    print(f"Video series updated: {series_added}")
+    return list(upserted["upserted_ids"].values())
 
 
 async def seed_articles():
+    client = get_client()
     articles_json = json.load(
         open(f"{os.getcwd()}/data/documents/articles_schema.json", "r")
     )
-    # ARTICLES_SEARCH_INDEX_NAME = "articles_search_index"
-    # ARTICLES_DOC_ID_UNIQUE_INDEX = "doc_id_unique_index"
-    # Create the doc_id index
-    doc_id_index = await client.collections[client.ARTICLES].create_index(
-        [("document_id", pymongo.ASCENDING)],
-        unique=True,
-        name=client.ARTICLES_DOC_ID_UNIQUE_INDEX,
-    )
-    print(f"Index created: {doc_id_index}")
+    indexes = await ensure_indexes(client, [client.ARTICLES])
+    print(f"Indexes: {indexes}")
+    product_families = await get_product_families_by_name()
     # We need to do some transformation on the articles data before we can insert it into the database
     for article in articles_json:
         series = article["series"]
-        pf = await client.get_one_product_family_by_name(series)
+        pf = product_families.get(series)
         applicable_devices = article["applicable_devices"]
         for device in article["applicable_devices"]:
             if device["software_link"] is None:
@@ -181,118 +163,118 @@ async def seed_articles():
             if "video_src" not in step:
                 step["video_src"] = None
 
-    # Now we can insert the articles into the database
-    article_ids = []
+    # Now we can upsert the articles into the database
+    article_data = {}
+    series_updates = []
     for article in articles_json:
         series = article["series"]
-        pf = await client.get_one_product_family_by_name(series)
+        pf = product_families.get(series)
         if not pf:
             print(
                 f"Product family {series} not found. Skipping this article {article['title']}."
             )
             continue
-        existing_article = await client.find_one(
-            client.ARTICLES, {"document_id": article["document_id"]}
+        article_data.setdefault(
+            article["document_id"],
+            {
+                "title": article["title"],
+                "document_id": article["document_id"],
+                "category": article["category"],
+                "url": article["url"],
+                "objective": article["objective"] if article["objective"] else None,
+                "applicable_devices": article["applicable_devices"],
+                "intro": article["intro"] if article["intro"] else None,
+                "steps": article["steps"],
+                "revision_history": (
+                    article["revision_history"] if article["revision_history"] else []
+                ),
+                "type": "Article",
+            },
+        )
+        series_updates.append(
+            ({"document_id": article["document_id"]}, {"series": pf["_id"]})
         )
-        if existing_article:
-            print(f"Article {article['document_id']} already exists.")
-            updated_article = await client.update_one(
-                client.ARTICLES,
-                {"_id": existing_article["_id"]},
-                {"$addToSet": {"series": pf["_id"]}},
-            )
-            print(f"Updated article: {updated_article.upserted_id}")
-            article_ids.append(updated_article.upserted_id)
-        else:
-            print(f"Inserting new article: {article['title']}")
-            try:
-                article_data = {
-                    "series": [pf["_id"]],
-                    "title": article["title"],
-                    "document_id": article["document_id"],
-                    "category": article["category"],
-                    "url": article["url"],
-                    "objective": article["objective"] if article["objective"] else None,
-                    "applicable_devices": article["applicable_devices"],
-                    "intro": article["intro"] if article["intro"] else None,
-                    "steps": article["steps"],
-                    "revision_history": (
-                        article["revision_history"]
-                        if article["revision_history"]
-                        else []
-                    ),
-                    "type": "Article",
-                }
-                created_article_id = await client.insert_one(
-                    client.ARTICLES, article_data
-                )
-                article_ids.append(created_article_id)
-            except DuplicateKeyError as err:
-                print(f"A duplicate key error occurred: {err}. Skipping this item.")
-                break
-            except OperationFailure as err:
-                print(f"An operation failure occurred: {err}")
-                continue
-            except DocumentTooLarge as err:
-                print(f"Document too large: {err}")
-                continue
-            except CollectionInvalid as err:
-                print(f"Validation Error: {err}")
-                continue
-
-    return article_ids
-
 
-article_ids = asyncio.run(seed_articles())
-print(article_ids)
+    upserted = await client.bulk_upsert(
+        client.ARTICLES, article_data.values(), key="document_id"
+    )
+    print(f"Articles upserted: {upserted}")
+    series_added = await client.bulk_add_to_set(client.ARTICLES, series_updates)
+    print(f"Article series updated: {series_added}")
+    return list(upserted["upserted_ids"].values())
 
 
 async def seed_admin_guides():
+    client = get_client()
     # LOOP THROUGH DIRECTORY AND GET ALL FILES
-    import os
-
-    topic_text_index = await client.collections[client.ADMIN_GUIDES].create_index(
-        [("topic", pymongo.TEXT)], name=client.ADMIN_GUIDES_TOPIC_TEXT_INDEX
-    )
-    print(f"Index created: {topic_text_index}")
-    doc_id_index = await client.collections[client.ADMIN_GUIDES].create_index(
-        [("document_id", pymongo.ASCENDING)],
-        unique=True,
-        name=client.ADMIN_GUIDES_DOC_ID_UNIQUE_INDEX,
-    )
-    print(f"Index created: {doc_id_index}")
-    admin_guides_ids = []
+    indexes = await ensure_indexes(client, [client.ADMIN_GUIDES])
+    print(f"Indexes: {indexes}")
+    product_families = await get_product_families_by_name()
+    admin_guide_data = {}
     files = os.listdir(f"{os.getcwd()}/data/admin_guides")
     for file in files:
         print(f"Processing file: {file}")
         admin_guide = json.load(open(f"{os.getcwd()}/data/admin_guides/{file}", "r"))
         for document in admin_guide:
             series = document["metadata"]["concept"]
-            pf = await client.get_one_product_family_by_name(series)
+            pf = product_families.get(series)
             if not pf:
                 print(
                     f"Product family {series} not found. Skipping this admin guide {document['metadata']['title']}."
                 )
                 continue
-            try:
-                admin_guide = {
+            # doc_id is derived from the url and topic of the section, so seeding a
+            # scrape again updates the sections in place
+            admin_guide_data.setdefault(
+                document["metadata"]["doc_id"],
+                {
                     "series": pf["_id"],
                     "title": document["metadata"]["title"],
                     "topic": document["metadata"]["topic"],
                     "document_id": document["metadata"]["doc_id"],
                     "url": document["metadata"]["source"],
                     "page_content": document["page_content"],
-                }
-                created_admin_guide_id = await client.insert_one(
-                    client.ADMIN_GUIDES, admin_guide
-                )
-                admin_guides_ids.append((pf["_id"], created_admin_guide_id))
+                },
+            )
 
-            except Exception as err:
-                print(f"{err}. Skipping this item.")
-                continue
-    return admin_guides_ids
+    upserted = await client.bulk_upsert(
+        client.ADMIN_GUIDES, admin_guide_data.values(), key="document_id"
+    )
+    print(f"Admin guides upserted: {upserted}")
+    return list(upserted["upserted_ids"].values())
+
+
+# The collections `seed` fills, in the order they are seeded; articles and videos look up
+# their product families, so those are seeded first
+SEEDERS: Dict[str, Callable[[], Coroutine[Any, Any, List[Any]]]] = {
+    "product_families": seed_product_families,
+    "articles": seed_articles,
+    "videos": seed_video,
+    "admin_guides": seed_admin_guides,
+}
+
+
+def seed(collections: List[str]) -> Dict[str, List[Any]]:
+    """
+    Seed the given collections, in the order of `SEEDERS`.
+
+    Returns:
+        Dict[str, List[Any]]: The ids of the documents seeded into each collection.
+
+    Raises:
+        ValueError: If a collection has no seeder.
+    """
+    unknown = set(collections) - set(SEEDERS)
+    if unknown:
+        raise ValueError(
+            f"No seeder for {', '.join(sorted(unknown))}, use one of {', '.join(SEEDERS)}"
+        )
 
+    async def seed_all() -> Dict[str, List[Any]]:
+        return {
+            collection: await seeder()
+            for collection, seeder in SEEDERS.items()
+            if collection in collections
+        }
 
-# ag_guides_ids_tuples = asyncio.run(seed_admin_guides())
-# print(ag_guides_ids_tuples)
+    return asyncio.run(seed_all())
@@ -4,34 +4,80 @@ import os
 import json
 import aiohttp
 import asyncio
+import contextlib
+import copy
 import logging
 import warnings
 import time
 from hashlib import sha256
-from uuid import uuid4
 from datetime import date
-from typing import List, Optional, Dict, Any, Union, TypeVar, Sequence
-from bs4 import BeautifulSoup, Tag
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    List,
+    Optional,
+    Dict,
+    Any,
+    Union,
+    TypeVar,
+    Sequence,
+    AsyncIterator,
+    Tuple,
+    Iterable,
+)
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
 from pydantic import BaseModel, field_serializer
 from datetime import date
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
-from langchain.prompts import PromptTemplate
-from langchain_text_splitters import HTMLHeaderTextSplitter
-from dotenv import load_dotenv
+from src.services.categories import CategoryClassifier
+from src.services.document_ids import canonicalize_url, make_document_id
+from src.services.html_parsers import VALID_PARSERS, resolve_parser
+from src.services.http_cache import HttpCache, OfflineCacheMiss
+from src.services.instrumentation import LogSampler, SlowPageProfiler, StageTimer
+from src.services.rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
+# For the debug messages logged per element of a page
+node_logger = LogSampler(logger)
 
-load_dotenv()
 
 T = TypeVar("T")
 
-family_objs = []
-with open("articles_spider/articles_spider/data/links.json", "r+") as file:
-    family_objs = json.load(file)
+LINKS_PATH = "articles_spider/articles_spider/data/links.json"
 
-urls: List[str] = [item["url"] for item in family_objs]
-series: List[str] = [item["family"] for item in family_objs]
+# Bump whenever ArticleParser output changes, so incremental runs parse every page again
+PARSER_VERSION = 1
+
+
+def load_links(path: str = LINKS_PATH) -> List[Dict[str, str]]:
+    """
+    Load the `{"url": ..., "family": ...}` objects listing the articles to scrape.
+
+    Args:
+        path (str): A links.json, or a directory of them such as `data/by_family`, read in name order.
+    """
+    if os.path.isdir(path):
+        links = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                links.extend(load_links(os.path.join(path, name)))
+        return links
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def group_series_by_url(
+    urls: Iterable[str], series: Iterable[str]
+) -> Dict[str, List[str]]:
+    """
+    Map the canonical url of every article to all the series it is listed for, in the order
+    they are first listed, so every page is fetched and parsed once whatever its series count.
+    """
+    pages: Dict[str, List[str]] = {}
+    for url, name in zip(urls, series):
+        names = pages.setdefault(canonicalize_url(url), [])
+        if name not in names:
+            names.append(name)
+    return pages
 
 
 class Revision(BaseModel):
@@ -181,11 +227,136 @@ class Article:
         }
 
 
+# Elements that can start a step, e.g. <h4>Step 1</h4> or <p><b>Step 1.</b> ...</p>
+STEP_ELEMENTS = frozenset(["h3", "h4", "p"])
+
+# Elements whose text is split into sections by `parse_backup_steps`
+SECTION_TEXT_ELEMENTS = frozenset(["div", "p", "blockquote", "ol", "ul"])
+HEADER_LEVELS = {f"h{level}": level for level in range(1, 7)}
+PRESERVE_WHITESPACE_ELEMENTS = frozenset(["pre", "textarea"])
+# Sections of a page that are not steps
+BACKUP_SKIPPED_SECTIONS = frozenset(
+    [
+        "introduction",
+        "objective",
+        "table of contents",
+        "support",
+        "revision history",
+        "applicable devices | software",
+        "applicable devices",
+    ]
+)
+XML_WHITESPACE = re.compile(r"[ \t\r\n]+")
+
+
+# Patterns of the ArticleParser hot paths, compiled once. Checks that run for every element
+# try a plain string prefix test first and only run the pattern when it passes.
+STEP_NUMBER_PATTERN = re.compile(r"Step (\d+)")
+STEP_TEXT_PATTERN = re.compile(r"^Step\s*\d+\.\s*(.*)")
+STEP_TEXT_PREFIX_PATTERN = re.compile(r"^Step \d+\.?")
+STEP_START_PATTERN = re.compile(r"^Step", re.IGNORECASE)
+# Every first character `STEP_START_PATTERN` matches, "ſ" case folds to "s"
+STEP_START_CHARS = frozenset("Ssſ")
+BLANK_PATTERN = re.compile(r"^\s*$")
+KEY_SEPARATOR_PATTERN = re.compile(r"[\W_]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+REPEATED_PUNCTUATION_PATTERN = re.compile(r"([^\w\s])\1*")
+TITLE_PATTERN = re.compile(r"^(.*?)(?= - Cisco)")
+DOCUMENT_ID_PATTERN = re.compile(r"((?:smb)?\d+)", flags=re.IGNORECASE)
+CATEGORY_PATTERN = re.compile(
+    r"(?P<Troubleshooting>Troubleshoot(?:ing)?)|"
+    r"(?P<Configuration>(?:Configure|Configuration|Configuration Examples and TechNotes))|"
+    r"(?P<InstallUpgrade>(?:Install(?:ation)?|Upgrade))|"
+    r"(?P<MaintainOperate>(?:Maintain and Operate|Maintain and Operate TechNotes))|"
+    r"(?P<Design>Design)",
+    re.IGNORECASE,
+)
+OBJECTIVE_PATTERN = re.compile(r"^Objective:?\s?", re.IGNORECASE)
+APPLICABLE_DEVICES_PATTERN = re.compile(
+    r"(Applicable Devices\s*\|\s*Software|Applicable\s+Switches\s*|Applicable Devices \| Software Version|Applicable Devices|Applicable Devices \| Firmware Version|Applicable Devices\s*|Applicable Devices:|Applicable Devices and Software Version|Applicable Device|Applicable Devices|Applicable Devices \| Software)\b",
+    re.IGNORECASE,
+)
+DEVICE_PATTERN = re.compile(r"(.*?)\s*(?:\|\s*([\d.]+))?\s*\(Data\s*Sheet\)")
+SOFTWARE_VERSION_PATTERN = re.compile(r"\| (\S+)")
+DOWNLOAD_LATEST_PATTERN = re.compile(
+    r"\(Download latest\)|Download latest", re.IGNORECASE
+)
+INTRODUCTION_PATTERN = re.compile(r"^Introduction", re.IGNORECASE)
+NOTE_PATTERN = re.compile(r"[\n\t]+|Note(?:\:)")
+BACKUP_SKIPPED_TEXT_PATTERN = re.compile(
+    r"""
+        ^Objective         |  # Match 'Objective' at the start of the string
+        ^Download\ Options |  # Match 'Download Options' at the start of the string
+        ^Bias-Free         |  # Match 'Bias-Free' at the start of the string
+        ^Applicable\ Devices |  # Match 'Applicable Devices' at the start of the string
+        ^Introduction      |  # Match 'Introduction' at the start of the string
+        ^Available\ Languages   # Match 'Available Languages' at the start of the string
+        """,
+    re.VERBOSE,
+)
+CISCO_DOC_IMAGE_PREFIX = "https://www.cisco.com/c/dam/en/us/support/docs/"
+
+
+def normalize_space(text: str) -> str:
+    """Collapse whitespace like XPath's `normalize-space`, which leaves e.g. non-breaking spaces alone."""
+    return XML_WHITESPACE.sub(" ", text).strip(" ")
+
+
+def leading_text(node: Tag, length: int) -> str:
+    """
+    The start of `node.text.strip()`, at least `length` characters of it when there are that many.
+
+    Stops reading the strings of the node as soon as enough text is found, so checking how a long
+    element starts does not build all of its text.
+    """
+    text = ""
+    for string in node.strings:
+        text += string
+        start = text.lstrip()
+        if len(start) >= length:
+            return start
+    return text.strip()
+
+
+def starts_with_step(text: str) -> bool:
+    """Same as `re.match(r"^Step", text, re.IGNORECASE)`, without running the pattern for most texts."""
+    return text[:1] in STEP_START_CHARS and STEP_START_PATTERN.match(text) is not None
+
+
+class _HeaderTracker:
+    """The last header of every level passed in a document order walk of a page."""
+
+    names = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+
+    def __init__(self) -> None:
+        self._position = 0
+        self._last: Dict[str, Tuple[int, Tag]] = {}
+
+    def add(self, header: Tag) -> None:
+        self._position += 1
+        self._last[header.name] = (self._position, header)
+
+    def previous(self, names: List[str]) -> Optional[Tag]:
+        """The closest header named one of `names` before the current position, like `find_previous(names)`."""
+        candidates = [self._last[name] for name in names if name in self._last]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda candidate: candidate[0])[1]
+
+
 class ArticleParser:
     """A class that parses HTML to extract Cisco SMB articles."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        category_classifier: Optional[CategoryClassifier] = None,
+        timer: Optional[StageTimer] = None,
+    ) -> None:
         self.headers = ["h1", "h2", "h3", "h4", "h5", "h6"]
+        self.category_classifier = category_classifier or CategoryClassifier()
+        self.defer_llm_categories = False
+        # Times `parse` and each of its steps as the "parse.<step>" stages
+        self.timer = timer or StageTimer()
 
     def parse(self, soup: BeautifulSoup, url: str, series: str) -> Article:
         """
@@ -201,16 +372,27 @@ class ArticleParser:
 
         """
         name = series
-        title = self.get_title(soup)
-        document_id = self.get_document_id(soup)
-        category = self.get_category(soup, title)
-        objective = self.get_objective(soup)
-        applicable_devices = self.get_applicable_devices(soup)
-        intro = self.get_intro(soup)
-        steps = self.get_steps(soup)
-        if len(steps) == 0:
-            steps = self.parse_backup_steps(soup)
-        revision_history = self.get_revision_history(soup)
+        stage = self.timer.stage
+        with stage("parse"):
+            with stage("parse.title"):
+                title = self.get_title(soup)
+            with stage("parse.document_id"):
+                document_id = self.get_document_id(soup, url)
+            with stage("parse.category"):
+                category = self.get_category(soup, title)
+            with stage("parse.objective"):
+                objective = self.get_objective(soup)
+            with stage("parse.applicable_devices"):
+                applicable_devices = self.get_applicable_devices(soup)
+            with stage("parse.intro"):
+                intro = self.get_intro(soup)
+            with stage("parse.steps"):
+                steps = self.get_steps(soup)
+            if len(steps) == 0:
+                with stage("parse.backup_steps"):
+                    steps = self.parse_backup_steps(soup)
+            with stage("parse.revision_history"):
+                revision_history = self.get_revision_history(soup)
 
         return Article(
             name=name,
@@ -225,8 +407,7 @@ class ArticleParser:
             revision_history=revision_history,
         )
 
-    @staticmethod
-    def get_category_with_llm(title: str) -> str:
+    def get_category_with_llm(self, title: str) -> str:
         """
         Get the category for an article based on the given title.
 
@@ -236,11 +417,9 @@ class ArticleParser:
         Returns:
             str: The category name.
 
-        Raises:
-            None
-
-        This method uses a language model to determine the category of an article based on its title.
-        It provides a set of rules to help choose the right category, but also allows flexibility in the choice.
+        This method uses a language model to determine the category of an article based on its title,
+        see `CATEGORY_PROMPT` for the rules it is given. Results are memoized on disk by the
+        `category_classifier`, so the model is only asked about titles it has not seen.
 
         The available categories are:
         1. Troubleshooting
@@ -248,43 +427,21 @@ class ArticleParser:
         3. Install & Upgrade
         4. Maintain & Operate
         5. Design
-
-        The method returns only the category name and nothing else.
         """
-        template = """Based on the given title, choose a category from below.
-            
-            Here are some rules to help you choose the right category:
-            1. If the article is about troubleshooting a problem, choose the 'Troubleshooting' category.
-            2. If the article title is about configuring a feature, choose the 'Configuration' category.
-            3. If the article title is about upgrading or installing firmware or Day Zero setups, choose the 'Install & Upgrade' category.
-            4. If the article is an overview of a feature or a best practice guide, choose the 'Maintain & Operate' category.
-            5. Most of our articles fall under the "Configuration" category but do not let this rule limit your choice. Choose the category that best fits the article.
-            
-            There are 5 different categories to choose from.
-            
-            The categories are: 1. Troubleshooting, 2. Configuration, 3. Install & Upgrade, 4. Maintain & Operate, 5. Design.
-            
-            Title: {title}
-            
-            Return only the category name and nothing else.
-            """
-        prompt = PromptTemplate.from_template(template)
-        llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=2.0)
-        chain = prompt | llm | StrOutputParser()
-        return chain.invoke({"title": title})
+        return self.category_classifier.classify(title)
 
     @staticmethod
     def is_blank_string(string: str | None) -> bool:
         if string is None:
             True
-        return bool(re.match(r"^\s*$", string))
+        return bool(BLANK_PATTERN.match(string))
 
     @staticmethod
     def format_keys(strng: str) -> str:
         # First if there is a key like "Publish Date" we want to convert it to "publish_date"
         # Then we want to remove all non-alphanumeric characters and replace spaces with underscores
         # Finally we want to convert to lowercase
-        return re.sub(r"[\W_]+", "_", strng.lower())
+        return KEY_SEPARATOR_PATTERN.sub("_", strng.lower())
 
     @staticmethod
     def is_tag(tag) -> bool:
@@ -292,55 +449,52 @@ class ArticleParser:
 
     @staticmethod
     def is_step_indicator(node: Tag) -> bool:
-        pattern = re.compile(r"Step (\d+)")
-        return pattern.match(node.text.strip()) is not None
+        # "Step " and a digit are enough to tell, don't read all the text of long paragraphs
+        start = leading_text(node, 6)
+        return start.startswith("Step ") and STEP_NUMBER_PATTERN.match(start) is not None
 
     @staticmethod
     def extract_step_number(node: Tag) -> Union[int, None]:
-        pattern = re.compile(r"Step (\d+)")
-        match = pattern.match(node.text.strip())
+        match = STEP_NUMBER_PATTERN.match(node.text.strip())
         return int(match.group(1)) if match else None
 
     @staticmethod
     def get_title(soup: BeautifulSoup) -> str:
         title_elem = soup.find(id="fw-pagetitle")
         if title_elem:
-            print(f"TITLE: {title_elem.text.strip()}")
-            return title_elem.text.strip()
+            title = title_elem.text.strip()
         else:
             title = soup.title.string
-            pattern = re.compile(r"^(.*?)(?= - Cisco)")
-            match = pattern.search(title)
-            print(f"TITLE: {match.group(1)}")
-            return match.group(1) if match else title
+            match = TITLE_PATTERN.search(title)
+            if match:
+                title = match.group(1)
+        logger.debug("Title: %s", title)
+        return title
 
     @staticmethod
-    def get_document_id(soup: BeautifulSoup) -> str:
+    def get_document_id(soup: BeautifulSoup, url: Optional[str] = None) -> str:
+        """
+        The Cisco document id of the page, e.g. "smb1234".
+
+        Pages without one get an id derived from their canonical `url`, see
+        `make_document_id`, or from their text when there is no url, so parsing the page again
+        gives the same id.
+        """
         element = soup.find("div", attrs={"class": "documentId"})
         if element:
-            pattern = re.compile(r"((?:smb)?\d+)", flags=re.IGNORECASE)
-            document_id = pattern.search(element.text.strip())
-            return (
-                document_id.group(1)
-                if document_id
-                else sha256(uuid4().bytes).hexdigest()
-            )
-        return sha256(uuid4().bytes).hexdigest()
+            match = DOCUMENT_ID_PATTERN.search(element.text.strip())
+            if match:
+                return match.group(1)
+        if url:
+            return make_document_id(url)
+        return sha256(soup.get_text().encode("utf-8")).hexdigest()
 
     def get_category(self, soup: BeautifulSoup, title: str) -> str:
-        category_pattern = re.compile(
-            r"(?P<Troubleshooting>Troubleshoot(?:ing)?)|"
-            r"(?P<Configuration>(?:Configure|Configuration|Configuration Examples and TechNotes))|"
-            r"(?P<InstallUpgrade>(?:Install(?:ation)?|Upgrade))|"
-            r"(?P<MaintainOperate>(?:Maintain and Operate|Maintain and Operate TechNotes))|"
-            r"(?P<Design>Design)",
-            re.IGNORECASE,
-        )
         element = soup.select_one(
             '#fw-breadcrumb > ul > li:last-child > a > span[itemprop="name"]'
         )
         if element:
-            match = category_pattern.search(element.get_text(strip=True))
+            match = CATEGORY_PATTERN.search(element.get_text(strip=True))
             if match:
                 if match.group("Troubleshooting"):
                     return "Troubleshooting"
@@ -353,12 +507,22 @@ class ArticleParser:
                 if match.group("Design"):
                     return "Design"
             else:
-                return self.get_category_with_llm(title)
+                return self.get_category_from_title(title)
+        return self.get_category_from_title(title)
+
+    def get_category_from_title(self, title: str) -> Union[str, None]:
+        """
+        Categorize an article whose breadcrumb names no category.
+
+        With `defer_llm_categories` set, titles the classifier has not cached are left as None
+        for a categorization stage to classify in batches, see `ArticleScraper.scrape_stream`.
+        """
+        if self.defer_llm_categories:
+            return self.category_classifier.cached(title)
         return self.get_category_with_llm(title)
 
     def get_objective(self, soup: BeautifulSoup) -> Union[str, None]:
-        pattern = re.compile(r"^Objective:?\s?", re.IGNORECASE)
-        objective_element = soup.find("h2", string=re.compile(pattern))
+        objective_element = soup.find("h2", string=OBJECTIVE_PATTERN)
         if objective_element:
             objective = []
             sibling = objective_element.find_next_sibling()
@@ -375,26 +539,19 @@ class ArticleParser:
 
     @staticmethod
     def get_applicable_devices(soup: BeautifulSoup) -> List[dict]:
-        pattern = re.compile(
-            r"(Applicable Devices\s*\|\s*Software|Applicable\s+Switches\s*|Applicable Devices \| Software Version|Applicable Devices|Applicable Devices \| Firmware Version|Applicable Devices\s*|Applicable Devices:|Applicable Devices and Software Version|Applicable Device|Applicable Devices|Applicable Devices \| Software)\b",
-            re.IGNORECASE,
-        )
-        element = soup.find(["h2", "h3"], string=pattern)
+        element = soup.find(["h2", "h3"], string=APPLICABLE_DEVICES_PATTERN)
         contents = []
 
         if element:
             sibling = element.find_next_sibling()
             if sibling and sibling.name in ["ul", "ol"]:
                 for li in sibling.find_all("li"):
-                    match = re.search(
-                        r"(.*?)\s*(?:\|\s*([\d.]+))?\s*\(Data\s*Sheet\)",
-                        li.get_text(strip=True),
-                    )
+                    match = DEVICE_PATTERN.search(li.get_text(strip=True))
                     if match:
                         device_name, software_version = match.groups()
                     else:
                         device_name = li.get_text(strip=True).split("|")[0].strip()
-                    software_version = re.search(r"\| (\S+)", li.get_text())
+                    software_version = SOFTWARE_VERSION_PATTERN.search(li.get_text())
                     if software_version:
                         version = software_version.group(1)
                     else:
@@ -408,10 +565,7 @@ class ArticleParser:
                         "a",
                         href=True,
                         string=lambda text: text
-                        and re.search(
-                            r"\(Download latest\)|Download latest", text, re.IGNORECASE
-                        )
-                        is not None,
+                        and DOWNLOAD_LATEST_PATTERN.search(text) is not None,
                     )
                     contents.append(
                         {
@@ -432,9 +586,7 @@ class ArticleParser:
 
     def get_intro(self, soup: BeautifulSoup) -> Union[str, None]:
         headers = ["h1", "h2", "h3", "h4", "h5", "h6"]
-        intro = soup.find(
-            ["h3", "h2"], string=re.compile(r"^Introduction", re.IGNORECASE)
-        )
+        intro = soup.find(["h3", "h2"], string=INTRODUCTION_PATTERN)
         intro_text = None
 
         if intro:
@@ -486,23 +638,50 @@ class ArticleParser:
             ```
         """
 
-        elements = soup.find_all(["h3", "h4", "p"])
+        # One walk in document order, keeping the last header of every level seen so far,
+        # instead of a `find_previous` search back through the page for every step
+        headers = _HeaderTracker()
         steps = []
 
-        for _, element in enumerate(elements):
-            if not self.is_tag(element) or self.is_blank_string(element.get_text()):
+        for element in soup.descendants:
+            if not self.is_tag(element):
                 continue
-            if self.is_step_indicator(element):
-                step = self.process_step(element)
+            if element.name in STEP_ELEMENTS and self.is_step_indicator(element):
+                section = self.get_tracked_section(element, headers)
+                step = self.process_step(element, section)
                 if step:
                     steps.append(step)
+            if element.name in headers.names:
+                headers.add(element)
         return steps
 
-    def process_step(self, element: Tag):
-        section, text, emphasized_text, emphasized_tags = (None, None, None, None)
+    def get_tracked_section(self, element: Tag, headers: "_HeaderTracker") -> str:
+        """
+        The section of a step: the closest preceding header of another level than the step's
+        own, skipping an "Introduction" header, or the closest h2 when that header is itself
+        a step indicator. The preceding headers are looked up in `headers`.
+
+        Raises:
+            AttributeError: When no header precedes the step.
+        """
+        header_elements = [name for name in self.headers if name != element.name]
+        header = headers.previous(header_elements)
+        if header:
+            if header.get_text(strip=True).lower() == "introduction":
+                header = headers.previous(
+                    [name for name in header_elements if name != header.name]
+                )
+            section = header.get_text(strip=True)
+        else:
+            section = headers.previous(["h2"]).get_text(strip=True)
+        node_logger.debug("section", "Section: %s", section)
+        if self.is_step_indicator(header):
+            section = headers.previous(["h2"]).get_text(strip=True)
+        return self.sanitize_text(section)
+
+    def process_step(self, element: Tag, section: str):
+        text, emphasized_text, emphasized_tags = (None, None, None)
         step_number = self.extract_step_number(element)
-        header_elements = self.get_header_elements(element)
-        section = self.get_section(element, header_elements)
         text, emphasized_text, emphasized_tags = self.get_step_text(element)
         text, note, src, alt, video_src, emphasized_text, emphasized_tags = (
             self.process_next_elements(element, text, emphasized_text, emphasized_tags)
@@ -525,35 +704,15 @@ class ArticleParser:
                 "emphasized_tags": emphasized_tags,
             }
         else:
-            print(f"Element name: {element.name}")
-            print(f"Could not parse step: {section} {step_number} {text}")
+            logger.debug(
+                "Could not parse step from <%s>: %s %s %s",
+                element.name,
+                section,
+                step_number,
+                text,
+            )
             return None
 
-    def get_header_elements(self, element: Tag):
-        header_elements = ["h6", "h5", "h4", "h3", "h2", "h1"]
-        try:
-            header_elements.remove(element.name)
-        except ValueError:
-            header_elements = ["h6", "h5", "h4", "h3", "h2", "h1"]
-        return header_elements
-
-    def get_section(self, element: Tag, header_elements: List[str]):
-        header = element.find_previous(header_elements)
-        if header:
-            if header.get_text(strip=True).lower() == "introduction":
-                try:
-                    header_elements.remove(header.name)
-                except ValueError:
-                    header_elements = header_elements
-                header = element.find_previous(header_elements)
-            section = header.get_text(strip=True)
-        else:
-            section = element.find_previous("h2").get_text(strip=True)
-        print(f"Section: {section}")
-        if self.is_step_indicator(header):
-            section = element.find_previous("h2").get_text(strip=True)
-        return self.sanitize_text(section)
-
     def get_emphasized_text(self, element: Tag):
         emphasized_text = []
         emphasized_tags = []
@@ -576,12 +735,13 @@ class ArticleParser:
         emphasized_tags = []
         emphasized_text = []
         try:
-            if re.match(r"^Step\s*\d+\.\s*(.*)", string=next(element.strings, "")):
+            first_string = next(element.strings, "")
+            if first_string.startswith("Step") and STEP_TEXT_PATTERN.match(first_string):
                 strngs = "".join(element.strings)
-                print(f"STRINGS: {strngs}")
-                text = re.sub(r"^Step \d+\.?", "", strngs).strip()
+                node_logger.debug("strings", "Step strings: %s", strngs)
+                text = STEP_TEXT_PREFIX_PATTERN.sub("", strngs).strip()
         except AttributeError as e:
-            print(e)
+            logger.debug("Could not get the step text: %s", e)
         if text:
             emphasized_text, emphasized_tags = self.get_emphasized_text(element)
         else:
@@ -597,19 +757,14 @@ class ArticleParser:
     ):
         next_element: Tag = element.find_next_sibling()
         note, src, alt, video_src = None, None, None, None
-        while (
-            next_element
-            and next_element.name not in self.headers
-            and not re.search(
-                f"^Step", string=next_element.text.strip(), flags=re.IGNORECASE
-            )
-        ):
-            if next_element.text.strip().startswith("Step") or re.search(
-                r"^Step", next_element.text
-            ):
+        while next_element and next_element.name not in self.headers:
+            # Every check below needs the text of the element, get it once
+            element_text = next_element.text
+            stripped_text = element_text.strip()
+            if starts_with_step(stripped_text) or element_text.startswith("Step"):
                 break
 
-            print(f"NEXT ELEMENT: {next_element}")
+            node_logger.debug("next_element", "Next element: %s", next_element)
 
             if next_element.name in {"p"} and next_element.find("img"):
                 img = next_element.find("img")
@@ -711,16 +866,13 @@ class ArticleParser:
                     note += " " + next_element.get_text(strip=True)
             if (
                 next_element.name in {"p"}
-                and not next_element.text.startswith("Note")
+                and not element_text.startswith("Note")
                 and not next_element.find(self.headers)
             ):
                 text += " " + next_element.get_text(strip=True, separator=" ")
-            elif next_element.name in {"p"} and next_element.text.startswith("Note"):
-                pattern = re.compile(r"[\n\t]+|Note(?:\:)")
-                temp_note = re.sub(
-                    pattern,
-                    " ",
-                    next_element.get_text(strip=True, separator=" "),
+            elif next_element.name in {"p"} and element_text.startswith("Note"):
+                temp_note = NOTE_PATTERN.sub(
+                    " ", next_element.get_text(strip=True, separator=" ")
                 )
                 if note is not None:
                     note += " " + temp_note
@@ -739,79 +891,132 @@ class ArticleParser:
 
         return (text, note, src, alt, video_src, emphasized_text, emphasized_tags)
 
+    def get_h2_sections(self, soup: BeautifulSoup) -> List[Tuple[Tag, str, str]]:
+        """
+        Split the text of a page into h2 sections in one walk of the tree.
+
+        The text of every div, p, blockquote, ol and ul, leaving out the elements of those kinds
+        nested in it, belongs to the closest h2 before it among its own previous siblings, or else
+        those of its closest ancestor that has one, unless an h1 comes in between. Consecutive
+        texts of the same section are joined, as `HTMLHeaderTextSplitter` did on the prettified page.
+
+        Returns:
+            List[Tuple[Tag, str, str]]: The h2, its title and the text of every run of the page's text.
+        """
+        texts: List[Tuple[Optional[Tag], List[str]]] = []
+        self._collect_section_texts(soup, None, None, False, texts)
+        titles: Dict[int, str] = {}
+        runs: List[List[Any]] = []
+        for header, parts in texts:
+            content = normalize_space(" ".join(parts))
+            if not content:
+                continue
+            title = None
+            if header is not None:
+                if id(header) not in titles:
+                    titles[id(header)] = normalize_space(header.get_text(" ", strip=True))
+                title = titles[id(header)] or None
+            if runs and runs[-1][1] == title:
+                runs[-1][2] += "  \n" + content
+            else:
+                runs.append([header, title, content])
+        return [(header, title, content) for header, title, content in runs if title]
+
+    def _collect_section_texts(
+        self,
+        parent: Tag,
+        section: Optional[Tag],
+        parts: Optional[List[str]],
+        preserve_whitespace: bool,
+        texts: List[Tuple[Optional[Tag], List[str]]],
+    ) -> None:
+        # The headers in force among the children so far, each closing the ones of its level and
+        # below. Headers inside a <header> element stay in force until the next one (level 0).
+        headers: List[Tuple[int, Tag]] = []
+        for child in parent.children:
+            if not isinstance(child, Tag):
+                if (
+                    parts is not None
+                    and isinstance(child, NavigableString)
+                    and not isinstance(child, PreformattedString)
+                ):
+                    parts.append(child if preserve_whitespace else child.strip())
+                continue
+            level = HEADER_LEVELS.get(child.name)
+            if level is not None:
+                while headers and headers[-1][0] >= level:
+                    headers.pop()
+                headers.append((level, child))
+            elif child.name == "header":
+                headers = [
+                    (0, header)
+                    for header in child.find_all(list(HEADER_LEVELS), recursive=False)
+                ]
+            child_section = section
+            for _, header in reversed(headers):
+                if header.name == "h2":
+                    child_section = header
+                    break
+            if child.name in ("script", "style"):
+                self._collect_section_texts(
+                    child, child_section, None, preserve_whitespace, texts
+                )
+            elif child.name in SECTION_TEXT_ELEMENTS:
+                child_parts: List[str] = []
+                texts.append((child_section, child_parts))
+                self._collect_section_texts(
+                    child, child_section, child_parts, preserve_whitespace, texts
+                )
+            elif child.name in PRESERVE_WHITESPACE_ELEMENTS and not preserve_whitespace:
+                raw: List[str] = []
+                self._collect_section_texts(child, child_section, raw, True, texts)
+                if parts is not None:
+                    parts.append("".join(raw))
+            else:
+                self._collect_section_texts(
+                    child, child_section, parts, preserve_whitespace, texts
+                )
+
     def parse_backup_steps(self, soup: BeautifulSoup):
-        html = soup.prettify()
         headers = ["h1", "h2", "h3", "h4", "h5", "h6"]
-        headers_to_split_on = [("h2", "Header 2")]
-        html_splitter = HTMLHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-        splits = html_splitter.split_text(html)
-        pattern = re.compile(
-            r"""
-                ^Objective         |  # Match 'Objective' at the start of the string
-                ^Download\ Options |  # Match 'Download Options' at the start of the string
-                ^Bias-Free         |  # Match 'Bias-Free' at the start of the string
-                ^Applicable\ Devices |  # Match 'Applicable Devices' at the start of the string
-                ^Introduction      |  # Match 'Introduction' at the start of the string
-                ^Available\ Languages   # Match 'Available Languages' at the start of the string
-                """,
-            re.VERBOSE,
-        )
         steps = []
         step_number = 0
-        for i, doc in enumerate(splits):
-            content = doc.page_content
-            metadata = doc.metadata
-            if "Header 2" in metadata:
-                if pattern.search(content):
-                    continue
-                if metadata["Header 2"].lower() == "introduction":
-                    continue
-                if metadata["Header 2"].lower() == "objective":
-                    continue
-                if metadata["Header 2"].lower() == "table of contents":
-                    continue
-                if metadata["Header 2"].lower() == "support":
-                    continue
-                if metadata["Header 2"].lower() == "revision history":
-                    continue
-                if metadata["Header 2"].lower() == "applicable devices | software":
-                    continue
-                if metadata["Header 2"].lower() == "applicable devices":
-                    continue
-
-                section = metadata["Header 2"]
-                step_number = step_number + 1
-                text = self.sanitize_text(content)
-                src = None
-                alt = None
-                found_element = soup.find("h2", string=re.compile(section))
-                if not found_element:
-                    continue
-                next_element = found_element.find_next_sibling(self.is_tag)
-                while next_element and next_element.name not in headers:
-                    print(f"next_element: {next_element}")
-                    if next_element.name in ["img"]:
-                        src = "https://www.cisco.com" + next_element.get("src")
-                        alt = next_element.get(
-                            "alt", "Related diagram, image, or screenshot"
-                        )
-                    if next_element.name in ["a"] and next_element.has_attr("class"):
-                        if "show-image-alone" in next_element.get_attribute_list(
-                            "class"
-                        ):
-                            src = next_element.get("href")
-                            alt = "Related diagram, image, or screenshot"
-                    next_element = next_element.find_next_sibling(self.is_tag)
-                steps.append(
-                    {
-                        "section": section,
-                        "step_num": step_number,
-                        "text": text,
-                        "src": src,
-                        "alt": alt,
-                        "note": None,
-                    }
+        for section_header, section, content in self.get_h2_sections(soup):
+            if BACKUP_SKIPPED_TEXT_PATTERN.search(content):
+                continue
+            if section.lower() in BACKUP_SKIPPED_SECTIONS:
+                continue
+            step_number = step_number + 1
+            text = self.sanitize_text(content)
+            src = None
+            alt = None
+            next_element = section_header.find_next_sibling(self.is_tag)
+            while next_element and next_element.name not in headers:
+                node_logger.debug(
+                    "backup_next_element", "Backup step element: %s", next_element
                 )
+                if next_element.name in ["img"]:
+                    src = "https://www.cisco.com" + next_element.get("src")
+                    alt = next_element.get(
+                        "alt", "Related diagram, image, or screenshot"
+                    )
+                if next_element.name in ["a"] and next_element.has_attr("class"):
+                    if "show-image-alone" in next_element.get_attribute_list(
+                        "class"
+                    ):
+                        src = next_element.get("href")
+                        alt = "Related diagram, image, or screenshot"
+                next_element = next_element.find_next_sibling(self.is_tag)
+            steps.append(
+                {
+                    "section": section,
+                    "step_num": step_number,
+                    "text": text,
+                    "src": src,
+                    "alt": alt,
+                    "note": None,
+                }
+            )
         return steps
 
     def get_revision_history(self, soup: BeautifulSoup) -> List[Revision]:
@@ -842,15 +1047,13 @@ class ArticleParser:
 
     @staticmethod
     def is_cisco_doc_img(src: str):
-        return bool(
-            re.match(r"https://www\.cisco\.com/c/dam/en/us/support/docs/.*", src)
-        )
+        return src.startswith(CISCO_DOC_IMAGE_PREFIX)
 
     @staticmethod
     def sanitize_text(text: str) -> str:
-        cleaned_text = re.sub(r"\s+", " ", text.strip())
+        cleaned_text = WHITESPACE_PATTERN.sub(" ", text.strip())
         cleaned_text = cleaned_text.replace("\\", "")
-        cleaned_text = re.sub(r"([^\w\s])\1*", r"\1", cleaned_text)
+        cleaned_text = REPEATED_PUNCTUATION_PATTERN.sub(r"\1", cleaned_text)
         return cleaned_text
 
 
@@ -866,30 +1069,156 @@ default_header_template = {
 }
 
 
+class ArticleIndex:
+    """
+    What the previous runs parsed, used to skip pages that did not change since.
+
+    Entries are keyed by url, with a second dict from `document_id` to url, and record the
+    sha256 of the raw HTML, the `PARSER_VERSION` the page was parsed with and the series it was
+    parsed for, since links list the same url once per product family.
+
+    Args:
+        path (Optional[str]): The JSON file the index is loaded from and saved to. (default: None)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._by_url: Dict[str, Dict[str, Any]] = {}
+        self._urls_by_document_id: Dict[str, str] = {}
+        if path is not None:
+            for url, entry in ArticleScraper.load_json(path) or {}:
+                self._add(url, entry)
+
+    def __len__(self) -> int:
+        return len(self._by_url)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._by_url
+
+    @staticmethod
+    def hash_html(html: str) -> str:
+        return sha256(html.encode("utf-8")).hexdigest()
+
+    def _add(self, url: str, entry: Dict[str, Any]) -> None:
+        previous = self._by_url.get(url)
+        if previous is not None:
+            self._urls_by_document_id.pop(previous["document_id"], None)
+        self._by_url[url] = entry
+        self._urls_by_document_id[entry["document_id"]] = url
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self._by_url.get(url)
+
+    def get_by_document_id(self, document_id: str) -> Optional[Dict[str, Any]]:
+        url = self._urls_by_document_id.get(document_id)
+        return None if url is None else {"url": url, **self._by_url[url]}
+
+    def is_unchanged(self, url: str, series: str, html_hash: str) -> bool:
+        """True when the page was parsed for `series` before, from the same HTML by the same parser version."""
+        entry = self._by_url.get(url)
+        return (
+            entry is not None
+            and entry["html_hash"] == html_hash
+            and entry["parser_version"] == PARSER_VERSION
+            and series in entry["series"]
+        )
+
+    def update(self, url: str, series: str, document_id: str, html_hash: str) -> None:
+        entry = self._by_url.get(url)
+        if (
+            entry is None
+            or entry["html_hash"] != html_hash
+            or entry["parser_version"] != PARSER_VERSION
+        ):
+            entry = {
+                "document_id": document_id,
+                "html_hash": html_hash,
+                "parser_version": PARSER_VERSION,
+                "series": [],
+            }
+        if series not in entry["series"]:
+            entry["series"] = [*entry["series"], series]
+        self._add(url, {**entry, "document_id": document_id})
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the index as `[url, entry]` pairs, replacing the file only once it is complete."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("ArticleIndex.save needs a path")
+        partial = f"{path}.tmp"
+        with open(partial, "w", encoding="utf-8") as file:
+            json.dump(list(self._by_url.items()), file)
+        os.replace(partial, path)
+
+
 class ArticleScraper:
     """A class for scraping articles from a list of URLs."""
 
+    # Statuses meaning the server wants us to slow down
+    RETRY_STATUSES = {429, 503}
+
     def __init__(
         self,
         series: List[str],
         urls: Sequence[str] = (),
-        requests_per_second: int = 2,
+        requests_per_second: float = 2,
         continue_on_failure: bool = True,
         ssl_verify: bool = False,
-        default_parser: str = "html.parser",
+        default_parser: Optional[str] = None,
         requests_kwargs: Optional[Dict[str, Any]] = None,
         bs_get_text_kwargs: Optional[Dict[str, Any]] = None,
         bs_kwargs: Optional[Dict[str, Any]] = None,
+        limit_per_host: int = 8,
+        total_timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        max_concurrency: int = 4,
+        burst: Optional[int] = None,
+        parse_workers: Optional[int] = 0,
+        http_cache: Optional[HttpCache] = None,
+        index: Optional[ArticleIndex] = None,
+        category_batch_size: int = 16,
+        timer: Optional[StageTimer] = None,
+        profiler: Optional[SlowPageProfiler] = None,
     ):
         """
         Initialize the ArticleScraper.
 
+        Every fetch of a run goes through one pooled `aiohttp.ClientSession`, so DNS lookups,
+        TCP connections and TLS sessions to www.cisco.com are reused across articles. Use the
+        scraper as an async context manager to keep the session open across several runs,
+        otherwise `fetch_all` opens one for the duration of the call.
+
         Args:
             urls (Sequence): A list of URLs or a single URL as a string.
             series (List[str]): A list of series names.
+            limit_per_host (int): Maximum open connections per host. (default: 8)
+            total_timeout (float): Seconds allowed for a whole request, including the body. (default: 60)
+            connect_timeout (float): Seconds allowed to get a connection from the pool. (default: 10)
+            keepalive_timeout (float): Seconds an idle connection is kept open for reuse. (default: 30)
+            dns_cache_ttl (int): Seconds a resolved host is cached. (default: 300)
+            requests_per_second (float): The highest request rate, lowered while the server answers 429 or 503. (default: 2)
+            max_concurrency (int): Maximum requests in flight at once. (default: 4)
+            burst (Optional[int]): Requests that may be sent at once after being idle. (default: `requests_per_second`)
+            parse_workers (Optional[int]): Processes `scrape_stream` parses pages in, 0 parses them on
+                the event loop thread and None uses one per CPU. (default: 0)
+            http_cache (Optional[HttpCache]): Revalidates pages against this disk cache and, in
+                offline mode, replays them from it. (default: None)
+            index (Optional[ArticleIndex]): Makes `scrape_stream` incremental, pages whose HTML and
+                parser version are unchanged since they were indexed are not parsed again. (default: None)
+            category_batch_size (int): Articles `scrape_stream` collects before categorizing their
+                titles with the LLM in one batch. (default: 16)
+            default_parser (Optional[str]): The BeautifulSoup parser for HTML pages, "auto" picks
+                lxml when it is installed. (default: `SCRAPER_HTML_PARSER`, or "auto")
+            timer (Optional[StageTimer]): Times the fetch, rate limit wait, soup, clean, parse and
+                categorize stages of every page, see `StageTimer.summary`. (default: a new timer)
+            profiler (Optional[SlowPageProfiler]): Keeps a cProfile profile of every page whose
+                parse is slow. (default: None)
 
         Raises:
             TypeError: If `urls` is not a list or a string.
+            ValueError: If `default_parser` is unknown or not installed.
         """
         if urls:
             self.urls = list(urls)
@@ -901,13 +1230,29 @@ class ArticleScraper:
             raise TypeError(f"urls must be str or Sequence[str], got ({type(urls)})")
         self.series = series
         self.requests_per_second = requests_per_second
+        self.max_concurrency = max_concurrency
+        self.parse_workers = (
+            (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        )
+        self.rate_limiter = TokenBucket(rate=requests_per_second, burst=burst)
+        self.http_cache = http_cache
+        self.index = index
+        self.category_batch_size = category_batch_size
+        self.timer = timer or StageTimer()
+        self.profiler = profiler
         self.continue_on_failure = continue_on_failure
         self.ssl_verify = ssl_verify
-        self.default_parser = default_parser
+        self.default_parser = resolve_parser(default_parser)
         self.requests_kwargs = requests_kwargs or {}
         self.bs_get_text_kwargs = bs_get_text_kwargs or {}
         self.bs_kwargs = bs_kwargs or {}
+        self.limit_per_host = limit_per_host
+        self.total_timeout = total_timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
         self._session = requests.Session()
+        self._client_session: Optional[aiohttp.ClientSession] = None
         self.unwanted_attributes = {
             "id": "fw-skiplinks",
             "class": "narrow-v2",
@@ -920,9 +1265,12 @@ class ArticleScraper:
             "id": "skiplink-search",
             "id": "skiplink-footer",
         }
-        self.article_parser = ArticleParser()
+        self.article_parser = ArticleParser(timer=self.timer)
         self._articles: List[Article] = []
         self.previous_scraped_articles = self.load_json("./data/all_articles.json")
+        self._previous_by_url = {
+            article["url"]: article for article in self.previous_scraped_articles
+        }
 
         header_template = default_header_template.copy()
         self._session.headers.update(header_template)
@@ -932,10 +1280,9 @@ class ArticleScraper:
     @staticmethod
     def _check_parser(parser: str) -> None:
         """Check that parser is valid for bs4."""
-        valid_parsers = ["html.parser", "lxml", "xml", "lxml-xml", "html5lib"]
-        if parser not in valid_parsers:
+        if parser not in VALID_PARSERS:
             raise ValueError(
-                "`parser` must be one of " + ", ".join(valid_parsers) + "."
+                "`parser` must be one of " + ", ".join(VALID_PARSERS) + "."
             )
 
     @staticmethod
@@ -947,12 +1294,10 @@ class ArticleScraper:
             return []
 
     def has_article_been_scraped(self, url: str) -> bool:
-        return any(article["url"] == url for article in self.previous_scraped_articles)
+        return url in self._previous_by_url
 
     def get_scraped_article(self, url: str) -> Dict[str, Any]:
-        for article in self.previous_scraped_articles:
-            if article["url"] == url:
-                return article
+        return self._previous_by_url.get(url)
 
     @property
     def articles(self):
@@ -964,36 +1309,100 @@ class ArticleScraper:
         """Property to set articles."""
         self._articles = articles
 
+    async def __aenter__(self) -> "ArticleScraper":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def open(self) -> aiohttp.ClientSession:
+        """Open the pooled client session used by every fetch, if not open yet."""
+        if self._client_session is None or self._client_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                ssl=None if self._session.verify else False,
+            )
+            self._client_session = aiohttp.ClientSession(
+                connector=connector,
+                headers=dict(self._session.headers),
+                cookies=self._session.cookies.get_dict(),
+                timeout=aiohttp.ClientTimeout(
+                    total=self.total_timeout, connect=self.connect_timeout
+                ),
+            )
+        return self._client_session
+
+    async def close(self) -> None:
+        """Close the pooled client session and its connections."""
+        if self._client_session is not None:
+            await self._client_session.close()
+            self._client_session = None
+
     async def _fetch(
         self, url: str, retries: int = 3, cooldown: int = 2, backoff: float = 1.5
     ) -> str:
-        async with aiohttp.ClientSession() as session:
-            for i in range(retries):
-                try:
-                    async with session.get(
-                        url,
-                        headers=self._session.headers,
-                        ssl=None if self._session.verify else False,
-                        cookies=self._session.cookies.get_dict(),
-                    ) as response:
-                        return await response.text()
-                except aiohttp.ClientConnectionError as e:
-                    if i == retries - 1:
-                        raise
-                    else:
+        cached = self.http_cache.lookup(url) if self.http_cache else None
+        if self.http_cache is not None and self.http_cache.offline:
+            return self.http_cache.replay(url).text
+        headers = HttpCache.conditional_headers(cached)
+        session = await self.open()
+        for i in range(retries):
+            with self.timer.stage("rate_limit"):
+                await self.rate_limiter.acquire()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        self.rate_limiter.reward()
+                        return self.http_cache.refresh(cached, response.headers).text
+                    if response.status in self.RETRY_STATUSES:
+                        self.rate_limiter.penalize(
+                            TokenBucket.parse_retry_after(
+                                response.headers.get("Retry-After")
+                            )
+                        )
+                        if i == retries - 1:
+                            response.raise_for_status()
                         logger.warning(
-                            f"Error fetching {url} with attempt "
-                            f"{i + 1}/{retries}: {e}. Retrying..."
+                            f"{url} returned {response.status} with attempt "
+                            f"{i + 1}/{retries}, slowing down to "
+                            f"{self.rate_limiter.rate:.2f} requests/s. Retrying..."
+                        )
+                        continue
+                    self.rate_limiter.reward()
+                    text = await response.text()
+                    if self.http_cache is not None and response.status == 200:
+                        self.http_cache.store(
+                            url,
+                            response.status,
+                            response.headers,
+                            text.encode("utf-8"),
+                            "utf-8",
                         )
-                        await asyncio.sleep(cooldown * backoff**i)
+                    return text
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if i == retries - 1:
+                    raise
+                else:
+                    logger.warning(
+                        f"Error fetching {url} with attempt "
+                        f"{i + 1}/{retries}: {e!r}. Retrying..."
+                    )
+                    await asyncio.sleep(cooldown * backoff**i)
         raise ValueError("retry count exceeded")
 
     async def _fetch_with_rate_limit(
         self, url: str, semaphore: asyncio.Semaphore
     ) -> str:
+        # The semaphore caps requests in flight, _fetch waits on the token bucket for the rate
         async with semaphore:
             try:
-                return await self._fetch(url)
+                with self.timer.stage("fetch"):
+                    return await self._fetch(url)
+            except OfflineCacheMiss:
+                raise
             except Exception as e:
                 if self.continue_on_failure:
                     logger.warning(
@@ -1009,32 +1418,294 @@ class ArticleScraper:
 
     async def fetch_all(self, urls: List[str]) -> Any:
         """Fetch all urls concurrently with rate limiting."""
-        semaphore = asyncio.Semaphore(self.requests_per_second)
-        tasks = []
-        for url in urls:
-            task = asyncio.ensure_future(self._fetch_with_rate_limit(url, semaphore))
-            tasks.append(task)
+        owns_session = self._client_session is None
+        await self.open()
         try:
-            from tqdm.asyncio import tqdm_asyncio
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            tasks = []
+            for url in urls:
+                task = asyncio.ensure_future(
+                    self._fetch_with_rate_limit(url, semaphore)
+                )
+                tasks.append(task)
+            try:
+                from tqdm.asyncio import tqdm_asyncio
 
-            return await tqdm_asyncio.gather(
-                *tasks, desc="Fetching pages", ascii=True, mininterval=1
+                return await tqdm_asyncio.gather(
+                    *tasks, desc="Fetching pages", ascii=True, mininterval=1
+                )
+            except ImportError:
+                warnings.warn("For better logging of progress, `pip install tqdm`")
+                return await asyncio.gather(*tasks)
+        finally:
+            logger.info(
+                f"Fetched {len(urls)} urls at {self.rate_limiter.achieved_rate:.2f} "
+                f"requests/s (limit {self.rate_limiter.rate:.2f} requests/s)"
             )
-        except ImportError:
-            warnings.warn("For better logging of progress, `pip install tqdm`")
-            return await asyncio.gather(*tasks)
+            if owns_session:
+                await self.close()
 
     def scrape(self):
-        """Scrape the articles from the list of urls."""
-        soups = self.scrape_all(self.urls)
-        articles = []
-        for i, soup in enumerate(soups):
-            url = self.urls[i]
-            series = self.series[i]
+        """
+        Scrape the articles from the list of urls.
+
+        Every page is fetched and parsed exactly once, however many series list it, and the
+        Article is copied for each of its other series, see `group_series_by_url`. The parser
+        mutates the soup (e.g. `get_objective` extracts lists and tables), so the resulting
+        Article is both stored in `articles` and yielded rather than parsing the page again.
+        """
+        pages = group_series_by_url(self.urls, self.series)
+        soups = self.scrape_all(list(pages))
+        for soup, (url, series) in zip(soups, pages.items()):
+            article = self.parse_soup(soup, url, series[0])
+            for name in series:
+                if name != article.series:
+                    article = copy.copy(article)
+                    article.series = name
+                self._articles.append(article)
+                yield article
+
+    def parse_soup(self, soup: BeautifulSoup, url: str, series: str) -> Article:
+        """Strip the page chrome from a soup and parse it into an Article."""
+        with self.timer.stage("clean"):
             self.remove_unwanted_elements_by_attrs(soup, self.unwanted_attributes)
             self.remove_unwanted_tags(soup)
-            self._articles.append(self.article_parser.parse(soup, url, series))
-            yield self.article_parser.parse(soup, url, series)
+        return self.article_parser.parse(soup, url, series)
+
+    async def scrape_stream(
+        self, output_path: Optional[str] = None, queue_size: int = 16
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Fetch, parse and write the articles as a pipeline.
+
+        `max_concurrency` fetch workers put every page on a bounded queue as soon as it is
+        fetched, and the pages are parsed from the queue in completion order. The workers stop
+        fetching while the queue is full, so at most `queue_size` pages, plus one per fetch and
+        parse worker, are held in memory however many urls there are. Articles are not kept in
+        `articles`.
+
+        With `parse_workers` set, pages are parsed in a process pool while fetching continues
+        on the event loop, otherwise they are parsed on the event loop thread.
+
+        Urls are canonicalized and every page is fetched and parsed once, then yielded once per
+        series that lists it, with its `series` set accordingly, see `group_series_by_url`.
+
+        With an `index`, only new and changed articles are parsed and yielded. The index entry
+        of an article is updated when it is yielded, but not saved: the caller saves the index
+        once it stored the articles, see `run_scraper`.
+
+        Articles whose category needs the LLM are categorized in a stage of their own: they are
+        collected into batches of `category_batch_size` titles that are classified concurrently
+        while fetching and parsing go on, so they may be yielded later than the others.
+
+        Args:
+            output_path (Optional[str]): When given, every article is appended to this file as
+                one line of JSON (NDJSON) and flushed as soon as it is parsed, so a crash only
+                loses the pages still in flight. (default: None)
+            queue_size (int): The number of fetched pages waiting to be parsed. (default: 16)
+
+        Yields:
+            Dict[str, Any]: The `Article.to_dict()` payloads, in the order their pages finished parsing.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        pages = group_series_by_url(self.urls, self.series)
+        logger.info(f"Scraping {len(pages)} pages listed by {len(self.urls)} links")
+        pending = iter(pages.items())
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        owns_session = self._client_session is None
+        await self.open()
+
+        async def fetch_worker():
+            # Workers share one iterator, so every url is fetched exactly once
+            for url, series in pending:
+                html = await self._fetch_with_rate_limit(url, semaphore)
+                await queue.put((url, series, html))
+
+        async def close_queue():
+            try:
+                await asyncio.gather(*workers)
+            except asyncio.CancelledError:
+                # The consumer has stopped, nobody is left to read the sentinel
+                raise
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        workers = [
+            asyncio.ensure_future(fetch_worker()) for _ in range(self.max_concurrency)
+        ]
+        closer = asyncio.ensure_future(close_queue())
+        pool = (
+            ProcessPoolExecutor(max_workers=self.parse_workers)
+            if self.parse_workers
+            else None
+        )
+        parse_slots = self.parse_workers or 1
+        article_parser = copy.copy(self.article_parser)
+        article_parser.defer_llm_categories = True
+        # Parse futures, with the url, the series to yield the article for and the HTML hash
+        # to index once they complete
+        parsing: Dict[asyncio.Future, Tuple[str, List[str], str]] = {}
+        # Parsed articles waiting for an LLM category, and the batch being categorized
+        uncategorized: List[Tuple[Dict[str, Any], Tuple[str, List[str], str]]] = []
+        categorizing: Optional[asyncio.Future] = None
+        categorizing_batch: List[Tuple[Dict[str, Any], Tuple[str, List[str], str]]] = []
+        getter: Optional[asyncio.Future] = None
+        fetching = True
+        output = open(output_path, "w", encoding="utf-8") if output_path else None
+        count = 0
+        skipped = 0
+        try:
+            while fetching or parsing or uncategorized or categorizing is not None:
+                if fetching and getter is None and len(parsing) < parse_slots:
+                    getter = asyncio.ensure_future(queue.get())
+                if (
+                    categorizing is None
+                    and uncategorized
+                    and (
+                        len(uncategorized) >= self.category_batch_size
+                        or not (fetching or parsing)
+                    )
+                ):
+                    categorizing_batch, uncategorized = uncategorized, []
+                    categorizing = asyncio.ensure_future(
+                        self._categorize(
+                            [article["title"] for article, _ in categorizing_batch]
+                        )
+                    )
+                waiting = set(parsing)
+                if getter is not None:
+                    waiting.add(getter)
+                if categorizing is not None:
+                    waiting.add(categorizing)
+                done, _ = await asyncio.wait(
+                    waiting, return_when=asyncio.FIRST_COMPLETED
+                )
+                ready: List[Tuple[Dict[str, Any], Tuple[str, List[str], str]]] = []
+                if getter in done:
+                    item = getter.result()
+                    getter = None
+                    if item is None:
+                        fetching = False
+                    elif item[2]:
+                        url, series, html = item
+                        html_hash = ArticleIndex.hash_html(html)
+                        if self.index is not None:
+                            series = [
+                                name
+                                for name in series
+                                if not self.index.is_unchanged(url, name, html_hash)
+                            ]
+                            skipped += len(item[1]) - len(series)
+                        if series:
+                            future = self._parse_page(
+                                pool, article_parser, url, series[0], html
+                            )
+                            parsing[future] = (url, series, html_hash)
+                    # An empty page is a failed fetch that continue_on_failure already logged
+                for future in done:
+                    if future not in parsing:
+                        continue
+                    page = parsing.pop(future)
+                    article, durations = future.result()
+                    if durations:
+                        self.timer.merge(durations)
+                    if article["category"] is None:
+                        uncategorized.append((article, page))
+                    else:
+                        ready.append((article, page))
+                if categorizing in done:
+                    categories = categorizing.result()
+                    for article, page in categorizing_batch:
+                        article["category"] = categories[article["title"]]
+                        ready.append((article, page))
+                    categorizing, categorizing_batch = None, []
+                for parsed, (url, series, html_hash) in ready:
+                    for name in series:
+                        article = (
+                            parsed
+                            if name == parsed["series"]
+                            else {**parsed, "series": name}
+                        )
+                        if output is not None:
+                            output.write(json.dumps(article) + "\n")
+                            output.flush()
+                        if self.index is not None:
+                            self.index.update(
+                                url, name, article["document_id"], html_hash
+                            )
+                        count += 1
+                        yield article
+            # Raise the fetch error, if any, that stopped the workers
+            await closer
+        finally:
+            for task in (*workers, closer, *parsing):
+                task.cancel()
+            for task in (getter, categorizing):
+                if task is not None:
+                    task.cancel()
+            await asyncio.gather(*workers, closer, return_exceptions=True)
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            if output is not None:
+                output.close()
+            if skipped:
+                logger.info(f"Skipped {skipped} unchanged articles")
+            logger.info(
+                f"Scraped {count} articles at {self.rate_limiter.achieved_rate:.2f} "
+                f"requests/s (limit {self.rate_limiter.rate:.2f} requests/s)"
+            )
+            logger.info(f"Stage times:\n{self.timer.summary()}")
+            if owns_session:
+                await self.close()
+
+    async def _categorize(self, titles: List[str]) -> Dict[str, str]:
+        with self.timer.stage("categorize"):
+            return await self.article_parser.category_classifier.aclassify_many(titles)
+
+    def _parse_page(
+        self,
+        pool: Optional[ProcessPoolExecutor],
+        article_parser: ArticleParser,
+        url: str,
+        series: str,
+        html: str,
+    ) -> asyncio.Future:
+        """
+        Parse a page in the pool, or right away when there is none.
+
+        Returns:
+            asyncio.Future: Of the payload, and the stage durations measured in the pool worker
+                for `timer` (None when the page was parsed in this process and timed already).
+        """
+        loop = asyncio.get_running_loop()
+        parser = "xml" if url.endswith(".xml") else self.default_parser
+        args = (
+            article_parser,
+            html,
+            url,
+            series,
+            parser,
+            self.bs_kwargs,
+            self.unwanted_attributes,
+            self.profiler,
+        )
+        if pool is not None:
+            return loop.run_in_executor(pool, parse_article_html_timed, *args)
+        future = loop.create_future()
+        try:
+            future.set_result((parse_article_html(*args), None))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def scrape_to_ndjson(self, output_path: str, queue_size: int = 16) -> int:
+        """Stream the articles into an NDJSON file and return how many were written."""
+        count = 0
+        async for _ in self.scrape_stream(output_path, queue_size=queue_size):
+            count += 1
+        return count
 
     def scrape_all(
         self, urls: List[str], parser: Union[str, None] = None
@@ -1052,7 +1723,8 @@ class ArticleScraper:
                 else:
                     parser = self.default_parser
                 self._check_parser(parser)
-            final_results.append(BeautifulSoup(result, parser, **self.bs_kwargs))
+            with self.timer.stage("soup"):
+                final_results.append(BeautifulSoup(result, parser, **self.bs_kwargs))
 
         return final_results
 
@@ -1086,6 +1758,46 @@ class ArticleScraper:
                 element.decompose()
 
 
+def parse_article_html(
+    article_parser: ArticleParser,
+    html: str,
+    url: str,
+    series: str,
+    parser: str = "html.parser",
+    bs_kwargs: Optional[Dict[str, Any]] = None,
+    unwanted_attributes: Optional[Dict[str, str]] = None,
+    profiler: Optional[SlowPageProfiler] = None,
+) -> Dict[str, Any]:
+    """
+    Parse the raw HTML of an article page into its `Article.to_dict()` payload.
+
+    This is a module level function taking and returning plain data so that it can run in a
+    `ProcessPoolExecutor` worker; only the HTML string and the payload cross the process boundary.
+    The soup, clean and parse stages are timed on `article_parser.timer`.
+    """
+    ArticleScraper._check_parser(parser)
+    with profiler.profile(url) if profiler is not None else contextlib.nullcontext():
+        timer = article_parser.timer
+        with timer.stage("soup"):
+            soup = BeautifulSoup(html, parser, **(bs_kwargs or {}))
+        with timer.stage("clean"):
+            if unwanted_attributes:
+                ArticleScraper.remove_unwanted_elements_by_attrs(
+                    soup, unwanted_attributes
+                )
+            ArticleScraper.remove_unwanted_tags(soup)
+        return article_parser.parse(soup, url, series).to_dict()
+
+
+def parse_article_html_timed(
+    article_parser: ArticleParser, *args: Any
+) -> Tuple[Dict[str, Any], Dict[str, List[float]]]:
+    """`parse_article_html` for pool workers, also returning the stage durations it measured."""
+    # The parser arrives with an empty timer of its own, see `StageTimer.__getstate__`
+    payload = parse_article_html(article_parser, *args)
+    return payload, article_parser.timer.snapshot()
+
+
 def convert_series_to_product_family(abbreviation: str) -> str:
     product_family_name_map = {
         "Catalyst-1200": "Cisco Catalyst 1200 Series Switches",
@@ -1107,24 +1819,98 @@ def convert_series_to_product_family(abbreviation: str) -> str:
     return product_family_name_map.get(abbreviation, abbreviation)
 
 
-def run_scraper():
+def merge_ndjson_into_json(
+    ndjson_path: str, json_path: str, replace: bool = False
+) -> int:
+    """
+    Merge the articles of an NDJSON file into the JSON array at `json_path`.
+
+    Articles are keyed by their canonical url and series, an article of the NDJSON file replaces
+    the one stored under the same key and the others are kept. The array is replaced only once
+    it is completely written.
+
+    Args:
+        ndjson_path (str): The articles to merge, a missing file has none.
+        json_path (str): The JSON array of every article, a missing file has none.
+        replace (bool): Drop the stored articles, keeping only those of the NDJSON file. (default: False)
+
+    Returns:
+        int: The number of articles in the JSON array.
+    """
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    if not replace:
+        for article in ArticleScraper.load_json(json_path):
+            merged[(canonicalize_url(article["url"]), article["series"])] = article
+    try:
+        with open(ndjson_path, "r", encoding="utf-8") as source:
+            for line in source:
+                line = line.strip()
+                if line:
+                    article = json.loads(line)
+                    merged[(canonicalize_url(article["url"]), article["series"])] = (
+                        article
+                    )
+    except FileNotFoundError:
+        pass
+    partial = f"{json_path}.tmp"
+    with open(partial, "w", encoding="utf-8") as target:
+        json.dump(list(merged.values()), target)
+    os.replace(partial, json_path)
+    return len(merged)
+
+
+def run_scraper(
+    links_path: str = LINKS_PATH,
+    parse_workers: Optional[int] = None,
+    incremental: bool = True,
+    parser: Optional[str] = None,
+) -> int:
+    """
+    Scrape every link into `data/documents/articles_schema.ndjson`, then merge it into the
+    `articles_schema.json` array that the seed script reads.
+
+    In incremental mode the NDJSON file only has the new and changed articles, and the others
+    are kept from the previous runs. A full run replaces the array once it completes. When a
+    run fails, what it scraped so far is merged all the same, and the index is saved only
+    after the merge, so it never lists an article that is not in the array.
+
+    Args:
+        links_path (str): The links.json produced by the articles spider, or a directory of
+            links files such as `data/by_family`.
+        parse_workers (Optional[int]): Processes parsing pages, see `ArticleScraper`. (default: one per CPU)
+        incremental (bool): Only scrape articles that are new or changed since the last run,
+            tracked in `data/documents/articles_index.json`. (default: True)
+        parser (Optional[str]): The BeautifulSoup parser, see `ArticleScraper`. (default: auto)
+
+    Returns:
+        int: The number of articles scraped.
+    """
+    family_objs = load_links(links_path)
+    urls = [item["url"] for item in family_objs]
+    series = [item["family"] for item in family_objs]
     normalized_series = list(map(convert_series_to_product_family, series))
+    output_dir = f"{os.getcwd()}/data/documents"
     scraper = ArticleScraper(
         series=normalized_series,
         urls=urls,
+        parse_workers=parse_workers,
+        default_parser=parser,
+        http_cache=HttpCache.from_env(),
+        index=ArticleIndex(f"{output_dir}/articles_index.json") if incremental else None,
+        profiler=SlowPageProfiler.from_env(),
     )
-    articles = []
-    for article in scraper.scrape():
-        articles.append(article)
-    scraper.articles = articles
-    scraper.scrape()
-    articles = scraper.articles
-    output = []
-    for article in articles:
-        output.append(article.to_dict())
-    with open(f"{os.getcwd()}/data/documents/articles_schema.json", "w+") as f:
-        json.dump(output, f)
-    return articles
-
-
-run_scraper()
+    ndjson_path = f"{output_dir}/articles_schema.ndjson"
+    completed = False
+    try:
+        count = asyncio.run(scraper.scrape_to_ndjson(ndjson_path))
+        completed = True
+    finally:
+        total = merge_ndjson_into_json(
+            ndjson_path,
+            f"{output_dir}/articles_schema.json",
+            replace=completed and not incremental,
+        )
+        if scraper.index is not None:
+            scraper.index.save()
+    print(f"Scraped {count} articles, {total} in total\n{scraper.timer.summary()}")
+    return count
@@ -0,0 +1,290 @@
+"""
+Article categorization with an LLM, memoized on disk.
+
+Titles are classified by an OpenAI chat model when the breadcrumb of an article does not name
+its category. Results are appended to a JSON-lines cache keyed by the normalized title and
+the prompt version, so re-runs make no LLM calls for titles seen before. Bump
+`CATEGORY_PROMPT_VERSION` when the prompt changes to classify every title again.
+
+`CategoryClassifier.aclassify_many` classifies many titles at once with `abatch` under a
+concurrency limit, so the scrapers can categorize in a stage of their own instead of one
+blocking call per article. Titles the LLM fails on get a deterministic keyword category.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_PROMPT_VERSION = 1
+
+CATEGORY_PROMPT = """Based on the given title, choose a category from below.
+
+            Here are some rules to help you choose the right category:
+            1. If the article is about troubleshooting a problem, choose the 'Troubleshooting' category.
+            2. If the article title is about configuring a feature, choose the 'Configuration' category.
+            3. If the article title is about upgrading or installing firmware or Day Zero setups, choose the 'Install & Upgrade' category.
+            4. If the article is an overview of a feature or a best practice guide, choose the 'Maintain & Operate' category.
+            5. Most of our articles fall under the "Configuration" category but do not let this rule limit your choice. Choose the category that best fits the article.
+
+            There are 5 different categories to choose from.
+
+            The categories are: 1. Troubleshooting, 2. Configuration, 3. Install & Upgrade, 4. Maintain & Operate, 5. Design.
+
+            Title: {title}
+
+            Return only the category name and nothing else.
+            """
+
+DEFAULT_CACHE_PATH = "data/category_cache.jsonl"
+
+CATEGORIES = (
+    "Troubleshooting",
+    "Configuration",
+    "Install & Upgrade",
+    "Maintain & Operate",
+    "Design",
+)
+
+# Checked in order, the first match wins and titles matching none are "Configuration"
+KEYWORD_RULES = [
+    (
+        re.compile(
+            r"\b(troubleshoot\w*|fix\w*|resolv\w*|error|errors|issue|issues|fail\w*|"
+            r"not working|recover\w*|debug\w*)\b",
+            re.IGNORECASE,
+        ),
+        "Troubleshooting",
+    ),
+    (
+        re.compile(
+            r"\b(upgrad\w*|install\w*|firmware|day zero|day 0|initial setup|"
+            r"reset\w* to factory|factory default\w*)\b",
+            re.IGNORECASE,
+        ),
+        "Install & Upgrade",
+    ),
+    (
+        re.compile(r"\b(design\w*|plan\w*|architecture|topolog\w*)\b", re.IGNORECASE),
+        "Design",
+    ),
+    (
+        re.compile(
+            r"\b(overview|best practices?|understand\w*|faq|introduction to|"
+            r"what is|monitor\w*|maintain\w*|glossary)\b",
+            re.IGNORECASE,
+        ),
+        "Maintain & Operate",
+    ),
+]
+
+# Caches already loaded in this process, so parsers unpickled in worker processes share one
+_loaded_caches: Dict[str, "CategoryCache"] = {}
+
+
+def normalize_title(title: str) -> str:
+    return re.sub(r"\s+", " ", title).strip().lower()
+
+
+def keyword_category(title: str) -> str:
+    """Categorize a title by keywords, following the same rules the LLM is given."""
+    for pattern, category in KEYWORD_RULES:
+        if pattern.search(title):
+            return category
+    return "Configuration"
+
+
+def parse_category(output: str) -> Optional[str]:
+    """Map the LLM output to one of `CATEGORIES`, None if it names none of them."""
+    output = output.strip().strip("\"'.").lower()
+    for category in CATEGORIES:
+        if output == category.lower():
+            return category
+    for category in CATEGORIES:
+        if category.lower() in output:
+            return category
+    return None
+
+
+class CategoryCache:
+    """
+    An append-only JSON-lines file of `{"key": ..., "category": ...}` records.
+
+    Args:
+        path (str): The JSON-lines file, created on the first `put`.
+        prompt_version (int): Part of every key, entries of other versions are ignored. (default: `CATEGORY_PROMPT_VERSION`)
+    """
+
+    def __init__(self, path: str, prompt_version: int = CATEGORY_PROMPT_VERSION):
+        self.path = path
+        self.prompt_version = prompt_version
+        self._lock = threading.Lock()
+        self._categories: Dict[str, str] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interrupted run
+                        continue
+                    self._categories[record["key"]] = record["category"]
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def open(cls, path: str) -> "CategoryCache":
+        """The cache for `path`, loaded once per process."""
+        cache = _loaded_caches.get(path)
+        if cache is None:
+            cache = _loaded_caches[path] = cls(path)
+        return cache
+
+    def __reduce__(self):
+        # Worker processes reopen the file instead of receiving every entry with every task
+        return (CategoryCache.open, (self.path,))
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def key(self, title: str) -> str:
+        return f"v{self.prompt_version}:{normalize_title(title)}"
+
+    def get(self, title: str) -> Optional[str]:
+        return self._categories.get(self.key(title))
+
+    def put(self, title: str, category: str) -> None:
+        key = self.key(title)
+        with self._lock:
+            self._categories[key] = category
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # One write per line in append mode, so concurrent processes don't interleave records
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"key": key, "category": category}) + "\n")
+
+
+class CategoryClassifier:
+    """
+    Classifies article titles into categories, consulting the cache before the LLM.
+
+    The chain and its client are built on first use and reused for every title.
+
+    Args:
+        llm (Optional[Any]): The chat model or runnable to classify with. (default: `ChatOpenAI`)
+        cache (Optional[CategoryCache]): Where results are memoized. (default: the file named by
+            `ARTICLE_CATEGORY_CACHE`, or `data/category_cache.jsonl`)
+        memoize (bool): Set to False to always ask the LLM. (default: True)
+        max_concurrency (int): LLM requests `aclassify_many` sends at once. (default: 8)
+    """
+
+    def __init__(
+        self,
+        llm: Optional[Any] = None,
+        cache: Optional[CategoryCache] = None,
+        memoize: bool = True,
+        max_concurrency: int = 8,
+    ):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        if cache is None and memoize:
+            cache = CategoryCache.open(
+                os.getenv("ARTICLE_CATEGORY_CACHE", DEFAULT_CACHE_PATH)
+            )
+        self.cache = cache if memoize else None
+        self._chain = None
+        self.llm_calls = 0
+        self.fallbacks = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Clients hold connections and locks, workers build their own chain
+        return {**self.__dict__, "_chain": None}
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            from langchain.prompts import PromptTemplate
+            from langchain_core.output_parsers import StrOutputParser
+
+            llm = self.llm
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+
+                llm = ChatOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=2.0)
+            prompt = PromptTemplate.from_template(CATEGORY_PROMPT)
+            self._chain = prompt | llm | StrOutputParser()
+        return self._chain
+
+    def cached(self, title: str) -> Optional[str]:
+        return self.cache.get(title) if self.cache is not None else None
+
+    def classify(self, title: str) -> str:
+        """Return the category of `title`, asking the LLM only for titles not cached yet."""
+        category = self.cached(title)
+        if category is not None:
+            return category
+        self.llm_calls += 1
+        try:
+            output = self.chain.invoke({"title": title})
+        except Exception as err:
+            output = err
+        return self._record(title, output)
+
+    async def aclassify_many(self, titles: Iterable[str]) -> Dict[str, str]:
+        """
+        Classify many titles concurrently.
+
+        Cached titles are answered from the cache, the others are sent once each, however
+        often they repeat, through `chain.abatch` with at most `max_concurrency` requests in flight.
+
+        Returns:
+            Dict[str, str]: The category of every title.
+        """
+        titles = list(titles)
+        categories: Dict[str, str] = {}
+        pending: Dict[str, str] = {}
+        for title in titles:
+            category = self.cached(title)
+            if category is not None:
+                categories[title] = category
+            else:
+                pending.setdefault(normalize_title(title), title)
+        if pending:
+            uncached: List[str] = list(pending.values())
+            self.llm_calls += len(uncached)
+            try:
+                outputs = await self.chain.abatch(
+                    [{"title": title} for title in uncached],
+                    config={"max_concurrency": self.max_concurrency},
+                    return_exceptions=True,
+                )
+            except Exception as err:
+                # e.g. no API key to build the client with
+                outputs = [err] * len(uncached)
+            by_normalized = {
+                normalize_title(title): self._record(title, output)
+                for title, output in zip(uncached, outputs)
+            }
+            for title in titles:
+                if title not in categories:
+                    categories[title] = by_normalized[normalize_title(title)]
+        return categories
+
+    def _record(self, title: str, output: Any) -> str:
+        """Cache a valid LLM answer, or fall back to the keyword category without caching it."""
+        category = None if isinstance(output, Exception) else parse_category(output)
+        if category is None:
+            self.fallbacks += 1
+            category = keyword_category(title)
+            logger.warning(
+                f"LLM could not categorize {title!r} ({output!r}), using {category!r}"
+            )
+            return category
+        if self.cache is not None:
+            self.cache.put(title, category)
+        return category
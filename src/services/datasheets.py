@@ -3,15 +3,23 @@ Scrapes Cisco's Support Page Datasheets for product information.
 """
 
 import json
+import logging
 import os
 import re
 import math
-import requests
 from bs4 import BeautifulSoup, Tag, NavigableString
 import pprint
+from typing import Optional
+from src.services.html_parsers import make_soup
+from src.services.http_cache import cached_get
+from src.services.instrumentation import LogSampler
 
 cwd = os.getcwd()
 
+logger = logging.getLogger(__name__)
+# For the debug messages logged per table row
+row_logger = LogSampler(logger)
+
 CISCO_CATALYST_1200_SERIES = [
     "C1200-8T-D",
     "C1200-8T-E-2G",
@@ -273,7 +281,7 @@ CATALYST_1000_SERIES = [
 ]
 
 
-def main(urls: list[dict[str, str]]):
+def main(urls: list[dict[str, str]], parser: Optional[str] = None):
     json_list = []
     for url in urls:
         # initialize a dict to store the data. The dict should be empty at the start of each iteration
@@ -281,7 +289,7 @@ def main(urls: list[dict[str, str]]):
         # make a request to the url
         request = make_request(url=url["url"])
         # parse the request content with BeautifulSoup
-        soup = BeautifulSoup(request.content, "html.parser")
+        soup = make_soup(request.content, parser)
         concept = url["concept"]
         if re.search(r"Cisco Catalyst 1000 Series Switches", string=concept):
             sloppy_series_datasheet = process_catalyst_1000_series(soup, smb_builder)
@@ -350,9 +358,8 @@ def process_110_series_unmanaged_switch_data(
             for cell in row.find_all("td")
             if re.search(r".+", string=cell.get_text(strip=True, separator=" "))
         ]
-        print(f"cells: {cells}")
         determine_key = row.select("td")[0].text.strip()
-        print(f"determine_key: {determine_key}")
+        row_logger.debug("cells", "Cells of %s: %s", determine_key, cells)
         if determine_key in CISCO_110_SERIES_UNMANAGED:
             key = determine_key
         else:
@@ -398,7 +405,7 @@ def process_110_series_unmanaged_switch_data(
                     smb_builder[model]["number_of_ports_that_support_poe"] = (
                         number_of_ports_that_support_poe[i]
                     )
-                print(f"model_names: {model_names}")
+                logger.debug("PoE model names: %s", model_names)
 
             elif key and len(values) == 1:
                 smb_builder[key] = values.pop(0)
@@ -408,7 +415,9 @@ def process_110_series_unmanaged_switch_data(
                     data.append(data_entry)
                 smb_builder[key] = data
         except (IndexError, ValueError) as e:
-            print(f"Caught an exception of type {type(e).__name__}: {e}")
+            logger.debug(
+                "Skipped the %s row, %s: %s", key, type(e).__name__, e
+            )
             continue
     return smb_builder
 
@@ -428,7 +437,7 @@ def process_300_series_managed_switch_data(
             for cell in row.find_all("td")
             if re.search(r".+", string=cell.get_text(strip=True, separator=" "))
         ]
-        print(f"cells: {cells}")
+        row_logger.debug("cells", "Cells: %s", cells)
         if len(cells) == 1:
             continue
         if len(cells) == 2:
@@ -654,7 +663,7 @@ def process_catalyst_1000_series(soup: BeautifulSoup, smb_builder: dict) -> dict
             cell.get_text(strip=True, separator=" ") for cell in row.contents[1::2]
         ]
         cells = list(filter(lambda element: re.search(r".+", string=element), cells))
-        print(f"cells: {cells}")
+        row_logger.debug("cells", "Cells: %s", cells)
         # clean_cells = list(filter(lambda element: re.search(r'.+', string=element), cells))
         if cells and cells[0] in CATALYST_1000_SERIES:
             model_info.append(cells)
@@ -680,7 +689,7 @@ def process_catalyst_1000_series(soup: BeautifulSoup, smb_builder: dict) -> dict
 
     for array in header1_to_model:
         key = array.pop(0)
-        print(f"key: {key}")
+        logger.debug("Model: %s", key)
         smb_builder[key] = dict(zip(HEADERS1, array))
 
     for array in port_model_info:
@@ -744,7 +753,9 @@ def handle_table_data(headers_map: list[str], table_data: list[str], obj: dict)
                 new_key, value = conversion(data)
                 obj[model][new_key] = value
             except Exception as e:
-                print(f"Error in converting key '{key}' with value '{data}': {e}")
+                logger.warning(
+                    "Error in converting key '%s' with value '%s': %s", key, data, e
+                )
         else:
             obj[model][key] = data
 
@@ -769,7 +780,7 @@ def parse_row_data(rowspan: int, cells: list[str], row: Tag, obj: dict, length:
         headers_slice = math.ceil(length / 2) * -1
     unformatted_headers = cells[headers_slice::]
     headers_map = list(dict.fromkeys(map(create_joined_header, unformatted_headers)))
-    print(f"headers_map: {headers_map}")
+    row_logger.debug("headers_map", "Headers map: %s", headers_map)
 
     for _ in range(rowspan):
         row = row.find_next("tr")
@@ -778,7 +789,7 @@ def parse_row_data(rowspan: int, cells: list[str], row: Tag, obj: dict, length:
             for cell in row.find_all("td")
             if re.search(r".+", string=cell.get_text(strip=True, separator=" "))
         ]
-        print(f"table_data: {table_data}")
+        row_logger.debug("table_data", "Table data: %s", table_data)
         try:
             obj = handle_table_data(headers_map, table_data, obj)
         except Exception as e:
@@ -811,7 +822,7 @@ def parse_table(soup: BeautifulSoup, obj: dict):
             for cell in row.find_all("td")
             if re.search(r".+", string=cell.get_text(strip=True, separator=" "))
         ]
-        print(f"cell data: {cell_data_text}")
+        row_logger.debug("cell_data", "Cell data: %s", cell_data_text)
         if rowspan > 1 and any(word in cell_data_text for word in desired_titles):
             smb_builder = parse_row_data(
                 rowspan=rowspan - 1,
@@ -993,8 +1004,8 @@ corrected_dict = {}
 
 
 def make_request(url):
-    """Takes a URL and returns a request object"""
-    return requests.get(url=url, timeout=3000)
+    """Takes a URL and returns a response, revalidated against the HTTP cache"""
+    return cached_get(url, timeout=3000)
 
 
 def create_joined_header(key: str):
@@ -1021,6 +1032,3 @@ def create_joined_header(key: str):
     if "power_consumption:_worst_case" in joined_header:
         joined_header = "power_consumption"
     return joined_header
-
-
-main(urls=urls)
@@ -0,0 +1,34 @@
+"""
+Canonical urls and stable ids of the scraped documents.
+
+Ids are derived from what identifies a document, its canonical url and e.g. the topic of a
+guide section, instead of being drawn at random. Scraping a page again gives its documents
+the same ids, so seeding upserts them in place rather than inserting duplicates.
+"""
+
+from hashlib import sha256
+from urllib.parse import urlsplit, urlunsplit
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    The url a document is fetched and indexed by: https, a lowercase host, no query string and
+    no fragment. Links list the same page over http and https, and with tracking parameters.
+    Anything but an http(s) url is returned as is.
+    """
+    parts = urlsplit(url.strip())
+    if parts.scheme.lower() not in ("http", "https"):
+        return url
+    host = parts.netloc.lower()
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    return urlunsplit(("https", host, parts.path or "/", "", ""))
+
+
+def make_document_id(url: str, *parts: str) -> str:
+    """
+    The id of the document at `url`, or of a part of it such as a guide section, as a sha256 hex
+    digest of the canonical url and the `parts` naming the document within the page.
+    """
+    key = "\n".join([canonicalize_url(url), *parts])
+    return sha256(key.encode("utf-8")).hexdigest()
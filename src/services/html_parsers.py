@@ -0,0 +1,59 @@
+"""
+Picks the BeautifulSoup tree builder the scrapers parse pages with.
+
+`lxml` builds trees several times faster than the pure Python `html.parser`, so scrapers
+default to "auto", which is lxml when it is installed and `html.parser` otherwise. Set
+`SCRAPER_HTML_PARSER` or pass `parser` to a scraper to choose a builder explicitly.
+"""
+
+import os
+from typing import Any, List, Optional, Union
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+HTML_PARSER_ENV = "SCRAPER_HTML_PARSER"
+
+VALID_PARSERS = ("html.parser", "lxml", "xml", "lxml-xml", "html5lib")
+
+# The HTML parsers "auto" picks from, fastest first
+PREFERRED_HTML_PARSERS = ("lxml", "html.parser")
+
+
+def is_available(parser: str) -> bool:
+    return builder_registry.lookup(parser) is not None
+
+
+def available_html_parsers() -> List[str]:
+    """The installed parsers for HTML pages, fastest first."""
+    return [
+        parser
+        for parser in (*PREFERRED_HTML_PARSERS, "html5lib")
+        if is_available(parser)
+    ]
+
+
+def resolve_parser(parser: Optional[str] = None) -> str:
+    """
+    Turn a parser setting into the name of an installed BeautifulSoup tree builder.
+
+    Args:
+        parser (Optional[str]): A builder name or "auto". (default: `SCRAPER_HTML_PARSER`, or "auto")
+
+    Raises:
+        ValueError: If the parser is unknown or not installed.
+    """
+    parser = parser or os.getenv(HTML_PARSER_ENV) or "auto"
+    if parser == "auto":
+        return available_html_parsers()[0]
+    if parser not in VALID_PARSERS:
+        raise ValueError("`parser` must be one of " + ", ".join(VALID_PARSERS) + ".")
+    if not is_available(parser):
+        raise ValueError(f"The {parser} parser is not installed")
+    return parser
+
+
+def make_soup(
+    markup: Union[str, bytes], parser: Optional[str] = None, **kwargs: Any
+) -> BeautifulSoup:
+    """Parse `markup` with the resolved parser, see `resolve_parser`."""
+    return BeautifulSoup(markup, resolve_parser(parser), **kwargs)
@@ -0,0 +1,309 @@
+"""
+On-disk cache of raw HTTP responses shared by the scrapers.
+
+Bodies are gzip compressed and stored content-addressed under `bodies/`, so pages that did not
+change and pages with identical content are stored once. Status, headers and validators are
+indexed in an SQLite database. Cached pages are revalidated with `If-None-Match` and
+`If-Modified-Since`, and a `304 Not Modified` is answered from disk. In offline mode nothing
+is sent and every page is replayed from the cache.
+
+Set `SCRAPER_HTTP_CACHE` to the cache directory (default: `data/http_cache`, `off` disables
+it) and `SCRAPER_OFFLINE=true` to replay a previous run without network access.
+"""
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Union
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "data/http_cache"
+
+
+class OfflineCacheMiss(LookupError):
+    """Raised in offline mode for a url that is not in the cache."""
+
+
+@dataclass
+class CachedResponse:
+    """
+    A response served from, or just stored in, the cache.
+
+    It has the parts of `requests.Response` the scrapers use, so call sites can take either one.
+    """
+
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    encoding: Optional[str] = None
+    from_cache: bool = False
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class HttpCache:
+    """
+    A content-addressed disk cache of HTTP responses with conditional revalidation.
+
+    Args:
+        directory (Union[str, Path]): Where the SQLite index and the compressed bodies are kept.
+        offline (bool): Serve every request from the cache and never touch the network. (default: False)
+    """
+
+    def __init__(self, directory: Union[str, Path], offline: bool = False):
+        self.directory = Path(directory)
+        self.offline = offline
+        self.bodies = self.directory / "bodies"
+        self.bodies.mkdir(parents=True, exist_ok=True)
+        # Connections are shared by the event loop and the threads of the sync scrapers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.directory / "index.sqlite3", check_same_thread=False
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                digest TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["HttpCache"]:
+        """Build the cache configured by `SCRAPER_HTTP_CACHE` and `SCRAPER_OFFLINE`, None if disabled."""
+        directory = os.getenv("SCRAPER_HTTP_CACHE", DEFAULT_CACHE_DIR)
+        offline = os.getenv("SCRAPER_OFFLINE", "false").lower() == "true"
+        if directory.lower() in ("", "off", "false", "0"):
+            if offline:
+                raise ValueError("SCRAPER_OFFLINE needs SCRAPER_HTTP_CACHE")
+            return None
+        return cls(directory, offline=offline)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _body_path(self, digest: str) -> Path:
+        return self.bodies / digest[:2] / f"{digest}.gz"
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        """Return the cached response for `url`, None if there is none."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, encoding, digest, fetched_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, encoding, digest, fetched_at = row
+        try:
+            content = gzip.decompress(self._body_path(digest).read_bytes())
+        except FileNotFoundError:
+            logger.warning(f"Cached body of {url} is missing, refetching")
+            return None
+        return CachedResponse(
+            url=url,
+            status_code=status,
+            headers=json.loads(headers),
+            content=content,
+            encoding=encoding,
+            from_cache=True,
+            fetched_at=fetched_at,
+        )
+
+    @staticmethod
+    def conditional_headers(cached: Optional[CachedResponse]) -> Dict[str, str]:
+        """The `If-None-Match` and `If-Modified-Since` headers revalidating a cached response."""
+        if cached is None:
+            return {}
+        headers = {}
+        etag = _get_header(cached.headers, "ETag")
+        last_modified = _get_header(cached.headers, "Last-Modified")
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def store(
+        self,
+        url: str,
+        status: int,
+        headers: Mapping[str, str],
+        content: bytes,
+        encoding: Optional[str] = None,
+    ) -> CachedResponse:
+        """Cache a full response, replacing the previous one for `url`."""
+        headers = dict(headers)
+        digest = sha256(content).hexdigest()
+        path = self._body_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            # Write then rename, so an interrupted run never leaves a truncated body behind
+            partial = path.with_suffix(f".{os.getpid()}.tmp")
+            partial.write_bytes(gzip.compress(content))
+            partial.replace(path)
+        fetched_at = time.time()
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT digest FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    status,
+                    json.dumps(headers),
+                    encoding,
+                    _get_header(headers, "ETag"),
+                    _get_header(headers, "Last-Modified"),
+                    digest,
+                    fetched_at,
+                ),
+            )
+            self._db.commit()
+            if previous is not None and previous[0] != digest:
+                self._remove_unreferenced(previous[0])
+        self.misses += 1
+        return CachedResponse(url, status, headers, content, encoding, False, fetched_at)
+
+    def refresh(
+        self, cached: CachedResponse, headers: Mapping[str, str]
+    ) -> CachedResponse:
+        """Record a `304 Not Modified` for a cached response and return it."""
+        # A 304 may carry updated validators and caching headers
+        merged = {**cached.headers, **dict(headers)}
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET headers = ?, etag = ?, last_modified = ?, fetched_at = ? WHERE url = ?",
+                (
+                    json.dumps(merged),
+                    _get_header(merged, "ETag"),
+                    _get_header(merged, "Last-Modified"),
+                    time.time(),
+                    cached.url,
+                ),
+            )
+            self._db.commit()
+        self.revalidated += 1
+        cached.headers = merged
+        return cached
+
+    def replay(self, url: str) -> CachedResponse:
+        """Serve `url` from the cache in offline mode."""
+        cached = self.lookup(url)
+        if cached is None:
+            raise OfflineCacheMiss(f"{url} is not in the HTTP cache at {self.directory}")
+        self.hits += 1
+        return cached
+
+    def _remove_unreferenced(self, digest: str) -> None:
+        referenced = self._db.execute(
+            "SELECT 1 FROM responses WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone()
+        if referenced is None:
+            self._body_path(digest).unlink(missing_ok=True)
+
+    def get(
+        self,
+        url: str,
+        session: Optional[requests.Session] = None,
+        **kwargs: Any,
+    ) -> CachedResponse:
+        """
+        `requests.get` through the cache.
+
+        Args:
+            url (str): The url to fetch.
+            session (Optional[requests.Session]): The session to send the request with. (default: `requests`)
+            **kwargs: Passed on to `get`, e.g. `timeout`.
+
+        Returns:
+            CachedResponse: The response, from disk when the server answered 304.
+
+        Raises:
+            OfflineCacheMiss: In offline mode, if the url is not cached.
+        """
+        if self.offline:
+            return self.replay(url)
+        cached = self.lookup(url)
+        headers = {**kwargs.pop("headers", {}), **self.conditional_headers(cached)}
+        response = (session or requests).get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return self.refresh(cached, response.headers)
+        if response.status_code != 200:
+            return CachedResponse(
+                url,
+                response.status_code,
+                dict(response.headers),
+                response.content,
+                response.encoding,
+            )
+        return self.store(
+            url,
+            response.status_code,
+            response.headers,
+            response.content,
+            response.encoding,
+        )
+
+
+def _get_header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    """Case-insensitive header lookup on a plain dict."""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+_default_cache: Optional[HttpCache] = None
+_default_cache_loaded = False
+
+
+def get_default_cache() -> Optional[HttpCache]:
+    """The process-wide cache configured from the environment, created on first use."""
+    global _default_cache, _default_cache_loaded
+    if not _default_cache_loaded:
+        _default_cache = HttpCache.from_env()
+        _default_cache_loaded = True
+    return _default_cache
+
+
+def cached_get(url: str, **kwargs: Any) -> Union[CachedResponse, requests.Response]:
+    """`requests.get` through the default cache, or straight to the network when it is disabled."""
+    cache = get_default_cache()
+    if cache is None:
+        return requests.get(url, **kwargs)
+    return cache.get(url, **kwargs)
@@ -0,0 +1,241 @@
+"""
+Per-stage timing and slow page profiling for the scrapers.
+
+Wrap the stages of a scrape in `StageTimer.stage`, or decorate them with `StageTimer.timed`.
+Every duration is kept, so `summary()` can report the count, total, percentiles and a histogram
+of each stage at the end of a run. Timers that cross a process boundary arrive empty; return
+the worker's `snapshot()` and `merge` it into the timer of the run.
+
+`LogSampler` logs one in every N debug messages of a kind, for messages logged per node of a
+page. Set `SCRAPER_LOG_SAMPLE_EVERY` to change N (default: 100, 1 logs every message).
+
+`SlowPageProfiler` runs cProfile around a page and keeps the profile only when the page took
+longer than a threshold. Set `SCRAPER_PROFILE_SLOW_MS` to enable it for the scrapers, profiles
+are written to `SCRAPER_PROFILE_DIR` (default: `data/profiles`), read them with `pstats`.
+"""
+
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Upper bounds of the histogram buckets in seconds
+HISTOGRAM_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0, float("inf"))
+
+DEFAULT_PROFILE_DIR = "data/profiles"
+
+DEFAULT_LOG_SAMPLE_EVERY = 100
+
+
+class StageTimer:
+    """Collects the durations of the named stages of a run."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # A copy in another process times its own work, see `snapshot`
+        return {}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of the `with` block as one run of the stage `name`, even when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: Optional[str] = None) -> Callable[[F], F]:
+        """Decorator timing every call of a function or coroutine function as the stage `name`."""
+
+        def decorator(function: F) -> F:
+            stage = name or function.__qualname__
+            if inspect.iscoroutinefunction(function):
+
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(stage):
+                        return await function(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        """A copy of the durations of every stage, in seconds."""
+        with self._lock:
+            return {stage: list(values) for stage, values in self._durations.items()}
+
+    def merge(self, durations: Dict[str, List[float]]) -> None:
+        """Add the durations of a `snapshot`, e.g. one taken in a worker process."""
+        with self._lock:
+            for stage, values in durations.items():
+                self._durations.setdefault(stage, []).extend(values)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._durations.clear()
+
+    def histogram(
+        self, stage: str, buckets: Tuple[float, ...] = HISTOGRAM_BUCKETS
+    ) -> List[Tuple[float, int]]:
+        """The number of runs of `stage` that took at most each bucket's upper bound, and more than the previous one."""
+        counts = [0] * len(buckets)
+        for seconds in self.snapshot().get(stage, []):
+            for i, bound in enumerate(buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+        return list(zip(buckets, counts))
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Count, total, p50, p95 and max duration in milliseconds per stage."""
+        stats = {}
+        for stage, values in self.snapshot().items():
+            ordered = sorted(values)
+            stats[stage] = {
+                "count": len(ordered),
+                "total_ms": sum(ordered) * 1000,
+                "p50_ms": _percentile(ordered, 0.5) * 1000,
+                "p95_ms": _percentile(ordered, 0.95) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return stats
+
+    def summary(self) -> str:
+        """A table of the stats and histogram of every stage, slowest total first."""
+        stats = self.stats
+        if not stats:
+            return "No stages were timed"
+        bounds = [_format_bound(bound) for bound in HISTOGRAM_BUCKETS]
+        lines = [
+            f"{'stage':<28} {'count':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'max ms':>9}  histogram ({' '.join(bounds)})"
+        ]
+        for stage, stage_stats in sorted(
+            stats.items(), key=lambda item: item[1]["total_ms"], reverse=True
+        ):
+            histogram = " ".join(str(count) for _, count in self.histogram(stage))
+            lines.append(
+                f"{stage:<28} {stage_stats['count']:>7} "
+                f"{stage_stats['total_ms'] / 1000:>9.2f} {stage_stats['p50_ms']:>9.1f} "
+                f"{stage_stats['p95_ms']:>9.1f} {stage_stats['max_ms']:>9.1f}  {histogram}"
+            )
+        return "\n".join(lines)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _format_bound(bound: float) -> str:
+    if bound == float("inf"):
+        return "more"
+    return f"<={bound * 1000:g}ms"
+
+
+class LogSampler:
+    """
+    Logs the first and then every `every`-th debug message of each kind.
+
+    Messages are formatted lazily by `logging`, and nothing is counted while the logger is not
+    enabled for debug, so sampled calls in hot loops cost a level check when debug is off.
+
+    Attributes:
+        logger (logging.Logger): The logger the sampled messages are logged to.
+        every (int): One message in this many of a kind is logged.
+    """
+
+    def __init__(self, logger: logging.Logger, every: Optional[int] = None):
+        self.logger = logger
+        self.every = max(
+            1,
+            every or int(os.getenv("SCRAPER_LOG_SAMPLE_EVERY", DEFAULT_LOG_SAMPLE_EVERY)),
+        )
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+
+    def debug(self, kind: str, message: str, *args: Any) -> None:
+        """Log `message % args` at debug level if it is the sampled message of its `kind`."""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        with self._lock:
+            count = self._counts[kind]
+            self._counts[kind] = count + 1
+        if count % self.every == 0:
+            self.logger.debug(message, *args)
+
+
+class SlowPageProfiler:
+    """
+    Profiles pages with cProfile and keeps the profiles of the slow ones.
+
+    Attributes:
+        threshold_ms (float): Pages that took longer than this have their profile written.
+        directory (str): Where the `.prof` files are written, one per slow page.
+    """
+
+    def __init__(self, threshold_ms: float, directory: str = DEFAULT_PROFILE_DIR):
+        self.threshold_ms = threshold_ms
+        self.directory = directory
+
+    @classmethod
+    def from_env(cls) -> Optional["SlowPageProfiler"]:
+        """The profiler configured by `SCRAPER_PROFILE_SLOW_MS` and `SCRAPER_PROFILE_DIR`, None if disabled."""
+        threshold = os.getenv("SCRAPER_PROFILE_SLOW_MS")
+        if not threshold:
+            return None
+        return cls(
+            float(threshold), os.getenv("SCRAPER_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        )
+
+    def path_for(self, page: str) -> str:
+        name = re.sub(r"[^\w.-]+", "_", page).strip("_")[-150:]
+        return os.path.join(self.directory, f"{name}.prof")
+
+    @contextmanager
+    def profile(self, page: str) -> Iterator[None]:
+        """Profile the body of the `with` block, and write the profile if it was slow."""
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms > self.threshold_ms:
+                os.makedirs(self.directory, exist_ok=True)
+                path = self.path_for(page)
+                profile.dump_stats(path)
+                logger.info(
+                    f"{page} took {elapsed_ms:.0f}ms, wrote its profile to {path}"
+                )
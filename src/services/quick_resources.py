@@ -1,14 +1,18 @@
 """ Scrapes the quick resources from the website and saves them to a json file."""
 
 import json
+import logging
 import os
 import re
+from typing import Any, Dict, Optional
 from bs4 import BeautifulSoup
-import requests
-import pandas as pd
+from src.services.html_parsers import make_soup
+from src.services.http_cache import cached_get
 
 cwd = os.getcwd()
 
+logger = logging.getLogger(__name__)
+
 CBS_220_BUSINESS_SERIES = [
     "CBS220-8T-E-2G",
     "CBS220-8P-E-2G",
@@ -133,7 +137,7 @@ COMBINED_SERIES = (
 # Parses Quick Resources from Support Pages
 
 
-def quick_resources():
+def quick_resources(parser: Optional[str] = None):
     """This function parses Quick Resources from our Support Pages"""
     urls = [
         "https://www.cisco.com/c/en/us/support/smb/product-support/small-business/CBS220.html",
@@ -145,55 +149,51 @@ def quick_resources():
 
     refined_options = []
     for page in urls:
-        response = requests.get(page, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        series = soup.find("meta", property="og:title").get("content")
-        url = soup.find("meta", property="og:url").get("content")
-        description = soup.find("meta", property="og:description").get("content")
-        targets = soup.select("#flexContainer > a")
-        print(f"targets: {targets}")
-        anchors = []
-
-        for tag in targets:
-            key = tag.find_next(class_="copy").get_text(strip=True)
-            print(key)
-            key_list = key.split(" ")
-            if key_list and len(key_list) > 1:
-                key = "".join(key_list)
-            anchors.append({"id": key, "href": tag.get("href")})
-
-        dropdown_targets = soup.select(
-            "#flexContainer > div.flexItem > details.QSG > div#AG"
-        )
-        print(f"dropdowns: {dropdown_targets}")
-        if len(dropdown_targets) > 0:
-            for target in dropdown_targets:
-                subanchors = []
-                key = target.find_previous("summary").get_text(strip=True)
-                print(key)
-                text = key.split(" ")
-                if text and len(text) > 1:
-                    key = "".join(text)
-                    print(f"new key: {key}")
-                for link in target.contents[1::2]:
-                    print(f"link: {link}")
-                    device = link.get_text(strip=True)
-                    href = link["href"]
-                    subanchors.append({"device": device, "href": href})
-
-                anchors.append({"id": key, "nested_resources": subanchors})
-
-        refined_options.append(
-            {
-                "series": series,
-                "page": url,
-                "description": description,
-                "resources": anchors,
-            }
-        )
+        response = cached_get(page, timeout=10)
+        soup = make_soup(response.content, parser)
+        refined_options.append(parse_quick_resources(soup))
         dumped = json.dumps(refined_options, indent=4, skipkeys=True)
         with open(f"{cwd}/data/quick_resources.json", "r+", encoding="utf8") as file:
             file.write(dumped)
 
 
-quick_resources()
+def parse_quick_resources(soup: BeautifulSoup) -> Dict[str, Any]:
+    """Parse the Quick Resources of a series support page"""
+    series = soup.find("meta", property="og:title").get("content")
+    url = soup.find("meta", property="og:url").get("content")
+    description = soup.find("meta", property="og:description").get("content")
+    targets = soup.select("#flexContainer > a")
+    logger.debug("%s: %d resources", series, len(targets))
+    anchors = []
+
+    for tag in targets:
+        key = tag.find_next(class_="copy").get_text(strip=True)
+        key_list = key.split(" ")
+        if key_list and len(key_list) > 1:
+            key = "".join(key_list)
+        anchors.append({"id": key, "href": tag.get("href")})
+
+    dropdown_targets = soup.select(
+        "#flexContainer > div.flexItem > details.QSG > div#AG"
+    )
+    logger.debug("%s: %d dropdowns", series, len(dropdown_targets))
+    if len(dropdown_targets) > 0:
+        for target in dropdown_targets:
+            subanchors = []
+            key = target.find_previous("summary").get_text(strip=True)
+            text = key.split(" ")
+            if text and len(text) > 1:
+                key = "".join(text)
+            for link in target.contents[1::2]:
+                device = link.get_text(strip=True)
+                href = link["href"]
+                subanchors.append({"device": device, "href": href})
+
+            anchors.append({"id": key, "nested_resources": subanchors})
+
+    return {
+        "series": series,
+        "page": url,
+        "description": description,
+        "resources": anchors,
+    }
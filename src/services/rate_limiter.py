@@ -0,0 +1,110 @@
+"""An asyncio token bucket that limits how many requests per second the scrapers send."""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, Union
+
+
+class TokenBucket:
+    """
+    Limits the rate of requests, independently of how many run concurrently.
+
+    Tokens refill at `rate` per second up to `burst`, and every request takes one. The rate
+    adapts to the server: `penalize` halves it when the server pushes back (HTTP 429/503) and
+    honours `Retry-After`, `reward` raises it back towards `max_rate` on every success.
+
+    Args:
+        rate (float): Requests per second to start with.
+        burst (Optional[int]): Maximum tokens saved up while idle. (default: `rate` rounded up, at least 1)
+        min_rate (float): The rate never drops below this. (default: 0.1)
+        max_rate (Optional[float]): The rate never rises above this. (default: `rate`)
+        increase (float): Requests per second added back on every success. (default: 5% of `max_rate`)
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[int] = None,
+        min_rate: float = 0.1,
+        max_rate: Optional[float] = None,
+        increase: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.max_rate = float(max_rate) if max_rate is not None else self.rate
+        self.min_rate = min(min_rate, self.rate)
+        self.burst = burst if burst is not None else max(1, int(-(-self.rate // 1)))
+        self.increase = increase if increase is not None else self.max_rate * 0.05
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._acquired = 0
+        self._first_acquired_at: Optional[float] = None
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        async with self._lock:
+            while True:
+                now = self._clock()
+                if now < self._paused_until:
+                    await self._sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await self._sleep((1 - self._tokens) / self.rate)
+            self._acquired += 1
+            if self._first_acquired_at is None:
+                self._first_acquired_at = now
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Halve the rate and, when given, pause every request for `retry_after` seconds."""
+        # Bring the bucket up to date first, or the next acquire refills from before the penalty
+        now = self._clock()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    def reward(self) -> None:
+        """Raise the rate a little after a successful request."""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    @property
+    def achieved_rate(self) -> float:
+        """The average requests per second since the first request."""
+        if self._first_acquired_at is None:
+            return 0.0
+        elapsed = self._clock() - self._first_acquired_at
+        return self._acquired / elapsed if elapsed > 0 else float(self._acquired)
+
+    @staticmethod
+    def parse_retry_after(value: Union[str, None]) -> Optional[float]:
+        """Parse a `Retry-After` header, given either in seconds or as an HTTP date."""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -1,13 +1,23 @@
 import json
+import logging
 import requests
 import re
-import uuid
 from bs4 import BeautifulSoup, Tag
-from typing import List, Iterator, Dict, Any
-from langchain_text_splitters import TextSplitter
-from langchain.schema import Document
+from collections import Counter
+from typing import TYPE_CHECKING, List, Iterator, Dict, Any, Optional
+from langchain_core.documents import Document
 from langchain_core.document_loaders import BaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.services.document_ids import make_document_id
+from src.services.html_parsers import make_soup
+from src.services.http_cache import cached_get
+from src.services.instrumentation import LogSampler
+
+if TYPE_CHECKING:
+    from langchain_text_splitters import TextSplitter
+
+logger = logging.getLogger(__name__)
+# For the debug messages logged per section of a guide
+section_logger = LogSampler(logger)
 
 
 class SupportingDocumentsLoader(BaseLoader):
@@ -33,8 +43,9 @@ class SupportingDocumentsLoader(BaseLoader):
     You could also pass a list of URLs to the constructor but it does expect a certain format.
     """
 
-    def __init__(self, paths: List[str]) -> None:
+    def __init__(self, paths: List[str], parser: Optional[str] = None) -> None:
         self.paths = paths
+        self.parser = parser
         self.documents: List[Document] = []
 
     def save_to_json(self, path: str) -> None:
@@ -84,15 +95,13 @@ class SupportingDocumentsLoader(BaseLoader):
             yield from self._fetch(path)
 
     def _fetch(self, path: str):
-        response = requests.get(path)
+        response = cached_get(path)
         response.raise_for_status()
         page_content = response.text
-        soup = BeautifulSoup(page_content, "html.parser")
+        soup = make_soup(page_content, self.parser)
         chapter_content = soup.find("div", id="chapterContent")
         topic_data = self._parse_content(chapter_content)
-        metadatas = [
-            self._build_metadata(soup, path, topic=data["topic"]) for data in topic_data
-        ]
+        metadatas = self._build_metadatas(soup, path, topic_data)
         for data, meta in zip(topic_data, metadatas):
             if data["text"] == "This chapter contains the following sections:":
                 continue
@@ -106,24 +115,27 @@ class SupportingDocumentsLoader(BaseLoader):
             yield from self._fetch_cli(path)
 
     def _fetch_cli(self, path: str):
-        response = requests.get(path)
+        response = cached_get(path)
         response.raise_for_status()
         html = response.text
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.parser)
         topic_data = self._parse_cli_guide(soup)
-        metadatas = [self._build_metadata(soup, path) for data in topic_data]
+        metadatas = self._build_metadatas(soup, path, topic_data)
         for data, meta in zip(topic_data, metadatas):
             if not data.get("syntax") and not data.get("description"):
                 continue
             yield {**data, **meta}
 
     @classmethod
-    def from_url(cls, url: str) -> "SupportingDocumentsLoader":
+    def from_url(
+        cls, url: str, parser: Optional[str] = None
+    ) -> "SupportingDocumentsLoader":
         """
         Create a SupportingDocumentsLoader instance from a given URL.
 
         Args:
             url (str): The URL to fetch the supporting documents from.
+            parser (Optional[str]): The BeautifulSoup parser for every page, see `resolve_parser`. (default: None)
 
         Returns:
             SupportingDocumentsLoader: An instance of the SupportingDocumentsLoader class.
@@ -131,12 +143,12 @@ class SupportingDocumentsLoader(BaseLoader):
         Raises:
             requests.HTTPError: If there is an HTTP error while fetching the URL.
         """
-        response = requests.get(url)
+        response = cached_get(url)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, "html.parser")
+        soup = make_soup(response.content, parser)
         toc = soup.select("ul#bookToc > li > a")
         links = [f"https://www.cisco.com{link.get('href')}" for link in toc]
-        return cls(paths=links)
+        return cls(paths=links, parser=parser)
 
     @staticmethod
     def sanitize_text(text: str) -> str:
@@ -146,14 +158,35 @@ class SupportingDocumentsLoader(BaseLoader):
         cleaned_text = re.sub(r"([^\w\s])\1*", r"\1", cleaned_text)
         return cleaned_text
 
+    @classmethod
+    def _build_metadatas(
+        cls, soup: BeautifulSoup, url: str, topic_data: List[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
+        """Build the metadata of every section of a page, numbering the repeats of a topic."""
+        occurrences: Counter = Counter()
+        metadatas = []
+        for data in topic_data:
+            topic = data.get("topic") or ""
+            metadatas.append(
+                cls._build_metadata(
+                    soup, url, topic=topic, occurrence=occurrences[topic]
+                )
+            )
+            occurrences[topic] += 1
+        return metadatas
+
     @staticmethod
     def _build_metadata(soup: BeautifulSoup, url: str, **kwargs) -> Dict[str, str]:
         """Build metadata from BeautifulSoup output.
 
+        The `doc_id` is derived from the canonical url, the topic and its occurrence on the page,
+        so scraping the page again gives its sections the same ids, see `make_document_id`.
+
         Args:
             soup (BeautifulSoup): The BeautifulSoup object containing the parsed HTML.
             url (str): The URL of the source.
-            **kwargs: Additional keyword arguments.
+            **kwargs: Additional keyword arguments, `topic` and `occurrence`, the number of
+                sections with the same topic before this one on the page.
 
         Returns:
             Dict[str, str]: The metadata dictionary containing the extracted information.
@@ -167,7 +200,10 @@ class SupportingDocumentsLoader(BaseLoader):
             metadata["concept"] = concept.get("content", "No concept found.")
         if topic := kwargs.get("topic"):
             metadata["topic"] = topic
-        metadata["doc_id"] = str(uuid.uuid4())
+        id_parts = [kwargs.get("topic") or ""]
+        if kwargs.get("occurrence"):
+            id_parts.append(str(kwargs["occurrence"]))
+        metadata["doc_id"] = make_document_id(url, *id_parts)
         return metadata
 
     def _parse_content(self, content: Tag) -> List[Dict[str, Any]]:
@@ -187,20 +223,22 @@ class SupportingDocumentsLoader(BaseLoader):
         ]
 
     def load_and_split(
-        self, text_splitter: TextSplitter | None = None
+        self, text_splitter: Optional["TextSplitter"] = None
     ) -> List[Document]:
         docs = self.load()
         if text_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
             text_splitter = RecursiveCharacterTextSplitter(
                 chunk_size=400, chunk_overlap=50, add_start_index=True
             )
         return text_splitter.split_documents(docs)
 
-    def load_and_split_cli(self, text_splitter: TextSplitter) -> List[Document]:
+    def load_and_split_cli(self, text_splitter: "TextSplitter") -> List[Document]:
         docs = self.load_cli()
         return text_splitter.split_documents(docs)
 
-    def load_and_split_ag(self, text_splitter: TextSplitter) -> List[Document]:
+    def load_and_split_ag(self, text_splitter: "TextSplitter") -> List[Document]:
         docs = self.load_ag()
         return text_splitter.split_documents(docs)
 
@@ -242,7 +280,7 @@ class SupportingDocumentsLoader(BaseLoader):
                     filter(lambda x: re.match(r"\S", x), content["description"])
                 )
                 content["topic"] = topic
-                print(content)
+                section_logger.debug("content", "CLI section: %s", content)
                 cli_section.append(content)
             else:
                 sub_sections = section.find_all("section")
@@ -297,7 +335,7 @@ class SupportingDocumentsLoader(BaseLoader):
                             user_guidelines = sub.get_text()
                     elif sub.find(string=re.compile(r"^Examples?")):
                         examples = self._get_examples(sub)
-                        print(f"Examples: {examples}")
+                        section_logger.debug("examples", "Examples: %s", examples)
 
                 cli_section.append(
                     {
@@ -360,29 +398,31 @@ class SupportingDocumentsLoader(BaseLoader):
         return examples
 
 
-cat_1300_ag_loader = SupportingDocumentsLoader.from_url(
-    "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/Admin-Guide/catalyst-1300-admin-guide.html"
-)
-cat_1300_docs = cat_1300_ag_loader.load()
-with open("./data/schema/catalyst_1300_admin_guide.json", "w") as json_file:
-    json.dump([doc.dict() for doc in cat_1300_docs], json_file, indent=4)
-
-cat_1300_cli_loader = SupportingDocumentsLoader.from_url(
-    "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/cli/C1300-cli.html"
-)
-cat_1300_cli_docs = cat_1300_cli_loader.load_schema()
-with open("./data/schema/catalyst_1300_cli_guide.json", "w") as json_file:
-    json.dump(cat_1300_cli_docs, json_file, indent=4)
-# cat_1200_ag_loader = SupportingDocumentsLoader.from_url(
-#     "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/Admin-Guide/catalyst-1200-admin-guide.html"
-# )
-# cat_1200_ag_docs = cat_1200_ag_loader.load()
-# with open("./data/schema/catalyst_1200_admin_guide.json", "w") as json_file:
-#     json.dump([doc.dict() for doc in cat_1200_ag_docs], json_file, indent=4)
-
-# cat_1200_cli_loader = SupportingDocumentsLoader.from_url(
-#     "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/cli/C1200-cli.html"
-# )
-# cat_1200_cli_docs = cat_1200_cli_loader.load_schema()
-# with open("./data/schema/catalyst_1200_cli_guide.json", "w") as json_file:
-#     json.dump(cat_1200_cli_docs, json_file, indent=4)
+# The admin and CLI guides `save_guides` scrapes, by the name of their series
+GUIDES = {
+    "catalyst_1300": (
+        "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/Admin-Guide/catalyst-1300-admin-guide.html",
+        "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/cli/C1300-cli.html",
+    ),
+    "catalyst_1200": (
+        "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/Admin-Guide/catalyst-1200-admin-guide.html",
+        "https://www.cisco.com/c/en/us/td/docs/switches/campus-lan-switches-access/Catalyst-1200-and-1300-Switches/cli/C1200-cli.html",
+    ),
+}
+
+
+def save_guides(
+    name: str, output_dir: str = "./data/schema", parser: Optional[str] = None
+) -> None:
+    """
+    Scrape the admin and CLI guides of a series in `GUIDES` into
+    `<output_dir>/<name>_admin_guide.json` and `<output_dir>/<name>_cli_guide.json`.
+    """
+    admin_guide_url, cli_guide_url = GUIDES[name]
+    admin_guide_docs = SupportingDocumentsLoader.from_url(admin_guide_url, parser).load()
+    with open(f"{output_dir}/{name}_admin_guide.json", "w") as json_file:
+        json.dump([doc.dict() for doc in admin_guide_docs], json_file, indent=4)
+
+    cli_guide_docs = SupportingDocumentsLoader.from_url(cli_guide_url, parser).load_schema()
+    with open(f"{output_dir}/{name}_cli_guide.json", "w") as json_file:
+        json.dump(cli_guide_docs, json_file, indent=4)
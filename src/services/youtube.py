@@ -1,11 +1,9 @@
-from googleapiclient.discovery import build
-import pandas as pd
 import json
 from typing import List, Dict, Any
-from youtube_transcript_api import YouTubeTranscriptApi
 from datetime import datetime
-from langchain_openai import ChatOpenAI
-from langchain_community.document_loaders.youtube import YoutubeLoader
+
+# googleapiclient, youtube_transcript_api and pandas are imported where they are used, so
+# importing this module stays cheap
 
 
 class SeriesCatalogToTags:
@@ -210,6 +208,8 @@ class CiscoYouTubeDataLoader:
         self.api_key = api_key
         self.playlist_id = playlist_id
         self.channel_ids = channel_ids
+        from googleapiclient.discovery import build
+
         self.youtube_service = build("youtube", "v3", developerKey=self.api_key)
         self.scraped_videos_json = self._load_scraped_videos()
         self.series_catalog = SeriesCatalogToTags()
@@ -371,6 +371,8 @@ class CiscoYouTubeDataLoader:
     def get_video_transcript(
         self, video_data: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
+        from youtube_transcript_api import YouTubeTranscriptApi
+
         videos = []
         for video in video_data:
             if "transcript" in video:
@@ -837,6 +839,8 @@ class CiscoYouTubeDataLoader:
             print(f"Error saving videos to JSON file. Error: {e}")
 
     def save_videos_to_csv(self, path: str):
+        import pandas as pd
+
         try:
             df = pd.DataFrame(self.videos)
             df.to_csv(path, index=True)
@@ -849,8 +853,10 @@ PLAYLIST_ID = "PLB4F91009260AB3D7"
 
 channel_ids = ["UCEWiIE6Htd8mvlOR6YQez1g"]
 
-youtube_loader = CiscoYouTubeDataLoader(
-    GOOGLE_API_KEY, PLAYLIST_ID, channel_ids, fetch=True
-)
 
-youtube_loader.save_videos_to_csv("./data/smb_youtube_videos.csv")
+def save_videos(path: str = "./data/smb_youtube_videos.csv") -> None:
+    """Fetch the videos of the Cisco SMB playlist and channels and save them to a CSV file."""
+    youtube_loader = CiscoYouTubeDataLoader(
+        GOOGLE_API_KEY, PLAYLIST_ID, channel_ids, fetch=True
+    )
+    youtube_loader.save_videos_to_csv(path)
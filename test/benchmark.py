@@ -0,0 +1,208 @@
+"""
+Offline throughput benchmark of the page parsers on the saved corpus.
+
+Every HTML parser is measured in a fresh interpreter, so its peak RSS is its own. For every
+corpus the report has pages per second and the mean time per page of each stage: building
+the soup, stripping it like the scraper does and parsing it. The parsers log at the level of
+`--log-level`, WARNING by default, so debug logging is off like in a production scrape; pass
+DEBUG to measure what it costs.
+
+With `--hot-paths` it times the ArticleParser hot paths instead: `get_steps` on synthetic
+articles of growing length, which must grow linearly with the step count, and the step check
+run on every element of the article pages against the plain pattern it stands in for.
+
+Usage:
+    python -m test.benchmark [--rounds N] [--parser NAME ...] [--log-level LEVEL] [--json]
+    python -m test.benchmark --hot-paths [--rounds N] [--json]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from src.services.articles import ArticleParser
+from src.services.categories import CategoryClassifier
+from src.services.html_parsers import available_html_parsers, make_soup
+from test.corpus import CORPORA, FIXTURES, Corpus, long_article
+
+STAGES = ("soup", "clean", "parse")
+
+
+def benchmark_parser(
+    parser: str, rounds: int = 10, log_level: str = "WARNING"
+) -> Dict[str, Any]:
+    """
+    Parse every page of every corpus `rounds` times with `parser`, in this process.
+
+    Returns:
+        Dict[str, Any]: The parser, the log level, the peak RSS of the process in KB and the
+            results of every corpus.
+    """
+    src_logger = logging.getLogger("src")
+    level = src_logger.level
+    src_logger.setLevel(log_level)
+    # What is logged is written, but to nowhere, so it doesn't bury the report
+    with open(os.devnull, "w") as devnull:
+        handler = logging.StreamHandler(devnull)
+        src_logger.addHandler(handler)
+        try:
+            corpora = [benchmark_corpus(corpus, parser, rounds) for corpus in CORPORA]
+        finally:
+            src_logger.removeHandler(handler)
+            src_logger.setLevel(level)
+    return {
+        "parser": parser,
+        "log_level": log_level,
+        # KB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "corpora": corpora,
+    }
+
+
+def benchmark_corpus(corpus: Corpus, parser: str, rounds: int) -> Dict[str, Any]:
+    """Pages per second and mean stage times of parsing every page of `corpus` `rounds` times."""
+    pages = [(path, path.read_text(encoding="utf-8")) for path in corpus.pages]
+    totals = dict.fromkeys(STAGES, 0.0)
+    for _ in range(rounds):
+        for path, html in pages:
+            start = time.perf_counter()
+            soup = make_soup(html, parser)
+            built = time.perf_counter()
+            if corpus.clean is not None:
+                corpus.clean(soup)
+            cleaned = time.perf_counter()
+            corpus.parse(soup, path)
+            parsed = time.perf_counter()
+            totals["soup"] += built - start
+            totals["clean"] += cleaned - built
+            totals["parse"] += parsed - cleaned
+    count = rounds * len(pages)
+    return {
+        "corpus": corpus.name,
+        "pages": len(pages),
+        "pages_per_second": count / sum(totals.values()),
+        "stage_ms": {stage: total * 1000 / count for stage, total in totals.items()},
+    }
+
+
+def run(
+    parsers: Optional[List[str]] = None, rounds: int = 10, log_level: str = "WARNING"
+) -> List[Dict[str, Any]]:
+    """Benchmark every parser in a process of its own."""
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    for parser in parsers or available_html_parsers():
+        with context.Pool(1) as pool:
+            reports.append(pool.apply(benchmark_parser, (parser, rounds, log_level)))
+    return reports
+
+
+def benchmark_get_steps(
+    rounds: int = 10, sizes: Tuple[int, ...] = (150, 600)
+) -> Dict[str, float]:
+    """Mean milliseconds `get_steps` takes on an article of each number of steps."""
+    parser = ArticleParser(category_classifier=CategoryClassifier(memoize=False))
+    timings = {}
+    for steps in sizes:
+        total = 0.0
+        for _ in range(rounds):
+            # get_steps leaves the page as it was, but build each one outside the timing
+            soup = long_article(steps)
+            start = time.perf_counter()
+            parser.get_steps(soup)
+            total += time.perf_counter() - start
+        timings[f"get_steps {steps} steps ms"] = total * 1000 / rounds
+    return timings
+
+
+def benchmark_step_indicator(rounds: int = 10) -> Dict[str, float]:
+    """
+    Mean microseconds per article page of `is_step_indicator` on every element, and of the
+    plain `Step (\\d+)` pattern it replaces.
+    """
+    pages = [
+        make_soup(path.read_text(encoding="utf-8"), "html.parser")
+        for path in FIXTURES.glob("articles/*.html")
+    ]
+    elements = [soup.find_all(True) for soup in pages]
+    pattern = re.compile(r"Step (\d+)")
+    checks = {
+        "is_step_indicator us per page": ArticleParser.is_step_indicator,
+        "plain step pattern us per page": lambda element: pattern.match(
+            element.text.strip()
+        ),
+    }
+    timings = {}
+    for name, check in checks.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for tags in elements:
+                for element in tags:
+                    check(element)
+        timings[name] = (time.perf_counter() - start) * 1e6 / (rounds * len(pages))
+    return timings
+
+
+def run_hot_paths(rounds: int = 10) -> Dict[str, float]:
+    """Time the ArticleParser hot paths, in this process."""
+    return {**benchmark_get_steps(rounds), **benchmark_step_indicator(rounds)}
+
+
+def format_report(reports: List[Dict[str, Any]]) -> str:
+    lines = [
+        f"Log level: {reports[0]['log_level']}" if reports else "No parsers",
+        f"{'parser':<12} {'corpus':<14} {'pages/s':>9} "
+        + " ".join(f"{stage + ' ms':>9}" for stage in STAGES)
+        + f" {'peak RSS':>10}"
+    ]
+    for report in reports:
+        for corpus in report["corpora"]:
+            lines.append(
+                f"{report['parser']:<12} {corpus['corpus']:<14} "
+                f"{corpus['pages_per_second']:>9.1f} "
+                + " ".join(f"{corpus['stage_ms'][stage]:>9.2f}" for stage in STAGES)
+                + f" {report['peak_rss_kb'] / 1024:>8.1f}MB"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument(
+        "--parser",
+        action="append",
+        dest="parsers",
+        help="an HTML parser to measure, every installed one by default",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="WARNING",
+        choices=["DEBUG", "INFO", "WARNING"],
+        help="the level the parsers log at, debug logging is off by default",
+    )
+    parser.add_argument(
+        "--hot-paths",
+        action="store_true",
+        help="time the ArticleParser hot paths instead of the parsers",
+    )
+    parser.add_argument("--json", action="store_true", help="print the raw reports")
+    args = parser.parse_args()
+    if args.hot_paths:
+        timings = run_hot_paths(args.rounds)
+        print(
+            json.dumps(timings, indent=2)
+            if args.json
+            else "\n".join(f"{name:<40} {value:>10.2f}" for name, value in timings.items())
+        )
+        return
+    reports = run(args.parsers, args.rounds, args.log_level)
+    print(json.dumps(reports, indent=2) if args.json else format_report(reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Recorded pages of every kind the scrapers parse, with the parse each one goes through.
+
+Every `<name>.html` under `test/fixtures` has its expected output in `<name>.json` next to it.
+Regenerate them after an intended change of a parser's output with `python -m test.test_parser`
+for the articles and `python -m test.test_corpus` for the other pages.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from bs4 import BeautifulSoup
+from src.services.articles import ArticleParser, ArticleScraper
+from src.services.categories import CategoryClassifier
+from src.services.datasheets import parse_table
+from src.services.quick_resources import parse_quick_resources
+from src.services.supporting_documents_loader import SupportingDocumentsLoader
+
+FIXTURES = Path(__file__).parent / "fixtures"
+ARTICLE_URL = "https://www.cisco.com/c/en/us/support/docs/smb/{name}.html"
+ARTICLE_SERIES = "Cisco Business 350 Series Managed Switches"
+
+
+@dataclass
+class Corpus:
+    """
+    Saved pages of one kind.
+
+    Attributes:
+        name (str): The name in benchmark reports.
+        pattern (str): The pages, a glob relative to `test/fixtures`.
+        parse (Callable[[BeautifulSoup, Path], Any]): Turns the soup of a page into its output.
+        clean (Optional[Callable[[BeautifulSoup], None]]): Strips a soup before `parse`, like the scraper does.
+    """
+
+    name: str
+    pattern: str
+    parse: Callable[[BeautifulSoup, Path], Any]
+    clean: Optional[Callable[[BeautifulSoup], None]] = None
+
+    @property
+    def pages(self) -> List[Path]:
+        return sorted(FIXTURES.glob(self.pattern))
+
+
+@lru_cache(maxsize=None)
+def unwanted_article_attributes() -> Dict[str, str]:
+    return ArticleScraper(series=[]).unwanted_attributes
+
+
+def clean_article(soup: BeautifulSoup) -> None:
+    ArticleScraper.remove_unwanted_elements_by_attrs(
+        soup, unwanted_article_attributes()
+    )
+    ArticleScraper.remove_unwanted_tags(soup)
+
+
+def parse_article(soup: BeautifulSoup, path: Path) -> dict:
+    parser = ArticleParser(category_classifier=CategoryClassifier(memoize=False))
+    return parser.parse(
+        soup, ARTICLE_URL.format(name=path.stem), ARTICLE_SERIES
+    ).to_dict()
+
+
+def parse_datasheet(soup: BeautifulSoup, path: Path) -> dict:
+    return parse_table(soup=soup, obj={})
+
+
+def parse_admin_guide(soup: BeautifulSoup, path: Path) -> List[dict]:
+    loader = SupportingDocumentsLoader(paths=[])
+    return loader._parse_content(soup.find("div", id="chapterContent"))
+
+
+def parse_cli_guide(soup: BeautifulSoup, path: Path) -> List[dict]:
+    return SupportingDocumentsLoader(paths=[])._parse_cli_guide(soup)
+
+
+def parse_support_page(soup: BeautifulSoup, path: Path) -> dict:
+    return parse_quick_resources(soup)
+
+
+def long_article(steps: int) -> BeautifulSoup:
+    """A page with one section of `steps` paragraph steps"""
+    body = "".join(
+        f"<p><b>Step {number}.</b> Do thing {number}.</p><p>Detail {number}.</p>"
+        "<ul><li>Option</li></ul>"
+        for number in range(1, steps + 1)
+    )
+    return BeautifulSoup(
+        f"<html><body><h2>Objective</h2><p>Goal</p><h2>Configure</h2>{body}</body></html>",
+        "html.parser",
+    )
+
+
+CORPORA = [
+    Corpus("articles", "articles/*.html", parse_article, clean_article),
+    Corpus("datasheets", "datasheets/*.html", parse_datasheet),
+    Corpus("admin guides", "guides/admin_*.html", parse_admin_guide),
+    Corpus("cli guides", "guides/cli_*.html", parse_cli_guide),
+    Corpus("support pages", "support/*.html", parse_support_page),
+]
@@ -0,0 +1,526 @@
+"""module pytest"""
+import asyncio
+import json
+from operator import itemgetter
+import pytest
+from bs4 import BeautifulSoup
+from src.services import articles
+from src.services.articles import Article, ArticleIndex, ArticleScraper
+from src.services.instrumentation import StageTimer
+from src.services.rate_limiter import TokenBucket
+from test.test_rate_limiter import FakeClock
+
+PAGE = "<html><head><title>{title} - Cisco</title></head><body></body></html>"
+ARTICLE_PAGE = """<html><head><title>Configure VLANs on a Switch - Cisco</title></head>
+<body>
+<div id="fw-breadcrumb"><ul><li><a><span itemprop="name">Configuration Examples and TechNotes</span></a></li></ul></div>
+<div class="documentId">Document ID:smb{number}</div>
+<h2>Objective</h2><p>This article explains how to configure VLANs.</p>
+<h2>Applicable Devices | Software Version</h2><ul><li>CBS250 | 3.1</li></ul>
+<h4>Step 1</h4><p>Log in to the web user interface.</p>
+</body></html>"""
+
+
+class CountingParser:
+    """Stands in for ArticleParser and counts the pages it is asked to parse"""
+
+    def __init__(self, timer=None):
+        self.calls = []
+        self.timer = timer or StageTimer()
+
+    def parse(self, soup, url, series):
+        self.calls.append(url)
+        return Article(
+            name=series,
+            title=soup.title.string,
+            document_id=url,
+            url=url,
+            category="Configuration",
+            objective=None,
+            applicable_devices=[],
+            steps=[],
+        )
+
+
+def fake_scrape_all(self, urls, parser=None):
+    return [BeautifulSoup(PAGE.format(title=url), "html.parser") for url in urls]
+
+
+async def fake_fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+    await asyncio.sleep(0)
+    return PAGE.format(title=url)
+
+
+def test_scrape_parses_each_page_once(monkeypatch):
+    """
+    Testcase for scrape parsing every page exactly once and yielding
+    the same Article objects it stores
+    """
+    monkeypatch.setattr(ArticleScraper, "scrape_all", fake_scrape_all)
+    scraper = ArticleScraper(series=["CBS250", "CBS350"], urls=["a", "b"])
+    scraper.article_parser = CountingParser()
+
+    yielded = list(scraper.scrape())
+
+    assert scraper.article_parser.calls == ["a", "b"]
+    assert yielded == scraper.articles
+
+
+def test_run_scraper_parses_each_page_once(monkeypatch, tmp_path):
+    """
+    Testcase for run_scraper scraping once and writing one schema
+    entry per link
+    """
+    links = tmp_path / "links.json"
+    links.write_text(
+        json.dumps(
+            [
+                {"url": "https://www.cisco.com/a.html", "family": "CBS250"},
+                {"url": "https://www.cisco.com/b.html", "family": "CBS350"},
+            ]
+        )
+    )
+    (tmp_path / "data" / "documents").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ArticleScraper, "_fetch", fake_fetch)
+    parser = CountingParser()
+    monkeypatch.setattr(articles, "ArticleParser", lambda **kwargs: parser)
+
+    scraped = articles.run_scraper(str(links), parse_workers=0)
+
+    assert len(parser.calls) == 2
+    assert scraped == 2
+    output = json.loads(
+        (tmp_path / "data" / "documents" / "articles_schema.json").read_text()
+    )
+    assert sorted(article["series"] for article in output) == [
+        "Cisco Business 250 Series Smart Switches",
+        "Cisco Business 350 Series Managed Switches",
+    ]
+
+
+def test_run_scraper_keeps_the_corpus_across_incremental_runs(monkeypatch, tmp_path):
+    """
+    Testcase for incremental runs merging the new and changed articles into
+    the schema, and for a failed run only indexing the articles it stored
+    """
+    urls = [f"https://www.cisco.com/{name}.html" for name in "abc"]
+    links = tmp_path / "links.json"
+    links.write_text(json.dumps([{"url": url, "family": "CBS250"} for url in urls]))
+    documents = tmp_path / "data" / "documents"
+    documents.mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    versions = dict.fromkeys(urls, "v1")
+    failing = set()
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        await asyncio.sleep(0)
+        return PAGE.format(title=versions[url])
+
+    class FailingParser(CountingParser):
+        def parse(self, soup, url, series):
+            if url in failing:
+                raise RuntimeError(f"cannot parse {url}")
+            return super().parse(soup, url, series)
+
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+    parser = FailingParser()
+    monkeypatch.setattr(articles, "ArticleParser", lambda **kwargs: parser)
+
+    def scrape():
+        parser.calls.clear()
+        return articles.run_scraper(str(links), parse_workers=0)
+
+    def stored():
+        output = json.loads((documents / "articles_schema.json").read_text())
+        return {article["url"]: article["title"] for article in output}
+
+    assert scrape() == 3
+    assert scrape() == 0
+    assert stored() == dict.fromkeys(urls, "v1 - Cisco")
+
+    versions[urls[1]] = "v2"
+    assert scrape() == 1
+    assert stored() == {
+        urls[0]: "v1 - Cisco",
+        urls[1]: "v2 - Cisco",
+        urls[2]: "v1 - Cisco",
+    }
+
+    versions.update(dict.fromkeys(urls, "v3"))
+    failing.add(urls[2])
+    with pytest.raises(RuntimeError):
+        scrape()
+    index = ArticleIndex(str(documents / "articles_index.json"))
+    for url in urls:
+        if index.get(url)["html_hash"] == ArticleIndex.hash_html(PAGE.format(title="v3")):
+            assert stored()[url] == "v3 - Cisco"
+    assert stored()[urls[2]] == "v1 - Cisco"
+
+    failing.clear()
+    scrape()
+    assert stored() == dict.fromkeys(urls, "v3 - Cisco")
+    assert urls[2] in parser.calls
+
+
+def test_scrape_stream_bounds_queue_and_keeps_completed_work(monkeypatch, tmp_path):
+    """
+    Testcase for scrape_stream holding at most queue_size fetched pages,
+    and flushing every parsed article before a later page fails
+    """
+    urls = [f"https://www.cisco.com/{i}.html" for i in range(10)]
+    fetched = []
+    parsed = []
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        await asyncio.sleep(0)
+        fetched.append(url)
+        return PAGE.format(title=url)
+
+    class FailingParser(CountingParser):
+        def parse(self, soup, url, series):
+            # Pages fetched but not yet parsed: queued ones, one per blocked fetch
+            # worker and the one being parsed
+            assert len(fetched) - len(parsed) <= 2 + scraper.max_concurrency + 1
+            parsed.append(url)
+            if url == urls[5]:
+                raise RuntimeError("parser crashed")
+            return super().parse(soup, url, series)
+
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+    scraper = ArticleScraper(series=["CBS250"] * len(urls), urls=urls)
+    scraper.article_parser = FailingParser()
+    output = tmp_path / "articles.ndjson"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scraper.scrape_to_ndjson(str(output), queue_size=2))
+
+    written = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [article["url"] for article in written] == parsed[:-1]
+    assert parsed[-1] == urls[5]
+    assert scraper.articles == []
+
+
+def test_scrape_stream_closes_early_with_full_queue(monkeypatch):
+    """
+    Testcase for closing the scrape_stream generator after the first
+    article while the fetch workers are blocked on a full queue
+    """
+    urls = [f"https://www.cisco.com/{i}.html" for i in range(10)]
+    monkeypatch.setattr(ArticleScraper, "_fetch", fake_fetch)
+    scraper = ArticleScraper(series=["CBS250"] * len(urls), urls=urls)
+    scraper.article_parser = CountingParser()
+
+    async def take_first():
+        stream = scraper.scrape_stream(queue_size=1)
+        first = await stream.__anext__()
+        # Let the fetch workers fill the queue again before closing
+        await asyncio.sleep(0.01)
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(asyncio.wait_for(take_first(), timeout=10))
+
+    assert first["url"] in urls
+    assert scraper._client_session is None
+
+
+def test_scrape_stream_parses_in_process_pool(monkeypatch):
+    """
+    Testcase for scrape_stream parsing pages in worker processes with the
+    same payloads as parsing them on the event loop thread
+    """
+    urls = [f"https://www.cisco.com/{i}.html" for i in range(4)]
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        return ARTICLE_PAGE.format(number=url.rsplit("/", 1)[1].split(".")[0])
+
+    async def collect(parse_workers):
+        scraper = ArticleScraper(
+            series=["CBS250"] * len(urls), urls=urls, parse_workers=parse_workers
+        )
+        return [article async for article in scraper.scrape_stream()]
+
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+
+    in_process = asyncio.run(collect(0))
+    in_pool = asyncio.run(collect(2))
+
+    by_url = itemgetter("url")
+    assert sorted(in_pool, key=by_url) == sorted(in_process, key=by_url)
+    assert [article["document_id"] for article in sorted(in_pool, key=by_url)] == [
+        "smb0",
+        "smb1",
+        "smb2",
+        "smb3",
+    ]
+
+
+class FakeResponse:
+    """An aiohttp response with just what ArticleScraper._fetch reads"""
+
+    def __init__(self, status, body="", headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def text(self):
+        return self.body
+
+    def raise_for_status(self):
+        raise RuntimeError(f"HTTP {self.status}")
+
+
+class FakeSession:
+    """An aiohttp ClientSession answering from a list of responses"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requested = []
+        self.closed = False
+
+    def get(self, url, headers=None):
+        self.requested.append(url)
+        self.sent_headers = headers
+        return self.responses.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_scrape_stream_times_every_stage(monkeypatch, parse_workers):
+    """
+    Testcase for scrape_stream timing the stages of every page, including the
+    ones parsed in worker processes
+    """
+    urls = [f"https://www.cisco.com/{i}.html" for i in range(3)]
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        return ARTICLE_PAGE.format(number=url.rsplit("/", 1)[1].split(".")[0])
+
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+    scraper = ArticleScraper(
+        series=["CBS250"] * len(urls), urls=urls, parse_workers=parse_workers
+    )
+
+    async def collect():
+        return [article async for article in scraper.scrape_stream()]
+
+    asyncio.run(collect())
+    stats = scraper.timer.stats
+
+    for stage in ("fetch", "soup", "clean", "parse", "parse.steps"):
+        assert stats[stage]["count"] == len(urls), stage
+    assert "parse.backup_steps" not in stats
+
+
+def test_fetch_slows_down_on_429_and_503():
+    """
+    Testcase for _fetch halving the rate and waiting out Retry-After on
+    429 and 503 responses, then raising the rate again on success
+    """
+    clock = FakeClock()
+    scraper = ArticleScraper(series=["CBS250"], urls=["a"], requests_per_second=4)
+    scraper.rate_limiter = TokenBucket(
+        rate=4, burst=1, increase=1, clock=clock, sleep=clock.sleep
+    )
+    scraper._client_session = FakeSession(
+        [
+            FakeResponse(429, headers={"Retry-After": "10"}),
+            FakeResponse(503),
+            FakeResponse(200, body="<html></html>"),
+        ]
+    )
+
+    html = asyncio.run(scraper._fetch("a"))
+
+    assert html == "<html></html>"
+    assert scraper._client_session.requested == ["a", "a", "a"]
+    # Waited out Retry-After, then one token at the halved rates of 2 and 1 requests/s
+    assert clock.now == 11.0
+    assert scraper.rate_limiter.rate == 2
+
+
+def test_fetch_raises_when_retries_keep_failing():
+    """
+    Testcase for _fetch raising the last 429 once it runs out of retries
+    """
+    clock = FakeClock()
+    scraper = ArticleScraper(series=["CBS250"], urls=["a"])
+    scraper.rate_limiter = TokenBucket(rate=4, clock=clock, sleep=clock.sleep)
+    scraper._client_session = FakeSession([FakeResponse(429) for _ in range(2)])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scraper._fetch("a", retries=2))
+    assert scraper.rate_limiter.rate == 1
+
+
+def test_fetch_all_reuses_one_pooled_session(monkeypatch):
+    """
+    Testcase for fetch_all opening one session per run and reusing it for
+    every url, and the async context manager keeping it open across runs
+    """
+    sessions = []
+    connectors = []
+
+    def client_session(**kwargs):
+        session = FakeSession([FakeResponse(200, body="ok") for _ in range(10)])
+        session.kwargs = kwargs
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(articles.aiohttp, "ClientSession", client_session)
+    monkeypatch.setattr(
+        articles.aiohttp, "TCPConnector", lambda **kwargs: connectors.append(kwargs)
+    )
+    urls = ["a", "b", "c"]
+    scraper = ArticleScraper(
+        series=["CBS250"] * len(urls), urls=urls, requests_per_second=100
+    )
+
+    assert asyncio.run(scraper.fetch_all(urls)) == ["ok", "ok", "ok"]
+    assert len(sessions) == 1
+    assert sorted(sessions[0].requested) == urls
+    assert sessions[0].closed
+    assert connectors[0]["limit_per_host"] == scraper.limit_per_host
+
+    async def run_twice():
+        async with scraper:
+            await scraper.fetch_all(urls)
+            await scraper.fetch_all(urls)
+            assert not sessions[1].closed
+
+    asyncio.run(run_twice())
+
+    assert len(sessions) == 2
+    assert len(sessions[1].requested) == 6
+    assert sessions[1].closed
+    assert scraper._client_session is None
+
+
+def test_scrape_stream_skips_unchanged_articles(monkeypatch, tmp_path):
+    """
+    Testcase for incremental scraping only parsing and yielding pages
+    that are new or changed, or were parsed by another parser version
+    """
+    urls = ["https://www.cisco.com/a.html", "https://www.cisco.com/b.html"]
+    pages = {url: PAGE.format(title=url) for url in urls}
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        return pages[url]
+
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+    index_path = str(tmp_path / "articles_index.json")
+
+    def scrape(series=("CBS250", "CBS250")):
+        scraper = ArticleScraper(
+            series=list(series), urls=urls, index=ArticleIndex(index_path)
+        )
+        scraper.article_parser = CountingParser()
+        asyncio.run(scraper.scrape_to_ndjson(str(tmp_path / "out.ndjson")))
+        scraper.index.save()
+        return sorted(scraper.article_parser.calls)
+
+    assert scrape() == urls
+    assert scrape() == []
+
+    pages[urls[1]] = PAGE.format(title="changed")
+    assert scrape() == [urls[1]]
+    assert scrape(series=("CBS250", "CBS350")) == [urls[1]]
+
+    monkeypatch.setattr(articles, "PARSER_VERSION", articles.PARSER_VERSION + 1)
+    assert scrape() == urls
+
+    index = ArticleIndex(index_path)
+    assert index.get_by_document_id(urls[0])["url"] == urls[0]
+    assert index.get(urls[0])["series"] == ["CBS250"]
+
+
+def test_load_links_from_a_directory(tmp_path):
+    """Testcase for load_links reading every links file of a directory in name order"""
+    (tmp_path / "CBS350.json").write_text(json.dumps([{"url": "b", "family": "CBS350"}]))
+    (tmp_path / "CBS250.json").write_text(json.dumps([{"url": "a", "family": "CBS250"}]))
+    (tmp_path / "notes.txt").write_text("not links")
+
+    assert articles.load_links(str(tmp_path)) == [
+        {"url": "a", "family": "CBS250"},
+        {"url": "b", "family": "CBS350"},
+    ]
+
+
+def test_scrape_stream_fetches_and_parses_shared_pages_once(monkeypatch, tmp_path):
+    """
+    Testcase for a page listed by several series, over http and https and with
+    query strings, being fetched and parsed once and yielded for every series
+    """
+    shared = "https://www.cisco.com/shared.html"
+    urls = [
+        "http://www.cisco.com/shared.html",
+        "https://www.cisco.com/own.html",
+        "https://www.cisco.com/shared.html?dtid=abc",
+        shared,
+    ]
+    series = ["CBS250", "CBS250", "CBS350", "CBS350"]
+    fetched = []
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        fetched.append(url)
+        return PAGE.format(title=url)
+
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+    index_path = str(tmp_path / "articles_index.json")
+
+    def scrape():
+        scraper = ArticleScraper(
+            series=series, urls=urls, index=ArticleIndex(index_path)
+        )
+        scraper.article_parser = CountingParser()
+
+        async def collect():
+            return [article async for article in scraper.scrape_stream()]
+
+        scraped = asyncio.run(collect())
+        scraper.index.save()
+        return scraper.article_parser.calls, scraped
+
+    calls, scraped = scrape()
+
+    assert sorted(fetched) == sorted(calls) == [
+        "https://www.cisco.com/own.html",
+        shared,
+    ]
+    assert sorted((article["url"], article["series"]) for article in scraped) == [
+        ("https://www.cisco.com/own.html", "CBS250"),
+        (shared, "CBS250"),
+        (shared, "CBS350"),
+    ]
+    assert ArticleIndex(index_path).get(shared)["series"] == ["CBS250", "CBS350"]
+
+    series[2] = "CBS220"
+    calls, scraped = scrape()
+
+    assert calls == [shared]
+    assert [article["series"] for article in scraped] == ["CBS220"]
+
+
+def test_scrape_copies_shared_pages_for_every_series(monkeypatch):
+    """Testcase for scrape parsing a page listed by two series once"""
+    monkeypatch.setattr(ArticleScraper, "scrape_all", fake_scrape_all)
+    scraper = ArticleScraper(
+        series=["CBS250", "CBS350"],
+        urls=["http://www.cisco.com/a.html", "https://www.cisco.com/a.html"],
+    )
+    scraper.article_parser = CountingParser()
+
+    yielded = list(scraper.scrape())
+
+    assert scraper.article_parser.calls == ["https://www.cisco.com/a.html"]
+    assert [article.series for article in yielded] == ["CBS250", "CBS350"]
+    assert yielded == scraper.articles
@@ -0,0 +1,110 @@
+"""module pytest"""
+import asyncio
+import pickle
+from bs4 import BeautifulSoup
+from langchain_core.runnables import RunnableLambda
+from src.services.articles import ArticleParser, ArticleScraper
+from src.services.categories import CategoryCache, CategoryClassifier
+
+
+class FakeLLM:
+    """Answers every prompt with the same category and counts the prompts"""
+
+    def __init__(self, category):
+        self.category = category
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt.to_string())
+        return self.category
+
+    def runnable(self):
+        return RunnableLambda(self)
+
+
+def test_classifier_memoizes_categories_across_runs(tmp_path):
+    """
+    Testcase for the category cache answering titles seen in a previous
+    run, regardless of case and whitespace, without calling the LLM
+    """
+    path = str(tmp_path / "category_cache.jsonl")
+    llm = FakeLLM("Troubleshooting\n")
+    first_run = CategoryClassifier(llm=llm.runnable(), cache=CategoryCache(path))
+
+    assert first_run.classify("Fix a  Port Flap") == "Troubleshooting"
+    assert first_run.classify("fix a port flap") == "Troubleshooting"
+    assert len(llm.prompts) == 1
+    assert "Title: Fix a  Port Flap" in llm.prompts[0]
+
+    second_run = CategoryClassifier(llm=llm.runnable(), cache=CategoryCache(path))
+    assert second_run.classify("Fix a Port Flap ") == "Troubleshooting"
+    assert second_run.llm_calls == 0
+
+    next_version = CategoryCache(path, prompt_version=2)
+    assert next_version.get("Fix a Port Flap") is None
+
+
+def test_article_parser_falls_back_to_cached_llm_category(tmp_path):
+    """
+    Testcase for ArticleParser asking its classifier for articles without
+    a breadcrumb category, and the classifier surviving a pickle round trip
+    """
+    llm = FakeLLM("Design")
+    classifier = CategoryClassifier(
+        llm=llm.runnable(), cache=CategoryCache(str(tmp_path / "cache.jsonl"))
+    )
+    parser = ArticleParser(category_classifier=classifier)
+    soup = BeautifulSoup("<html><body></body></html>", "html.parser")
+
+    assert parser.get_category(soup, "Plan a Network") == "Design"
+    assert parser.get_category(soup, "Plan a Network") == "Design"
+    assert len(llm.prompts) == 1
+
+    unpickled = pickle.loads(pickle.dumps(CategoryClassifier(cache=classifier.cache)))
+    assert unpickled.classify("Plan a Network") == "Design"
+
+
+def test_scrape_stream_categorizes_in_concurrent_batches(monkeypatch, tmp_path):
+    """
+    Testcase for scrape_stream leaving LLM categorization to a batched
+    stage, asking once per distinct title and falling back to keywords
+    """
+    titles = ["Plan a Network", "Plan a Network", "Upgrade the Firmware", "Set Up SNMP"]
+    urls = [f"https://www.cisco.com/{i}.html" for i in range(len(titles))]
+    pages = dict(
+        zip(urls, (f"<html><head><title>{t} - Cisco</title></head></html>" for t in titles))
+    )
+
+    async def fetch(self, url, retries=3, cooldown=2, backoff=1.5):
+        return pages[url]
+
+    def answer(prompt):
+        if "Title: Upgrade" in prompt.to_string():
+            raise TimeoutError("LLM timed out")
+        return "Design"
+
+    classifier = CategoryClassifier(
+        llm=RunnableLambda(answer), cache=CategoryCache(str(tmp_path / "cache.jsonl"))
+    )
+    monkeypatch.setattr(ArticleScraper, "_fetch", fetch)
+    scraper = ArticleScraper(
+        series=["CBS250"] * len(urls), urls=urls, category_batch_size=2
+    )
+    scraper.article_parser = ArticleParser(category_classifier=classifier)
+
+    async def collect():
+        return [article async for article in scraper.scrape_stream()]
+
+    categories = {
+        article["url"]: article["category"] for article in asyncio.run(collect())
+    }
+
+    assert [categories[url] for url in urls] == [
+        "Design",
+        "Design",
+        "Install & Upgrade",
+        "Design",
+    ]
+    assert classifier.llm_calls == 3
+    assert classifier.fallbacks == 1
+    assert not scraper.article_parser.defer_llm_categories
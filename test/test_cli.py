@@ -0,0 +1,104 @@
+"""module pytest"""
+import subprocess
+import sys
+import pytest
+from src import cli, seed
+from src.services import articles, supporting_documents_loader
+
+SCRAPER_MODULES = [
+    "src.cli",
+    "src.seed",
+    "src.services.articles",
+    "src.services.datasheets",
+    "src.services.quick_resources",
+    "src.services.supporting_documents_loader",
+    "src.services.youtube",
+]
+
+NO_NETWORK = """
+import socket, sys
+
+def connect(*args, **kwargs):
+    raise AssertionError("network access at import")
+
+socket.socket.connect = connect
+socket.create_connection = connect
+for module in sys.argv[1:]:
+    __import__(module)
+"""
+
+
+def test_importing_the_scrapers_does_no_work(tmp_path):
+    """
+    Testcase for importing the scraper and seed modules without network
+    access, and without writing anything
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", NO_NETWORK, *SCRAPER_MODULES],
+        cwd=tmp_path,
+        env={"PYTHONPATH": str(cli.__file__).rsplit("/src/", 1)[0]},
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ""
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cli_runs_the_article_scraper(monkeypatch):
+    """Testcase for the articles command passing its options to run_scraper"""
+    calls = []
+    monkeypatch.setattr(
+        articles, "run_scraper", lambda *args, **kwargs: calls.append((args, kwargs))
+    )
+
+    cli.main(["articles", "--full", "--parse-workers", "0", "--parser", "lxml"])
+
+    assert calls == [
+        (
+            (articles.LINKS_PATH,),
+            {"parse_workers": 0, "incremental": False, "parser": "lxml"},
+        )
+    ]
+
+
+def test_cli_scrapes_the_guides_of_each_series(monkeypatch):
+    """Testcase for the guides command scraping the chosen series, Catalyst 1300 by default"""
+    calls = []
+    monkeypatch.setattr(
+        supporting_documents_loader,
+        "save_guides",
+        lambda name, output_dir, parser: calls.append(name),
+    )
+
+    cli.main(["guides"])
+    cli.main(["guides", "--series", "catalyst_1200", "--series", "catalyst_1300"])
+
+    assert calls == ["catalyst_1300", "catalyst_1200", "catalyst_1300"]
+    assert set(cli.GUIDE_NAMES) == set(supporting_documents_loader.GUIDES)
+
+
+def test_cli_seeds_the_chosen_collections(monkeypatch):
+    """Testcase for the seed command seeding only the collections it is given"""
+    seeded = []
+
+    def seeder(collection):
+        async def seed_collection():
+            seeded.append(collection)
+            return [collection]
+
+        return seed_collection
+
+    monkeypatch.setattr(
+        seed, "SEEDERS", {name: seeder(name) for name in seed.SEEDERS}
+    )
+
+    cli.main(["seed", "videos", "product_families"])
+
+    assert seeded == ["product_families", "videos"]
+    assert cli.SEED_COLLECTIONS == tuple(seed.SEEDERS)
+    with pytest.raises(SystemExit):
+        cli.main(["seed", "unknown"])
+    with pytest.raises(ValueError):
+        seed.seed(["unknown"])
@@ -0,0 +1,82 @@
+"""module pytest"""
+import json
+import pytest
+from src.services.html_parsers import available_html_parsers, make_soup
+from test.benchmark import benchmark_parser
+from test.corpus import CORPORA
+
+# Articles are checked in test_parser.py
+CORPUS_PAGES = [
+    (corpus, path) for corpus in CORPORA[1:] for path in corpus.pages
+]
+
+
+def parse_page(corpus, path, backend="html.parser"):
+    """Parse a saved page the way its scraper does"""
+    soup = make_soup(path.read_text(encoding="utf-8"), backend)
+    if corpus.clean is not None:
+        corpus.clean(soup)
+    return corpus.parse(soup, path)
+
+
+@pytest.mark.parametrize("backend", available_html_parsers())
+@pytest.mark.parametrize(
+    "corpus, path",
+    CORPUS_PAGES,
+    ids=[f"{path.parent.name}-{path.stem}" for _, path in CORPUS_PAGES],
+)
+def test_parsers_match_golden_output(corpus, path, backend):
+    """
+    Testcase for the datasheet, guide and support page parsers producing the
+    recorded output for every saved page with every installed HTML parser
+    """
+    golden = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+
+    assert parse_page(corpus, path, backend) == golden
+
+
+@pytest.mark.parametrize("corpus", CORPORA, ids=[corpus.name for corpus in CORPORA])
+def test_parsers_write_nothing_to_stdout(corpus, capsys):
+    """
+    Testcase for the page parsers logging instead of printing, so nothing is
+    written while debug logging is off
+    """
+    for path in corpus.pages:
+        parse_page(corpus, path)
+
+    assert capsys.readouterr().out == ""
+
+
+def test_every_corpus_has_pages():
+    """Testcase for every corpus of the benchmark finding its saved pages"""
+    for corpus in CORPORA:
+        assert corpus.pages, corpus.name
+        for path in corpus.pages:
+            assert path.with_suffix(".json").exists(), path
+
+
+def test_benchmark_reports_every_corpus():
+    """
+    Testcase for the benchmark runner reporting throughput and stage times of
+    every corpus
+    """
+    report = benchmark_parser("html.parser", rounds=1)
+
+    assert report["parser"] == "html.parser"
+    assert report["log_level"] == "WARNING"
+    assert report["peak_rss_kb"] > 0
+    assert [corpus["corpus"] for corpus in report["corpora"]] == [
+        corpus.name for corpus in CORPORA
+    ]
+    for corpus in report["corpora"]:
+        assert corpus["pages_per_second"] > 0
+        assert set(corpus["stage_ms"]) == {"soup", "clean", "parse"}
+
+
+if __name__ == "__main__":
+    # Regenerate the golden outputs after an intended change of a parser's output
+    for corpus, path in CORPUS_PAGES:
+        path.with_suffix(".json").write_text(
+            json.dumps(parse_page(corpus, path), indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
@@ -0,0 +1,484 @@
+"""module pytest"""
+import asyncio
+import json
+from datetime import datetime
+import pytest
+from bson import ObjectId, encode
+from bson.raw_bson import RawBSONDocument
+from bson.timestamp import Timestamp
+from pymongo.errors import BulkWriteError, OperationFailure
+from src.db.database import MongoDbClient
+from src.db.indexes import ensure_indexes, get_index_specs, verify_hot_queries
+from src.db.model import Article, Video
+from src.db.profiler import QueryProfiler
+from src.db.mirror import ReadMirror
+from src.db.transcoder import ModelProjection, raw_bson_list_to_json
+
+
+class FakeBulkWriteResult:
+    def __init__(self, bulk_api_result):
+        self.bulk_api_result = bulk_api_result
+
+
+class FakeCollection:
+    """
+    Records the batches passed to `bulk_write` and fails any operation
+    whose filter is listed in `failing_filters`
+    """
+
+    def __init__(self, failing_filters=()):
+        self.batches = []
+        self.failing_filters = list(failing_filters)
+
+    async def bulk_write(self, requests, ordered=True):
+        assert ordered is False
+        self.batches.append(requests)
+        details = {
+            "nInserted": 0,
+            "nMatched": 0,
+            "nModified": 0,
+            "nUpserted": 0,
+            "upserted": [],
+            "writeErrors": [],
+        }
+        for index, request in enumerate(requests):
+            if request._filter in self.failing_filters:
+                details["writeErrors"].append(
+                    {"index": index, "code": 11000, "errmsg": "duplicate key"}
+                )
+            elif request._upsert:
+                details["nUpserted"] += 1
+                details["upserted"].append({"index": index, "_id": f"id-{index}"})
+            else:
+                details["nMatched"] += 1
+                details["nModified"] += 1
+        if details["writeErrors"]:
+            raise BulkWriteError(details)
+        return FakeBulkWriteResult(details)
+
+
+@pytest.fixture
+def mongodb_client():
+    """
+    Returns a MongoDbClient, the motor client does not connect
+    until the first operation so no server is needed
+    """
+    return MongoDbClient("mongodb://localhost:27017", "user", "password")
+
+
+def test_bulk_upsert_batches_and_aggregates(mongodb_client):
+    """
+    Testcase for bulk_upsert splitting documents into batches and
+    summing the counts of every batch
+    """
+    collection = FakeCollection()
+    mongodb_client.collections[MongoDbClient.VIDEOS] = collection
+    documents = [{"video_id": str(i), "title": f"Video {i}"} for i in range(5)]
+
+    summary = asyncio.run(
+        mongodb_client.bulk_upsert(
+            MongoDbClient.VIDEOS, documents, key="video_id", batch_size=2
+        )
+    )
+
+    assert [len(batch) for batch in collection.batches] == [2, 2, 1]
+    assert collection.batches[0][1]._filter == {"video_id": "1"}
+    assert collection.batches[0][1]._doc == {
+        "$set": {"video_id": "1", "title": "Video 1"}
+    }
+    assert summary["upserted"] == 5
+    assert sorted(summary["upserted_ids"]) == [0, 1, 2, 3, 4]
+    assert summary["errors"] == []
+
+
+def test_bulk_add_to_set_reports_per_document_errors(mongodb_client):
+    """
+    Testcase for bulk_add_to_set continuing past a failing operation
+    and reporting it with its index in the input
+    """
+    collection = FakeCollection(failing_filters=[{"document_id": "2"}])
+    mongodb_client.collections[MongoDbClient.ARTICLES] = collection
+    updates = [({"document_id": str(i)}, {"series": ["a", "b"]}) for i in range(4)]
+
+    summary = asyncio.run(
+        mongodb_client.bulk_add_to_set(MongoDbClient.ARTICLES, updates, batch_size=3)
+    )
+
+    assert collection.batches[0][0]._doc == {
+        "$addToSet": {"series": {"$each": ["a", "b"]}}
+    }
+    assert summary["matched"] == 3
+    assert summary["modified"] == 3
+    assert [error["index"] for error in summary["errors"]] == [2]
+    assert summary["errors"][0]["code"] == 11000
+
+
+def test_raw_bson_to_json_matches_model_serialization():
+    """
+    Testcase for the raw transcoder producing the same JSON as the
+    pydantic Video model for a stored video
+    """
+    stored = {
+        "_id": ObjectId(),
+        "series": [ObjectId(), ObjectId()],
+        "title": "Configure VLANs",
+        "published_date": datetime(2024, 2, 27, 18, 27, 7),
+        "description": "Walkthrough – part 1",
+        "url": "https://www.youtube.com/embed/abc",
+        "video_id": "abc",
+        "views": 10,
+        "likes": 2,
+        "duration": "PT5M",
+        "comments": 0,
+        "kind": "youtube",
+        "tags": ["vlan"],
+        "transcript": "hello",
+        "category": "Configuration",
+        "type": "Video",
+    }
+    raw = RawBSONDocument(encode(stored))
+
+    transcoded = json.loads(raw_bson_list_to_json([raw]))
+    expected = json.loads(Video(**stored).model_dump_json(by_alias=True))
+
+    assert transcoded == [expected]
+
+
+def test_raw_bson_projection_matches_response_model():
+    """
+    Testcase for the projected transcoder dropping the stored fields the
+    Article model does not have and filling in the missing defaults
+    """
+    stored = {
+        "_id": ObjectId(),
+        "series": [ObjectId()],
+        "title": "Configure VLANs",
+        "document_id": "1a2b",
+        "category": "Configuration",
+        "url": "https://www.cisco.com/c/en/us/support/docs/smb/vlan.html",
+        "intro": "VLANs",
+        "steps": [{"step_num": 1, "text": "Log in"}],
+        "type": "Article",
+        "content_hash": "ffff",
+        "created_at": datetime(2024, 2, 27, 18, 27, 7),
+    }
+    raw = RawBSONDocument(encode(stored))
+
+    transcoded = json.loads(raw_bson_list_to_json([raw], ModelProjection(Article)))
+    expected = json.loads(Article(**stored).model_dump_json(by_alias=True))
+
+    assert transcoded == [expected]
+    assert "content_hash" not in transcoded[0]
+    assert transcoded[0]["revision_history"] == []
+
+
+class FakeIndexCollection:
+    """Keeps created indexes in memory the way index_information() reports them"""
+
+    def __init__(self):
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+        self.create_calls = 0
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+    async def create_indexes(self, models):
+        self.create_calls += 1
+        for model in models:
+            document = model.document
+            self.indexes[document["name"]] = {"key": list(document["key"].items())}
+
+
+class FakeDatabase:
+    """Answers explain commands with a fixed winning plan per collection"""
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    async def command(self, command):
+        collection_name = command["explain"]["find"]
+        return {"queryPlanner": {"winningPlan": self.plans[collection_name]}}
+
+
+def test_ensure_indexes_is_idempotent(mongodb_client):
+    """
+    Testcase for ensure_indexes creating the registered indexes once
+    and reporting them as existing on the next run
+    """
+    collection = FakeIndexCollection()
+    mongodb_client.collections[MongoDbClient.ARTICLES] = collection
+    expected = [
+        f"articles.{spec.name}"
+        for spec in get_index_specs([MongoDbClient.ARTICLES])
+        if spec.kind == "index"
+    ]
+
+    first = asyncio.run(
+        ensure_indexes(
+            mongodb_client, [MongoDbClient.ARTICLES], include_search_indexes=False
+        )
+    )
+    second = asyncio.run(
+        ensure_indexes(
+            mongodb_client, [MongoDbClient.ARTICLES], include_search_indexes=False
+        )
+    )
+
+    assert first["created"] == expected
+    assert second["created"] == []
+    assert second["existing"] == expected
+    assert collection.create_calls == len(expected)
+
+
+def test_verify_hot_queries_reports_collection_scans(mongodb_client):
+    """
+    Testcase for verify_hot_queries flagging only the queries whose
+    winning plan contains a COLLSCAN stage
+    """
+    mongodb_client.db = FakeDatabase(
+        {
+            "articles": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+            "videos": {"stage": "COLLSCAN"},
+        }
+    )
+    queries = [("articles", {"series": 1}), ("videos", {"series": 1})]
+
+    collection_scans = asyncio.run(verify_hot_queries(mongodb_client, queries))
+
+    assert collection_scans == [("videos", {"series": 1})]
+
+
+class FakeFindCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        return self.documents
+
+
+class FakeFindCollection:
+    def find(self, query):
+        return FakeFindCursor([{"title": "A"}, {"title": "B"}])
+
+
+class FakeExplainDatabase:
+    def __init__(self):
+        self.commands = []
+
+    async def command(self, command):
+        self.commands.append(command)
+        return {
+            "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+            "executionStats": {
+                "nReturned": 2,
+                "totalDocsExamined": 500,
+                "totalKeysExamined": 0,
+            },
+        }
+
+
+def test_profiler_explains_slow_queries(mongodb_client):
+    """
+    Testcase for the profiler timing every find and capturing an
+    executionStats explain once the threshold is passed
+    """
+    profiler = QueryProfiler(threshold_ms=0.0, max_records=1)
+    database = FakeExplainDatabase()
+    mongodb_client.profiler = profiler
+    mongodb_client.db = database
+    mongodb_client.collections[MongoDbClient.ARTICLES] = FakeFindCollection()
+
+    async def run_queries():
+        await mongodb_client.find(MongoDbClient.ARTICLES, {"title": "A"})
+        await mongodb_client.find(MongoDbClient.ARTICLES, {"title": "B"})
+        await profiler.wait_pending()
+
+    asyncio.run(run_queries())
+
+    assert database.commands[0] == {
+        "explain": {"find": "articles", "filter": {"title": "A"}},
+        "verbosity": "executionStats",
+    }
+    assert profiler.stats["articles.find"]["count"] == 2
+    assert len(profiler.records) == 1
+    record = profiler.records[0]
+    assert record["command"]["filter"] == {"title": "B"}
+    assert record["docs_examined"] == 500
+    assert record["docs_returned"] == 2
+    assert record["collscan"] is True
+
+
+class FakeMirrorCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def with_options(self, codec_options):
+        return self
+
+    def find(self, query):
+        self.finds = getattr(self, "finds", 0) + 1
+        return FakeFindCursor([RawBSONDocument(encode(d)) for d in self.documents])
+
+
+def test_read_mirror_applies_change_events(mongodb_client):
+    """
+    Testcase for the read mirror serving by-family reads from memory
+    and applying inserts, updates and deletes from its event source
+    """
+    family_id, other_family_id = ObjectId(), ObjectId()
+    first_article = {"_id": ObjectId(), "title": "First", "series": [family_id]}
+    second_article = {"_id": ObjectId(), "title": "Second", "series": [family_id]}
+    video = {"_id": ObjectId(), "title": "Video", "series": [family_id]}
+    mongodb_client.collections[MongoDbClient.PRODUCT_FAMILIES] = FakeMirrorCollection(
+        [
+            {"_id": family_id, "name": "CBS350"},
+            {"_id": other_family_id, "name": "CBS250"},
+        ]
+    )
+    mongodb_client.collections[MongoDbClient.ARTICLES] = FakeMirrorCollection(
+        [first_article]
+    )
+    mongodb_client.collections[MongoDbClient.VIDEOS] = FakeMirrorCollection([video])
+    events = [
+        {
+            "_id": {"_data": "1"},
+            "operationType": "insert",
+            "ns": {"coll": "articles"},
+            "documentKey": {"_id": second_article["_id"]},
+            "fullDocument": second_article,
+        },
+        {
+            "_id": {"_data": "2"},
+            "operationType": "update",
+            "ns": {"coll": "articles"},
+            "documentKey": {"_id": first_article["_id"]},
+            "fullDocument": {**first_article, "series": [other_family_id]},
+        },
+        {
+            "_id": {"_data": "3"},
+            "operationType": "delete",
+            "ns": {"coll": "videos"},
+            "documentKey": {"_id": video["_id"]},
+        },
+    ]
+
+    async def event_source():
+        for event in events:
+            yield event
+
+    async def run_mirror():
+        mirror = ReadMirror(mongodb_client, event_source=event_source)
+        await mirror.load()
+        before = await mirror.get_articles_by_product_family("CBS350")
+        await mirror._follow()
+        return mirror, before
+
+    mirror, before = asyncio.run(run_mirror())
+
+    def titles(documents):
+        return [document["title"] for document in documents]
+
+    assert titles(before) == ["First"]
+    assert titles(asyncio.run(mirror.get_articles_by_product_family("CBS350"))) == [
+        "Second"
+    ]
+    assert titles(asyncio.run(mirror.get_articles_by_product_family("CBS250"))) == [
+        "First"
+    ]
+    assert asyncio.run(mirror.get_videos_by_product_family("CBS350")) == []
+    with pytest.raises(ValueError):
+        asyncio.run(mirror.get_articles_by_product_family("Unknown"))
+
+
+def test_read_mirror_reloads_after_failed_changes(mongodb_client):
+    """
+    Testcase for the read mirror reloading instead of serving stale data
+    when a change cannot be applied or the change stream history is lost
+    """
+    family_id = ObjectId()
+    families = FakeMirrorCollection([{"_id": family_id, "name": "CBS350"}])
+    mongodb_client.collections[MongoDbClient.PRODUCT_FAMILIES] = families
+    mongodb_client.collections[MongoDbClient.ARTICLES] = FakeMirrorCollection([])
+    mongodb_client.collections[MongoDbClient.VIDEOS] = FakeMirrorCollection([])
+    readiness = []
+
+    async def family_without_name():
+        yield {
+            "_id": {"_data": "1"},
+            "operationType": "insert",
+            "ns": {"coll": "product_families"},
+            "documentKey": {"_id": ObjectId()},
+            "fullDocument": {"title": "No name"},
+        }
+
+    async def history_lost():
+        readiness.append(mirror.ready)
+        raise OperationFailure("history lost", code=286)
+        yield
+
+    async def no_events():
+        readiness.append(mirror.ready)
+        return
+        yield
+
+    sources = [family_without_name, history_lost, no_events]
+    mirror = ReadMirror(mongodb_client, event_source=lambda: sources.pop(0)())
+
+    async def run_mirror():
+        await mirror.load()
+        await mirror._follow()
+
+    asyncio.run(run_mirror())
+
+    assert readiness == [True, True]
+    assert families.finds == 3
+    assert mirror.ready
+
+
+class FakeChangeStream:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class FakeWatchDatabase:
+    def __init__(self):
+        self.watch_kwargs = None
+
+    async def command(self, name):
+        return {"ok": 1, "operationTime": Timestamp(5, 1)}
+
+    def with_options(self, codec_options):
+        return self
+
+    def watch(self, pipeline, **kwargs):
+        self.watch_kwargs = kwargs
+        return FakeChangeStream()
+
+
+def test_read_mirror_watches_from_before_the_load(mongodb_client):
+    """
+    Testcase for the change stream starting at the operation time read
+    before the bulk load, so writes made during the load are not lost
+    """
+    for name in ReadMirror.COLLECTIONS:
+        mongodb_client.collections[name] = FakeMirrorCollection([])
+    mongodb_client.db = FakeWatchDatabase()
+    mirror = ReadMirror(mongodb_client)
+
+    async def run_mirror():
+        await mirror.load()
+        await mirror._follow()
+
+    asyncio.run(run_mirror())
+
+    assert mongodb_client.db.watch_kwargs["start_at_operation_time"] == Timestamp(5, 1)
+    assert mongodb_client.db.watch_kwargs["resume_after"] is None
@@ -0,0 +1,79 @@
+"""module pytest"""
+from bs4 import BeautifulSoup
+from src.services.articles import ArticleParser
+from src.services.document_ids import canonicalize_url, make_document_id
+from src.services.supporting_documents_loader import SupportingDocumentsLoader
+
+URL = "https://www.cisco.com/c/en/us/support/docs/smb/a.html"
+GUIDE_PAGE = """<html lang="en"><head>
+<meta name="description" content="Chapter: VLAN Management">
+<meta name="concept" content="Cisco Business 350 Series Managed Switches">
+</head><body></body></html>"""
+
+
+def test_canonicalize_url():
+    """Testcase for canonicalize_url normalizing the scheme, host, query and fragment"""
+    for url in [
+        URL,
+        "http://www.cisco.com/c/en/us/support/docs/smb/a.html",
+        "HTTPS://WWW.Cisco.com:443/c/en/us/support/docs/smb/a.html",
+        "https://www.cisco.com/c/en/us/support/docs/smb/a.html?dtid=osscdc000283",
+        " http://www.cisco.com/c/en/us/support/docs/smb/a.html#step-1 ",
+    ]:
+        assert canonicalize_url(url) == URL
+    assert canonicalize_url("a") == "a"
+
+
+def test_make_document_id_is_stable():
+    """
+    Testcase for document ids being the same for every spelling of a url, and
+    different for every part of a page
+    """
+    assert make_document_id(URL) == make_document_id(URL.replace("https", "http"))
+    assert make_document_id(URL, "VLANs") == make_document_id(URL + "?a=b", "VLANs")
+    assert len(
+        {make_document_id(URL), make_document_id(URL, "VLANs"), make_document_id(URL, "")}
+    ) == 3
+
+
+def test_article_without_document_id_gets_a_stable_id():
+    """
+    Testcase for get_document_id deriving the id of a page without a Cisco
+    document id from its url, or its text, instead of a random one
+    """
+    soup = BeautifulSoup("<html><body><p>No id</p></body></html>", "html.parser")
+    with_id = BeautifulSoup(
+        '<div class="documentId">Document ID:smb1234</div>', "html.parser"
+    )
+
+    assert ArticleParser.get_document_id(with_id, URL) == "smb1234"
+    assert ArticleParser.get_document_id(soup, URL) == make_document_id(URL)
+    assert ArticleParser.get_document_id(
+        soup, URL.replace("https", "http")
+    ) == make_document_id(URL)
+    assert ArticleParser.get_document_id(soup) == ArticleParser.get_document_id(soup)
+
+
+def test_guide_sections_get_stable_ids():
+    """
+    Testcase for guide sections getting ids from their url and topic, the same
+    on every scrape, with repeated topics told apart by their occurrence
+    """
+    soup = BeautifulSoup(GUIDE_PAGE, "html.parser")
+    sections = [{"topic": "VLANs"}, {"topic": "Ports"}, {"topic": "VLANs"}, {}]
+
+    def doc_ids():
+        return [
+            metadata["doc_id"]
+            for metadata in SupportingDocumentsLoader._build_metadatas(
+                soup, URL, sections
+            )
+        ]
+
+    assert doc_ids() == doc_ids()
+    assert doc_ids() == [
+        make_document_id(URL, "VLANs"),
+        make_document_id(URL, "Ports"),
+        make_document_id(URL, "VLANs", "1"),
+        make_document_id(URL, ""),
+    ]
@@ -0,0 +1,82 @@
+"""module pytest"""
+import asyncio
+import gzip
+import pytest
+from src.services.articles import ArticleScraper
+from src.services.http_cache import HttpCache, OfflineCacheMiss
+from test.test_articles import FakeResponse, FakeSession
+
+
+class FakeRequestsResponse:
+    """A requests.Response with just what HttpCache.get reads"""
+
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+
+
+class FakeRequestsSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.sent_headers.append(headers)
+        return self.responses.pop(0)
+
+
+def test_http_cache_revalidates_and_replays(tmp_path):
+    """
+    Testcase for the cache storing compressed bodies by content hash,
+    answering 304s from disk and replaying pages offline
+    """
+    url = "https://www.cisco.com/a.html"
+    cache = HttpCache(tmp_path)
+    session = FakeRequestsSession(
+        [
+            FakeRequestsResponse(200, b"<html>a</html>", {"ETag": '"v1"'}),
+            FakeRequestsResponse(304, headers={"ETag": '"v1"'}),
+        ]
+    )
+
+    first = cache.get(url, session=session)
+    second = cache.get(url, session=session)
+
+    assert session.sent_headers == [{}, {"If-None-Match": '"v1"'}]
+    assert first.text == second.text == "<html>a</html>"
+    assert not first.from_cache and second.from_cache
+    bodies = list((tmp_path / "bodies").glob("*/*.gz"))
+    assert len(bodies) == 1
+    assert gzip.decompress(bodies[0].read_bytes()) == b"<html>a</html>"
+
+    offline = HttpCache(tmp_path, offline=True)
+    assert offline.get(url).text == "<html>a</html>"
+    with pytest.raises(OfflineCacheMiss):
+        offline.get("https://www.cisco.com/b.html")
+
+
+def test_article_scraper_fetch_uses_http_cache(tmp_path):
+    """
+    Testcase for ArticleScraper sending conditional requests and
+    serving 304 Not Modified responses from the cache
+    """
+    url = "https://www.cisco.com/a.html"
+    cache = HttpCache(tmp_path)
+    cache.store(url, 200, {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, b"old")
+    scraper = ArticleScraper(
+        series=["CBS250"], urls=[url], requests_per_second=100, http_cache=cache
+    )
+    scraper._client_session = FakeSession([FakeResponse(304)])
+
+    assert asyncio.run(scraper._fetch(url)) == "old"
+    assert scraper._client_session.sent_headers == {
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"
+    }
+    assert cache.revalidated == 1
+
+    scraper.http_cache = HttpCache(tmp_path, offline=True)
+    scraper._client_session = FakeSession([])
+    assert asyncio.run(scraper._fetch(url)) == "old"
+    assert scraper._client_session.requested == []
@@ -0,0 +1,96 @@
+"""module pytest"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time of a module in a fresh interpreter, as reported by `-X importtime`.
+# Wall clock times vary with the machine, so the budget is only checked when it is set
+IMPORT_TIME_BUDGET_MS = os.getenv("IMPORT_TIME_BUDGET_MS")
+
+ENTRY_MODULES = [
+    "src.cli",
+    "src.seed",
+    "src.services.articles",
+    "src.services.categories",
+    "src.services.datasheets",
+    "src.services.quick_resources",
+    "src.services.supporting_documents_loader",
+    "src.services.youtube",
+]
+
+# Imported on first use only, each of them takes from half a second to seconds to import
+DEFERRED_PACKAGES = [
+    "googleapiclient",
+    "langchain",
+    "langchain_community",
+    "langchain_core",
+    "langchain_openai",
+    "langchain_text_splitters",
+    "openai",
+    "pandas",
+    "youtube_transcript_api",
+]
+
+# The guides loader subclasses langchain's BaseLoader, only its text splitter is deferred
+ALLOWED_PACKAGES = {"src.services.supporting_documents_loader": {"langchain_core"}}
+
+IMPORTED_PACKAGES = """
+import sys
+__import__(sys.argv[1])
+print(" ".join(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+
+def cold_import(module):
+    """Import `module` in a fresh interpreter, returning its stdout and the -X importtime report"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORTED_PACKAGES, module],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout, result.stderr
+
+
+def cumulative_import_ms(report, module):
+    """The cumulative time of `module` in an -X importtime report, in milliseconds"""
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.rsplit("|", 2)
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise AssertionError(f"{module} is not in the import time report")
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_entry_modules_defer_heavy_imports(module):
+    """
+    Testcase for the scraper, seed and CLI modules importing langchain,
+    OpenAI, pandas and the Google clients only on first use
+    """
+    stdout, _ = cold_import(module)
+
+    deferred = set(DEFERRED_PACKAGES) - ALLOWED_PACKAGES.get(module, set())
+
+    assert set(stdout.split()).isdisjoint(deferred)
+
+
+@pytest.mark.skipif(
+    IMPORT_TIME_BUDGET_MS is None, reason="set IMPORT_TIME_BUDGET_MS to check it"
+)
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_entry_modules_import_within_budget(module):
+    """
+    Testcase for a cold import of every scraper, seed and CLI module staying
+    within the import time budget, in milliseconds
+    """
+    _, report = cold_import(module)
+
+    assert cumulative_import_ms(report, module) < float(IMPORT_TIME_BUDGET_MS)
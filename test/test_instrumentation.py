@@ -0,0 +1,109 @@
+"""module pytest"""
+import asyncio
+import logging
+import pickle
+from src.services.instrumentation import LogSampler, SlowPageProfiler, StageTimer
+
+
+def test_stage_timer_stats_and_histogram():
+    """Testcase for StageTimer summarizing the recorded durations of each stage"""
+    timer = StageTimer()
+    for seconds in (0.0005, 0.002, 0.002, 0.05, 2.0):
+        timer.record("parse", seconds)
+
+    stats = timer.stats["parse"]
+
+    assert stats["count"] == 5
+    assert round(stats["total_ms"], 1) == 2054.5
+    assert stats["p50_ms"] == 2.0
+    assert stats["p95_ms"] == stats["max_ms"] == 2000.0
+    assert [count for _, count in timer.histogram("parse")] == [1, 2, 1, 0, 1, 0]
+    assert timer.summary().splitlines()[1].startswith("parse")
+
+
+def test_stage_timer_times_blocks_and_functions():
+    """
+    Testcase for StageTimer timing with blocks, including failing ones, and
+    decorated functions and coroutine functions
+    """
+    timer = StageTimer()
+
+    @timer.timed("sync")
+    def sync():
+        return 1
+
+    @timer.timed()
+    async def fetch():
+        return 2
+
+    try:
+        with timer.stage("failing"):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert sync() == 1
+    assert asyncio.run(fetch()) == 2
+    assert {stage: len(values) for stage, values in timer.snapshot().items()} == {
+        "failing": 1,
+        "sync": 1,
+        "test_stage_timer_times_blocks_and_functions.<locals>.fetch": 1,
+    }
+
+
+def test_stage_timer_crosses_processes_empty_and_merges():
+    """
+    Testcase for a pickled StageTimer arriving empty, and its snapshot being
+    merged into the timer of the run
+    """
+    timer = StageTimer()
+    timer.record("fetch", 0.1)
+
+    worker_timer = pickle.loads(pickle.dumps(timer))
+    worker_timer.record("parse", 0.2)
+    timer.merge(worker_timer.snapshot())
+
+    assert timer.snapshot() == {"fetch": [0.1], "parse": [0.2]}
+
+
+def test_log_sampler_logs_every_nth_message_of_a_kind(caplog):
+    """
+    Testcase for LogSampler logging the first and every nth debug message of
+    each kind, and nothing while debug is off
+    """
+    logger = logging.getLogger("test.sampled")
+    sampler = LogSampler(logger, every=3)
+
+    with caplog.at_level(logging.INFO, logger="test.sampled"):
+        sampler.debug("element", "Element %s", "off")
+    with caplog.at_level(logging.DEBUG, logger="test.sampled"):
+        for i in range(7):
+            sampler.debug("element", "Element %s", i)
+        sampler.debug("section", "Section %s", "a")
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Element 0",
+        "Element 3",
+        "Element 6",
+        "Section a",
+    ]
+
+
+def test_slow_page_profiler_keeps_only_slow_pages(tmp_path, monkeypatch):
+    """Testcase for SlowPageProfiler writing profiles of slow pages only"""
+    profiler = SlowPageProfiler(threshold_ms=50, directory=str(tmp_path))
+    fast = "https://www.cisco.com/fast.html"
+    slow = "https://www.cisco.com/slow.html"
+
+    with profiler.profile(fast):
+        pass
+    with profiler.profile(slow):
+        sum(range(10**7))
+
+    assert [path.name for path in tmp_path.iterdir()] == [
+        "https_www.cisco.com_slow.html.prof"
+    ]
+    monkeypatch.delenv("SCRAPER_PROFILE_SLOW_MS", raising=False)
+    assert SlowPageProfiler.from_env() is None
+    monkeypatch.setenv("SCRAPER_PROFILE_SLOW_MS", "250")
+    assert SlowPageProfiler.from_env().threshold_ms == 250
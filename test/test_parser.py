@@ -0,0 +1,151 @@
+"""module pytest"""
+import json
+import re
+from collections import Counter
+from pathlib import Path
+import pytest
+from bs4 import BeautifulSoup
+from bs4.element import PageElement
+from src.services.articles import (
+    ArticleParser,
+    ArticleScraper,
+    parse_article_html,
+    starts_with_step,
+)
+from src.services.categories import CategoryClassifier
+from src.services.html_parsers import available_html_parsers, resolve_parser
+from test.corpus import long_article
+
+FIXTURES = Path(__file__).parent / "fixtures" / "articles"
+ARTICLE_FIXTURES = sorted(FIXTURES.glob("*.html"))
+FIXTURE_URL = "https://www.cisco.com/c/en/us/support/docs/smb/{name}.html"
+FIXTURE_SERIES = "Cisco Business 350 Series Managed Switches"
+
+
+def parse_fixture(path: Path, backend: str = "html.parser") -> dict:
+    """Parse a saved article page the way the scraper does"""
+    parser = ArticleParser(category_classifier=CategoryClassifier(memoize=False))
+    return parse_article_html(
+        parser,
+        path.read_text(encoding="utf-8"),
+        FIXTURE_URL.format(name=path.stem),
+        FIXTURE_SERIES,
+        backend,
+        {},
+        ArticleScraper(series=[]).unwanted_attributes,
+    )
+
+
+@pytest.mark.parametrize("backend", available_html_parsers())
+@pytest.mark.parametrize("path", ARTICLE_FIXTURES, ids=lambda path: path.stem)
+def test_article_parser_matches_golden_output(path, backend):
+    """
+    Testcase for ArticleParser producing the recorded output for every
+    saved article page with every installed HTML parser
+    """
+    golden = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+
+    assert parse_fixture(path, backend) == golden
+
+
+def test_resolve_parser(monkeypatch):
+    """
+    Testcase for resolve_parser picking the fastest installed parser for
+    "auto" and honouring SCRAPER_HTML_PARSER
+    """
+    monkeypatch.delenv("SCRAPER_HTML_PARSER", raising=False)
+    assert resolve_parser() == available_html_parsers()[0]
+    assert resolve_parser("html.parser") == "html.parser"
+
+    monkeypatch.setenv("SCRAPER_HTML_PARSER", "html.parser")
+    assert resolve_parser() == "html.parser"
+    assert ArticleScraper(series=[]).default_parser == "html.parser"
+
+    with pytest.raises(ValueError):
+        resolve_parser("regex")
+
+
+def test_parse_backup_steps_sections_by_h2():
+    """
+    Testcase for parse_backup_steps assigning text to the closest h2 before
+    it, on its own level or an ancestor's, and ending sections at an h1
+    """
+    parser = ArticleParser(category_classifier=CategoryClassifier(memoize=False))
+    soup = BeautifulSoup(
+        "<html><body><h2>Objective</h2><p>Goal</p>"
+        "<h2><a name='setup'></a>Set <b>up</b></h2><p>Plug<b>in</b></p>"
+        "<div>Then<p>power on</p></div><img src='/setup.png' alt='Setup'>"
+        "<div><h2>Nested</h2><p>inner</p></div><p>outer</p>"
+        "<h1>Related</h1><p>not a step</p></body></html>",
+        "html.parser",
+    )
+
+    steps = parser.parse_backup_steps(soup)
+
+    assert [(step["section"], step["text"]) for step in steps] == [
+        ("Set up", "Plug in Then power on Nested"),
+        ("Nested", "inner"),
+        ("Set up", "outer"),
+    ]
+    assert steps[0]["src"] == "https://www.cisco.com/setup.png"
+    assert [step["step_num"] for step in steps] == [1, 2, 3]
+
+
+def test_get_steps_scales_linearly(monkeypatch):
+    """
+    Testcase for get_steps never searching back through the page for the
+    section of a step, and searching forward a fixed number of times per step
+    """
+    searches = Counter()
+
+    def counted(name):
+        search = getattr(PageElement, name)
+
+        def count(self, *args, **kwargs):
+            searches[name] += 1
+            return search(self, *args, **kwargs)
+
+        return count
+
+    for name in ("find_all_previous", "find_next_sibling"):
+        monkeypatch.setattr(PageElement, name, counted(name))
+    parser = ArticleParser(category_classifier=CategoryClassifier(memoize=False))
+    forward = {}
+    for steps in (150, 600):
+        searches.clear()
+        result = parser.get_steps(long_article(steps))
+        forward[steps] = searches["find_next_sibling"]
+        assert [step["step_num"] for step in result] == list(range(1, steps + 1))
+        assert {step["section"] for step in result} == {"Configure"}
+        assert searches["find_all_previous"] == 0
+
+    assert forward[600] == 4 * forward[150]
+
+
+def test_step_checks_match_plain_patterns():
+    """
+    Testcase for the prefix fast paths of the step checks, run on every
+    element, agreeing with the plain patterns they stand in for
+    """
+    soups = [
+        BeautifulSoup(path.read_text(encoding="utf-8"), "html.parser")
+        for path in ARTICLE_FIXTURES
+    ] + [long_article(100)]
+    for soup in soups:
+        for element in soup.find_all(True):
+            text = element.text.strip()
+            assert ArticleParser.is_step_indicator(element) == (
+                re.match(r"Step (\d+)", text) is not None
+            )
+            assert starts_with_step(text) == (
+                re.match(r"^Step", text, flags=re.IGNORECASE) is not None
+            )
+
+
+if __name__ == "__main__":
+    # Regenerate the golden outputs after an intended change of the parser output
+    for path in ARTICLE_FIXTURES:
+        path.with_suffix(".json").write_text(
+            json.dumps(parse_fixture(path), indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
@@ -0,0 +1,80 @@
+"""module pytest"""
+import asyncio
+from src.services.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    """A clock that only moves when the bucket sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_limits_rate_after_burst():
+    """
+    Testcase for the bucket letting a burst through and then
+    spacing requests at the configured rate
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+
+    async def acquire_all():
+        times = []
+        for _ in range(6):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+
+    times = asyncio.run(acquire_all())
+
+    assert times == [0.0, 0.0, 0.5, 1.0, 1.5, 2.0]
+    assert bucket.achieved_rate == 3.0
+
+
+def test_token_bucket_backs_off_and_honours_retry_after():
+    """
+    Testcase for penalize halving the rate and pausing until
+    Retry-After, and reward restoring the rate up to max_rate
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=4, burst=1, increase=1, clock=clock, sleep=clock.sleep)
+
+    asyncio.run(bucket.acquire())
+    bucket.penalize(retry_after=TokenBucket.parse_retry_after("10"))
+    asyncio.run(bucket.acquire())
+
+    assert bucket.rate == 2
+    assert clock.now == 10.0
+
+    for _ in range(5):
+        bucket.reward()
+    assert bucket.rate == 4
+
+
+def test_token_bucket_penalize_drains_refilled_tokens():
+    """
+    Testcase for penalize emptying the tokens refilled since the last
+    acquire, so the next requests are spaced at the lowered rate
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=4, burst=4, clock=clock, sleep=clock.sleep)
+
+    async def acquire(count):
+        times = []
+        for _ in range(count):
+            await bucket.acquire()
+            times.append(clock.now)
+        return times
+
+    asyncio.run(acquire(1))
+    clock.now = 5.0
+    bucket.penalize()
+    times = asyncio.run(acquire(4))
+
+    assert times == [5.5, 6.0, 6.5, 7.0]